@@ -18,6 +18,7 @@ from django.contrib import admin
 from django.urls import path,include
 from django.conf import settings
 from django.http import JsonResponse
+from imaging_service.views import readiness
 
 def api_info(request):
     """API information endpoint"""
@@ -26,6 +27,7 @@ def api_info(request):
         'version': '1.0.0',
         'endpoints': {
             'admin': '/admin/',
+            'readiness': '/healthz/ready',
             'auth': {
                 'signup': '/auth/signup/',
                 'login': '/auth/login/',
@@ -33,7 +35,11 @@ def api_info(request):
                 'profile': '/auth/profile/'
             },
             'api': {
-                'upload_scan': '/api/upload-scan'
+                'upload_scan': '/api/upload-scan',
+                'batch_scans': '/api/scans/batch',
+                'job_status': '/api/jobs/<job_id>',
+                'metrics': '/api/metrics',
+                'stt_health': '/api/stt/health'
             }
         }
     })
@@ -41,6 +47,7 @@ def api_info(request):
 urlpatterns = [
     path('', api_info, name='api_info'),
     path('admin/', admin.site.urls),
+    path('healthz/ready', readiness, name='readiness'),
     path('auth/',include('auth_service.urls')),
     path('api/',include('imaging_service.urls'))
 ]
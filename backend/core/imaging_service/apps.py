@@ -1,6 +1,6 @@
 from django.apps import AppConfig
 
-from .model.model_loader import ModelLoader
+from .model.warmup import ModelWarmup
 
 
 class ImagingServiceConfig(AppConfig):
@@ -8,11 +8,15 @@ class ImagingServiceConfig(AppConfig):
     name = 'imaging_service'
 
     def ready(self):
-        # Preload model when Django starts
-        try:
-            ModelLoader.get_instance().load_model()
-        except Exception as e:
-            # Log error but don't crash the app
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.error(f"Failed to preload model: {str(e)}")
\ No newline at end of file
+        # Load and warm the model in the background so startup is not blocked
+        # (MODEL_WARMUP=true); /healthz/ready reports when this worker can take
+        # traffic, and starts the warm-up itself when it was not started here
+        if ModelWarmup.should_autostart():
+            ModelWarmup.get_instance().start()
+
+        # Pick up jobs queued before a restart (JOB_RUNNER=true); otherwise the
+        # workers start with the first job queued in this process
+        from .jobs import JobRunner
+
+        if JobRunner.should_autostart():
+            JobRunner.get_instance().start()
@@ -0,0 +1,139 @@
+"""
+Async versions of the imaging endpoints, served when the app runs under ASGI
+(core.asgi) with ASYNC_VIEWS=true.
+
+A request never holds a thread while it waits: STT providers are called with
+non-blocking clients, and scan decoding plus inference run on the bounded
+InferenceExecutor. Parsing and authentication stay with DRF, off the event loop.
+"""
+import functools
+
+from asgiref.sync import sync_to_async
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import APIException, MethodNotAllowed, NotAuthenticated
+from rest_framework.parsers import FormParser, JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from .model.executor import InferenceExecutor
+from .model.worker_pool import InferenceOverloaded
+from .models import DiagnosisJob
+from .jobs import wants_async
+from .nlp_symptoms import extract_symptoms
+from .transcription import transcribe_async
+from .uploads import AudioUploadParser, ScanUploadParser, UploadTooLarge, upload_buffer
+from .views import (
+    _enqueue_job, _overloaded_response, _too_large_response, handle_multimodal_diagnosis, handle_upload_scan,
+    select_transcriber, transcription_error_response,
+)
+
+
+def _render(response):
+    response.accepted_renderer = JSONRenderer()
+    response.accepted_media_type = 'application/json'
+    response.renderer_context = {}
+    return response.render()
+
+
+def _authenticate(request):
+    if not request.user.is_authenticated:
+        raise NotAuthenticated()
+
+
+def _parse(request):
+    # Reading request.data runs the parsers, which spool uploads to disk
+    request.data
+
+
+def async_api_view(parser_classes):
+    """
+    What @api_view(['POST']), JWT authentication, IsAuthenticated and
+    @parser_classes give the sync views, for an async view: the view receives
+    an authenticated DRF Request with its body parsed and returns a Response,
+    which is rendered as JSON.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            authenticator = JWTAuthentication()
+            api_request = Request(request, parsers=[parser() for parser in parser_classes],
+                                  authenticators=[authenticator])
+            try:
+                if request.method != 'POST':
+                    raise MethodNotAllowed(request.method)
+                # Token lookup hits the database; parsing reads and spools the body
+                await sync_to_async(_authenticate)(api_request)
+                await sync_to_async(_parse, thread_sensitive=False)(api_request)
+                response = await view(api_request, *args, **kwargs)
+            except UploadTooLarge as e:
+                response = _too_large_response(e)
+            except APIException as e:
+                response = Response({'detail': e.detail}, status=e.status_code)
+                if isinstance(e, NotAuthenticated):
+                    response['WWW-Authenticate'] = authenticator.authenticate_header(api_request)
+            return _render(response)
+        return csrf_exempt(wrapper)
+    return decorator
+
+
+async def _offload(handler, request):
+    """Run a sync handler (decode, inference, calculation) on the inference executor"""
+    try:
+        return await InferenceExecutor.get_instance().run(handler, request.data, request.FILES)
+    except InferenceOverloaded as e:
+        return _overloaded_response(e)
+
+
+@async_api_view([ScanUploadParser, FormParser])
+async def upload_scan(request):
+    """
+    Upload a medical scan image (PNG/JPEG or DICOM) and check vitals then get result
+    """
+    if wants_async(request):
+        return await sync_to_async(_enqueue_job)(request, DiagnosisJob.UPLOAD_SCAN, 'image')
+    return await _offload(handle_upload_scan, request)
+
+
+@async_api_view([AudioUploadParser, FormParser])
+async def transcribe_symptoms(request):
+    """
+    Transcribe a short voice note and extract symptom keywords.
+    """
+    if wants_async(request):
+        return await sync_to_async(_enqueue_job)(request, DiagnosisJob.TRANSCRIBE_SYMPTOMS, 'audio')
+    try:
+        if 'audio' not in request.FILES:
+            return Response({'error': 'No audio file provided'}, status=status.HTTP_400_BAD_REQUEST)
+
+        audio_file = request.FILES['audio']
+        language = request.data.get('language')
+        transcriber, error_response = select_transcriber(language)
+        if error_response is not None:
+            return error_response
+
+        with upload_buffer(audio_file) as audio:
+            transcript = await transcribe_async(transcriber, audio_file.name, audio, language)
+
+        symptoms = extract_symptoms(transcript, language)
+        return Response({
+            'transcript': transcript,
+            'symptoms': symptoms
+        }, status=status.HTTP_200_OK)
+    except UploadTooLarge as e:
+        return _too_large_response(e)
+    except Exception as e:
+        return transcription_error_response(e)
+
+
+@async_api_view([ScanUploadParser, FormParser, JSONParser])
+async def multimodal_diagnosis(request):
+    """
+    Combine X-ray, structured vitals, and optional voice-derived symptoms for a fused diagnosis.
+    Accepts multipart (image + form fields) or JSON (if image omitted).
+    """
+    if wants_async(request):
+        return await sync_to_async(_enqueue_job)(request, DiagnosisJob.MULTIMODAL_DIAGNOSIS, 'image')
+    return await _offload(handle_multimodal_diagnosis, request)
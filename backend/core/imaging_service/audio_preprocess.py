@@ -0,0 +1,270 @@
+"""
+Audio compaction in front of the STT providers. Voice notes are downmixed to
+mono, resampled to 16 kHz, trimmed of leading and trailing silence and
+re-encoded before upload: on slow uplinks the upload, not the provider, is
+most of the transcription latency.
+
+WAV is decoded with the standard library. Other formats (webm/Opus, mp3, m4a)
+and Opus encoding need the ffmpeg binary; without it WAV notes are re-encoded
+as 16-bit mono WAV and other formats are sent unchanged.
+
+Settings (environment):
+    AUDIO_PREPROCESS          compact voice notes before upload (default false)
+    AUDIO_SAMPLE_RATE         sample rate sent to the providers (default 16000)
+    AUDIO_OPUS_BITRATE        Opus bitrate when ffmpeg is available (default 24k)
+    AUDIO_VAD_THRESHOLD_DB    frames this far below the loudest frame count as silence (default -40)
+    AUDIO_VAD_PADDING_MS      audio kept before and after the detected speech (default 250)
+    FFMPEG_BINARY             ffmpeg executable (default: ffmpeg on PATH)
+"""
+import io
+import os
+import time
+import wave
+import shutil
+import logging
+import tempfile
+import threading
+import subprocess
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FRAME_MS = 20
+
+# Absolute floor for the VAD: a note that is quiet throughout is not trimmed to its loudest breath
+SILENCE_FLOOR_DB = -60.0
+
+
+def _env_flag(name, default):
+    return os.getenv(name, default).lower() in ('1', 'true', 'yes', 'on')
+
+
+def ffmpeg_path():
+    return shutil.which(os.getenv('FFMPEG_BINARY', 'ffmpeg'))
+
+
+def _extension(file_name):
+    return os.path.splitext(file_name or '')[1].lower()
+
+
+def read_wav(audio):
+    """(samples as float32 [frames, channels] in -1..1, sample rate) of a PCM WAV, or None if it is not one"""
+    try:
+        with wave.open(io.BytesIO(audio), 'rb') as wav:
+            width, channels, rate = wav.getsampwidth(), wav.getnchannels(), wav.getframerate()
+            frames = wav.readframes(wav.getnframes())
+    except (wave.Error, EOFError):
+        return None
+    if width == 1:
+        samples = (np.frombuffer(frames, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif width == 2:
+        samples = np.frombuffer(frames, dtype='<i2').astype(np.float32) / 32768.0
+    elif width == 3:
+        raw = np.frombuffer(frames, dtype=np.uint8).reshape(-1, 3)
+        ints = (raw[:, 0].astype(np.int32) | (raw[:, 1].astype(np.int32) << 8) | (raw[:, 2].astype(np.int32) << 16))
+        samples = (np.where(ints >= 1 << 23, ints - (1 << 24), ints)).astype(np.float32) / float(1 << 23)
+    elif width == 4:
+        samples = np.frombuffer(frames, dtype='<i4').astype(np.float32) / float(1 << 31)
+    else:
+        return None
+    return samples.reshape(-1, channels), rate
+
+
+def write_wav(samples, rate):
+    """16-bit mono PCM WAV bytes of float samples"""
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767.0).astype('<i2')
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+
+def downmix(samples):
+    return samples.mean(axis=1) if samples.ndim == 2 else samples
+
+
+def resample(samples, src_rate, dst_rate):
+    """Band-limited resampling in the frequency domain (drops everything above the new Nyquist)"""
+    if src_rate == dst_rate or len(samples) == 0:
+        return samples.astype(np.float32)
+    count = max(1, int(round(len(samples) * dst_rate / src_rate)))
+    spectrum = np.fft.rfft(samples)
+    resampled = np.fft.irfft(spectrum[:count // 2 + 1], n=count) * (count / len(samples))
+    return resampled.astype(np.float32)
+
+
+def frame_energy_db(samples, rate):
+    """(frame length in samples, energy in dB of every whole FRAME_MS frame)"""
+    frame = max(1, rate * FRAME_MS // 1000)
+    frames = len(samples) // frame
+    energy = np.square(samples[:frames * frame].reshape(frames, frame), dtype=np.float64).mean(axis=1)
+    return frame, 10.0 * np.log10(energy + 1e-12)
+
+
+def speech_bounds(samples, rate, threshold_db=-40.0, padding_ms=250):
+    """
+    (start, end) sample indices of the audio between the first and the last
+    frame whose energy is within threshold_db of the loudest frame, padded by
+    padding_ms. The whole clip when no frame qualifies.
+    """
+    frame, db = frame_energy_db(samples, rate)
+    if len(db) == 0:
+        return 0, len(samples)
+    voiced = np.flatnonzero(db >= max(db.max() + threshold_db, SILENCE_FLOOR_DB))
+    if len(voiced) == 0:
+        return 0, len(samples)
+    padding = rate * padding_ms // 1000
+    return max(0, voiced[0] * frame - padding), min(len(samples), (voiced[-1] + 1) * frame + padding)
+
+
+def silence_cuts(samples, rate, segment_seconds, pause_ms=300):
+    """
+    Sample indices to cut a long recording at so that no piece is longer than
+    1.5 x segment_seconds. Each cut is in the quietest pause_ms stretch between
+    0.5 x and 1.5 x segment_seconds after the previous one, so words are not
+    split when the speaker pauses at all.
+    """
+    frame, db = frame_energy_db(samples, rate)
+    target = max(1, int(segment_seconds * 1000 / FRAME_MS))
+    if len(db) <= target * 3 // 2:
+        return []
+    width = max(1, pause_ms // FRAME_MS)
+    smoothed = np.convolve(db, np.ones(width) / width, mode='same')
+    cuts, position = [], 0
+    while len(db) - position > target * 3 // 2:
+        low, high = position + target // 2, position + target * 3 // 2
+        position = low + int(np.argmin(smoothed[low:high]))
+        cuts.append(position * frame)
+    return cuts
+
+
+class AudioCompactor:
+    """Shrinks voice notes before they are sent to a provider (AUDIO_PREPROCESS=true)"""
+
+    def __init__(self):
+        self.sample_rate = int(os.getenv('AUDIO_SAMPLE_RATE', '16000'))
+        self.opus_bitrate = os.getenv('AUDIO_OPUS_BITRATE', '24k')
+        self.threshold_db = float(os.getenv('AUDIO_VAD_THRESHOLD_DB', '-40'))
+        self.padding_ms = int(os.getenv('AUDIO_VAD_PADDING_MS', '250'))
+        self._lock = threading.Lock()
+        self._compacted = 0
+        self._skipped = 0
+        self._bytes_in = 0
+        self._bytes_out = 0
+        self._seconds = 0.0
+
+    @staticmethod
+    def is_enabled():
+        return _env_flag('AUDIO_PREPROCESS', 'false')
+
+    def _ffmpeg(self, args, stdin=None):
+        result = subprocess.run([ffmpeg_path(), '-nostdin', '-hide_banner', '-loglevel', 'error'] + args,
+                                input=stdin, capture_output=True, timeout=60)
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.decode(errors='replace').strip() or 'ffmpeg failed')
+        return result.stdout
+
+    def decode(self, file_name, audio):
+        """Mono float32 samples at the target rate, or None when the format cannot be decoded here"""
+        wav = read_wav(audio)
+        if wav is not None:
+            samples, rate = wav
+            return resample(downmix(samples), rate, self.sample_rate)
+        if ffmpeg_path() is None:
+            return None
+        # Containers like m4a keep their index at the end, so ffmpeg gets a seekable file rather than a pipe
+        with tempfile.NamedTemporaryFile(suffix=_extension(file_name)) as source:
+            source.write(audio)
+            source.flush()
+            pcm = self._ffmpeg(['-i', source.name, '-ac', '1', '-ar', str(self.sample_rate), '-f', 'f32le', 'pipe:1'])
+        return np.frombuffer(pcm, dtype='<f4')
+
+    def encode(self, samples):
+        """(extension, bytes): Ogg/Opus with ffmpeg, 16-bit WAV otherwise"""
+        if ffmpeg_path() is not None:
+            try:
+                encoded = self._ffmpeg([
+                    '-f', 'f32le', '-ar', str(self.sample_rate), '-ac', '1', '-i', 'pipe:0',
+                    '-c:a', 'libopus', '-b:a', self.opus_bitrate, '-application', 'voip', '-f', 'ogg', 'pipe:1',
+                ], stdin=samples.astype('<f4').tobytes())
+                return '.ogg', encoded
+            except (OSError, RuntimeError, subprocess.TimeoutExpired) as e:
+                logger.warning(f"Opus encoding failed, sending WAV: {e}")
+        return '.wav', write_wav(samples, self.sample_rate)
+
+    def compact(self, file_name, audio):
+        """
+        (file name, bytes) to upload instead of the original voice note. The
+        original is returned when it cannot be decoded or compaction does not
+        make it smaller.
+        """
+        start = time.perf_counter()
+        try:
+            samples = self.decode(file_name, audio)
+            if samples is None or len(samples) == 0:
+                return self._keep(file_name, audio)
+            begin, end = speech_bounds(samples, self.sample_rate, self.threshold_db, self.padding_ms)
+            extension, compacted = self.encode(samples[begin:end])
+        except (OSError, RuntimeError, ValueError, subprocess.TimeoutExpired) as e:
+            logger.warning(f"Audio compaction failed for {file_name}, sending the original: {e}")
+            return self._keep(file_name, audio)
+        if len(compacted) >= len(audio):
+            return self._keep(file_name, audio)
+
+        with self._lock:
+            self._compacted += 1
+            self._bytes_in += len(audio)
+            self._bytes_out += len(compacted)
+            self._seconds += time.perf_counter() - start
+        return os.path.splitext(file_name or 'audio')[0] + extension, compacted
+
+    def segments(self, file_name, audio, segment_seconds):
+        """
+        [(file name, bytes)] of a long voice note cut at pauses into pieces of
+        about segment_seconds, in order; None when it is short enough to send
+        whole or cannot be decoded here.
+        """
+        try:
+            samples = self.decode(file_name, audio)
+            if samples is None:
+                return None
+            if self.is_enabled():
+                begin, end = speech_bounds(samples, self.sample_rate, self.threshold_db, self.padding_ms)
+                samples = samples[begin:end]
+            cuts = silence_cuts(samples, self.sample_rate, segment_seconds)
+            if not cuts:
+                return None
+            base = os.path.splitext(file_name or 'audio')[0]
+            pieces = []
+            for index, (start, end) in enumerate(zip([0] + cuts, cuts + [len(samples)])):
+                extension, encoded = self.encode(samples[start:end])
+                pieces.append((f"{base}.part{index}{extension}", encoded))
+            return pieces
+        except (OSError, RuntimeError, ValueError, subprocess.TimeoutExpired) as e:
+            logger.warning(f"Could not split {file_name} into segments, sending it whole: {e}")
+            return None
+
+    def _keep(self, file_name, audio):
+        with self._lock:
+            self._skipped += 1
+        return file_name, audio
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': self.is_enabled(),
+                'ffmpeg': ffmpeg_path() is not None,
+                'compacted': self._compacted,
+                'skipped': self._skipped,
+                'bytes_in': self._bytes_in,
+                'bytes_out': self._bytes_out,
+                'ratio': round(self._bytes_out / self._bytes_in, 3) if self._bytes_in else None,
+                'mean_ms': round(self._seconds * 1000 / self._compacted, 1) if self._compacted else None,
+            }
+
+
+audio_compactor = AudioCompactor()
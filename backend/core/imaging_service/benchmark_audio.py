@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Audio Compaction Benchmark Script
+
+Runs every voice note in a fixture directory through the audio compaction
+stage (mono, 16 kHz, silence trim, re-encode) and reports uploaded bytes,
+duration before and after trimming, and compaction time.
+
+With --provider it also transcribes the original and the compacted note with
+that STT provider (its API key must be set) and compares provider latency and
+the two transcripts. A reference transcript next to a fixture (same name,
+.txt) adds the word error rate of both against it.
+
+Without --audio-dir, synthetic 48 kHz stereo WAV notes with leading and
+trailing silence are generated, which only exercises sizes and timings.
+
+Usage:
+    python benchmark_audio.py [--audio-dir PATH] [--provider whisper|deepgram|gemini] [--language hi] [--iterations 5]
+"""
+
+import io
+import os
+import sys
+import time
+import glob
+import wave
+import argparse
+import difflib
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from imaging_service.audio_preprocess import AudioCompactor, ffmpeg_path
+
+AUDIO_EXTENSIONS = ('.wav', '.webm', '.ogg', '.mp3', '.m4a')
+
+
+def synthetic_note(seconds=6.0, lead=1.5, tail=2.0, rate=48000, seed=0):
+    """Stereo 16-bit WAV: silence, a voiced harmonic signal with syllable-like bursts, silence"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * rate)) / rate
+    pitch = 140 + 30 * np.sin(2 * np.pi * 0.7 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / rate
+    voice = sum(np.sin(k * phase) / k for k in range(1, 8))
+    syllables = 0.5 + 0.5 * np.sin(2 * np.pi * 4 * t) ** 2
+    speech = 0.3 * voice * syllables / np.abs(voice).max()
+    note = np.concatenate([np.zeros(int(lead * rate)), speech, np.zeros(int(tail * rate))])
+    note = note + rng.normal(0, 0.001, len(note))
+    stereo = np.stack([note, 0.9 * note], axis=1)
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(2)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes((np.clip(stereo, -1, 1) * 32767).astype('<i2').tobytes())
+    return buffer.getvalue()
+
+
+def load_fixtures(audio_dir):
+    """(name, bytes, reference transcript or None) for every voice note in the directory"""
+    fixtures = []
+    for path in sorted(glob.glob(os.path.join(audio_dir, '*'))):
+        if os.path.splitext(path)[1].lower() not in AUDIO_EXTENSIONS:
+            continue
+        with open(path, 'rb') as f:
+            data = f.read()
+        reference_path = os.path.splitext(path)[0] + '.txt'
+        reference = None
+        if os.path.exists(reference_path):
+            with open(reference_path, encoding='utf-8') as f:
+                reference = f.read().strip()
+        fixtures.append((os.path.basename(path), data, reference))
+    return fixtures
+
+
+def duration(compactor, name, data):
+    """Seconds of audio at the compactor's sample rate, or None when it cannot be decoded"""
+    samples = compactor.decode(name, data)
+    return None if samples is None else len(samples) / compactor.sample_rate
+
+
+def word_error_rate(reference, hypothesis):
+    ref, hyp = reference.lower().split(), hypothesis.lower().split()
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    # Levenshtein distance over words
+    row = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        previous, row[0] = row[0], i
+        for j, h in enumerate(hyp, 1):
+            previous, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, previous + (r != h))
+    return row[-1] / len(ref)
+
+
+def get_transcriber(provider):
+    if provider == 'whisper':
+        from imaging_service.stt_whisper import WhisperTranscriber
+        return WhisperTranscriber.get_instance()
+    if provider == 'deepgram':
+        from imaging_service.stt_deepgram import DeepgramTranscriber
+        return DeepgramTranscriber.get_instance()
+    from imaging_service.stt_gemini import GeminiTranscriber
+    return GeminiTranscriber.get_instance()
+
+
+def timed_transcript(transcriber, name, data, language):
+    start = time.perf_counter()
+    transcript = transcriber.transcribe_file(name, data, language)
+    return transcript, (time.perf_counter() - start) * 1000
+
+
+def benchmark(fixtures, iterations, provider, language):
+    compactor = AudioCompactor()
+    transcriber = get_transcriber(provider) if provider else None
+    if transcriber is not None and not transcriber.is_configured():
+        print(f"{provider} is not configured, set its API key")
+        return False
+
+    print("=" * 60)
+    print(f"AUDIO COMPACTION BENCHMARK ({len(fixtures)} notes, ffmpeg={'yes' if ffmpeg_path() else 'no'})")
+    print("=" * 60)
+
+    total_in = total_out = 0
+    for name, data, reference in fixtures:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            compact_name, compacted = compactor.compact(name, data)
+        compact_ms = (time.perf_counter() - start) * 1000 / iterations
+        total_in += len(data)
+        total_out += len(compacted)
+
+        before, after = duration(compactor, name, data), duration(compactor, compact_name, compacted)
+        print(f"\n{name} -> {compact_name}")
+        print(f"  bytes={len(data)} -> {len(compacted)} ({len(compacted) / len(data):.1%})  "
+              f"compaction={compact_ms:.1f}ms")
+        if before is not None and after is not None:
+            print(f"  duration={before:.2f}s -> {after:.2f}s")
+
+        if transcriber is None:
+            continue
+        original, original_ms = timed_transcript(transcriber, name, data, language)
+        compact, provider_ms = timed_transcript(transcriber, compact_name, compacted, language)
+        similarity = difflib.SequenceMatcher(None, original.lower().split(), compact.lower().split()).ratio()
+        print(f"  {provider} latency={original_ms:.0f}ms -> {provider_ms + compact_ms:.0f}ms "
+              f"(incl. compaction)  transcript similarity={similarity:.2f}")
+        print(f"    original:  {original}")
+        print(f"    compacted: {compact}")
+        if reference is not None:
+            print(f"  WER original={word_error_rate(reference, original):.2f}  "
+                  f"compacted={word_error_rate(reference, compact):.2f}")
+
+    print(f"\nTotal bytes {total_in} -> {total_out} ({total_out / max(total_in, 1):.1%})")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compare voice notes before and after audio compaction')
+    parser.add_argument('--audio-dir', help='Directory of voice notes (.wav/.webm/.ogg/.mp3/.m4a, optional .txt references)')
+    parser.add_argument('--provider', choices=['whisper', 'deepgram', 'gemini'], help='Also transcribe with this provider')
+    parser.add_argument('--language', default=None)
+    parser.add_argument('--iterations', type=int, default=5)
+    args = parser.parse_args()
+
+    if args.audio_dir:
+        fixtures = load_fixtures(args.audio_dir)
+        if not fixtures:
+            print(f"No voice notes found in {args.audio_dir}")
+            sys.exit(1)
+    else:
+        fixtures = [(f"synthetic_{i}.wav", synthetic_note(seconds=3.0 + 3 * i, seed=i), None) for i in range(3)]
+
+    if not benchmark(fixtures, args.iterations, args.provider, args.language):
+        sys.exit(1)
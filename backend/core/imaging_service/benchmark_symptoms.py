@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Symptom Extraction Benchmark Script
+
+Measures extract_symptoms throughput against the original implementation
+(one re.search per lexicon variant plus all negation patterns per hit) on a
+generated corpus of transcripts mixing lexicon variants, negation cues,
+filler words and substring edge cases, and how both scale with transcript
+length.
+
+Checks that the test_hindi_symptoms.py inputs get the same flags as before
+and that the negation scope and fuzzy cases below get their expected flags,
+exiting non-zero otherwise. The generated corpus only drives the timings: on
+it the two differ by design (token matching, negation scopes, affirmed
+mentions winning), so it is no parity check.
+
+Usage:
+    python benchmark_symptoms.py [--transcripts 2000] [--iterations 5] [--seed 0]
+"""
+
+import os
+import re
+import sys
+import time
+import random
+import argparse
+
+sys.path.append(os.path.dirname(__file__))
+
+from nlp_symptoms import NEGATION_PATTERNS, SYMPTOM_LEXICON, extract_symptoms, extract_symptoms_batch, normalize_text
+
+# The inputs of test_hindi_symptoms.py
+HINDI_TEST_INPUTS = [
+    'I have khashi', 'I have jukam', 'I have sar dard', 'I have seena dard', 'I have gala dard',
+    'I feel thakan', 'I have ghrana khamoshi', 'I have khashi and jukam', 'I do not have khashi',
+    'I have no jukam', 'no khashi', 'not jukam', 'I have no khashi', 'I do not have jukam',
+]
+
+# (transcript, language, symptoms expected present)
+SCOPE_CASES = [
+    ('no fever, cough or headache', None, set()),
+    ('no fever but cough since two days', None, {'cough'}),
+    ('denies chest pain. reports coughing at night', None, {'cough'}),
+    ('cough denied, fever present', None, {'fever'}),
+    ('patient denied cough and fever', None, set()),
+    ('not only cough but also fever', None, {'cough', 'fever'}),
+    ('no jukam last week but jukam since yesterday', None, {'fever'}),
+    ('mujhe buqar hai aur khansi bhi hai lekin seena dard nahi hai', 'hi', {'fever', 'cough'}),
+    ('nahi khansi', 'hi', set()),
+    ('nahi bukhar hai lekin khansi hai', 'hi', {'cough'}),
+    ('khansi nahi, bukhar hai', 'hi', {'fever'}),
+    ('khansi hai, buqar nahi', 'hi', {'cough'}),
+    ('ମୋର ଜ୍ୱର ନାହିଁ କିନ୍ତୁ ଖାସିଛି', 'or', {'cough'}),
+    # Punctuation and symbols around or between terms
+    ('(fever)', None, {'fever'}),
+    ('"cough"', None, {'cough'}),
+    ('[cough]', None, {'cough'}),
+    ('dry-cough', None, {'cough'}),
+    ('cough/fever', None, {'cough', 'fever'}),
+    ('fever+cough', None, {'fever', 'cough'}),
+    ('Sx: fever/cough/headache', None, {'fever', 'cough', 'headache'}),
+    ('“fever” & ‘cough’', None, {'fever', 'cough'}),
+    ('no fever/cough', None, set()),
+    ("doesn't have can’t smell or cough", None, set()),
+    ('ଗଳା ରେ ଯାତନା ନାହିଁ, ଖାସି ଅଛି', 'or', {'cough'}),
+]
+
+# (transcript, language, symptoms expected present) with fuzzy matching on
+FUZZY_CASES = [
+    ('mujhe khasi hai', 'hi', {'cough'}),
+    ('bahut thakaan hai', 'hi', {'fatigue'}),
+    ('mujhe bukhar hai aur seena darrd', 'hi', {'fever', 'chest_pain'}),
+    ('bukhar nahi hai, khasi hai', 'hi', {'cough'}),
+    ('ଖାସୀଛି', 'or', {'cough'}),
+    ('tough day, rough night', 'en', set()),
+    ('tough day', None, set()),
+    # Real words a lexicon term or two away, kept by the length floors and the lexicon's fuzzy_exclude
+    ('mujhe khushi hai', 'hi', set()),
+    ('sardar ji aaye', 'hi', set()),
+    ('I tried the medicine', 'hi', set()),
+    ('car tire', 'hi', set()),
+    ('good night, right side of the couch', 'hi', set()),
+    ('small shop, paint store', 'hi', set()),
+]
+
+FILLER = [
+    'patient', 'reports', 'since', 'three', 'days', 'and', 'with', 'mild', 'severe', 'at', 'night', 'mujhe',
+    'hai', 'aur', 'bhi', 'lekin', 'but', 'also', 'piano', 'casino', 'denied', 'I', 'have', 'feel', 'the',
+    'ମୋର', 'ଅଛି', 'ଏବଂ', 'କିନ୍ତୁ', 'temperature', 'chest', 'pain', 'throat', 'smell', 'high',
+]
+
+
+def legacy_extract_symptoms(transcript):
+    """The previous extract_symptoms: a search per variant, and per hit a search per negation pattern"""
+    text = normalize_text(transcript)
+    findings = {}
+    for key, variants in SYMPTOM_LEXICON.items():
+        present = False
+        negated = False
+        for variant in variants:
+            pattern = re.escape(variant)
+            if re.search(pattern, text):
+                present = True
+                for neg_tpl in NEGATION_PATTERNS:
+                    neg_regex = neg_tpl.format(term=pattern)
+                    if re.search(neg_regex, text):
+                        negated = True
+                        break
+            if present and negated:
+                break
+        findings[key] = True if (present and not negated) else False
+    return findings
+
+
+def generate_corpus(count, seed):
+    """Transcripts of 5-60 tokens: filler, lexicon variants, negation cues, sometimes glued or upper-cased"""
+    rng = random.Random(seed)
+    variants = [variant for terms in SYMPTOM_LEXICON.values() for variant in terms]
+    cues = [re.sub(r'\\(.)', r'\1', re.sub(r'\\s\+\{term\}$', '', pattern)) for pattern in NEGATION_PATTERNS]
+    corpus = []
+    for _ in range(count):
+        tokens = []
+        for _ in range(rng.randint(5, 60)):
+            roll = rng.random()
+            if roll < 0.2:
+                tokens.append(rng.choice(variants))
+            elif roll < 0.3:
+                tokens.append(rng.choice(cues) + ' ' + rng.choice(variants))
+            elif roll < 0.33:
+                # Cue or variant glued to a neighbour, e.g. "pianocough"
+                tokens.append(rng.choice(FILLER) + rng.choice(cues + variants))
+            else:
+                tokens.append(rng.choice(FILLER))
+        text = '  '.join(tokens) if rng.random() < 0.1 else ' '.join(tokens)
+        corpus.append(text.upper() if rng.random() < 0.05 else text)
+    return corpus
+
+
+def scaling(fn, corpus, tokens, iterations):
+    """Microseconds per token on one transcript of about `tokens` tokens built from the corpus"""
+    words = ' '.join(corpus).split()
+    transcript = ' '.join((words * (tokens // max(len(words), 1) + 1))[:tokens])
+    best = float('inf')
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn(transcript)
+        best = min(best, time.perf_counter() - start)
+    return best * 1e6 / tokens
+
+
+def throughput(fn, corpus, iterations):
+    """Transcripts per second, best of iterations"""
+    best = float('inf')
+    for _ in range(iterations):
+        start = time.perf_counter()
+        for transcript in corpus:
+            fn(transcript)
+        best = min(best, time.perf_counter() - start)
+    return len(corpus) / best
+
+
+def batch_throughput(corpus, workers):
+    """Transcripts per second through extract_symptoms_batch, worker start-up included"""
+    start = time.perf_counter()
+    for _ in extract_symptoms_batch(corpus, workers=workers):
+        pass
+    return len(corpus) / (time.perf_counter() - start)
+
+
+def benchmark(transcripts, iterations, seed, workers):
+    corpus = generate_corpus(transcripts, seed)
+
+    print("=" * 60)
+    print(f"SYMPTOM EXTRACTION BENCHMARK ({len(corpus)} transcripts, {iterations} iterations)")
+    print("=" * 60)
+
+    ok = True
+    for text in HINDI_TEST_INPUTS:
+        if extract_symptoms(text) != legacy_extract_symptoms(text):
+            ok = False
+            print(f"MISMATCH: {text!r}\n  legacy={legacy_extract_symptoms(text)}\n  new=   {extract_symptoms(text)}")
+    for text, language, expected in SCOPE_CASES:
+        present = {key for key, value in extract_symptoms(text, language).items() if value}
+        if present != expected:
+            ok = False
+            print(f"SCOPE: {text!r} ({language}) expected {sorted(expected)}, got {sorted(present)}")
+    for text, language, expected in FUZZY_CASES:
+        present = {key for key, value in extract_symptoms(text, language, fuzzy=True).items() if value}
+        if present != expected:
+            ok = False
+            print(f"FUZZY: {text!r} ({language}) expected {sorted(expected)}, got {sorted(present)}")
+    print(f"test_hindi_symptoms inputs, {len(SCOPE_CASES)} scope and {len(FUZZY_CASES)} fuzzy cases: "
+          f"{'OK' if ok else 'FAILED'}")
+
+    before = throughput(legacy_extract_symptoms, corpus, iterations)
+    after = throughput(extract_symptoms, corpus, iterations)
+    print(f"\n  original {before:10.0f} transcripts/s")
+    print(f"  current  {after:10.0f} transcripts/s  ({after / before:.1f}x)")
+    fuzzy = throughput(lambda text: extract_symptoms(text, 'hi', fuzzy=True), corpus, iterations)
+    print(f"  fuzzy    {fuzzy:10.0f} transcripts/s  (hi, up to 2 edits)")
+    if workers > 1:
+        batched = batch_throughput(corpus * 10, workers)
+        print(f"  batch    {batched:10.0f} transcripts/s  ({workers} worker processes, {len(corpus) * 10} transcripts)")
+
+    print("\nScaling with transcript length (us per token):")
+    for tokens in (50, 500, 5000, 50000):
+        current = scaling(extract_symptoms, corpus, tokens, iterations)
+        original = scaling(legacy_extract_symptoms, corpus, tokens, iterations) if tokens <= 5000 else None
+        print(f"  {tokens:6d} tokens  current={current:6.2f}" +
+              (f"  original={original:6.2f}" if original is not None else ''))
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark extract_symptoms against the per-variant regex version')
+    parser.add_argument('--transcripts', type=int, default=2000)
+    parser.add_argument('--iterations', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Processes for the extract_symptoms_batch measurement (1 skips it)')
+    args = parser.parse_args()
+
+    if not benchmark(args.transcripts, args.iterations, args.seed, args.workers):
+        sys.exit(1)
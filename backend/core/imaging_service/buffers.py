@@ -0,0 +1,36 @@
+"""In-memory buffers (uploads, mapped files) exposed as files, without any Django dependency"""
+import io
+
+
+class BufferReader(io.RawIOBase):
+    """Seekable binary file over a memoryview, so decoders can read a mapped upload without copying it"""
+
+    def __init__(self, buffer):
+        super().__init__()
+        self._buffer = buffer
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, b):
+        n = min(len(b), len(self._buffer) - self._pos)
+        if n <= 0:
+            return 0
+        b[:n] = self._buffer[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self._buffer)
+        self._pos = max(0, offset)
+        return self._pos
+
+    def tell(self):
+        return self._pos
@@ -0,0 +1,168 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class TieredCache:
+    """
+    Bounded in-memory LRU cache with a TTL, optionally backed by a SQLite file so
+    entries survive process restarts. Values must be JSON-serializable.
+
+    Configured from environment variables sharing a prefix, e.g. for
+    prefix PREDICTION_CACHE:
+        PREDICTION_CACHE          'false' disables the cache (default: enabled)
+        PREDICTION_CACHE_SIZE     max in-memory entries
+        PREDICTION_CACHE_TTL      entry lifetime in seconds
+        PREDICTION_CACHE_DB       path of the SQLite file (unset: memory only)
+        PREDICTION_CACHE_DB_SIZE  max rows in the SQLite file
+
+    The SQLite tier is pruned every PRUNE_INTERVAL writes: expired rows are
+    deleted, then the rows closest to expiry while it holds more than
+    max_db_entries.
+    """
+    PRUNE_INTERVAL = 256
+
+    def __init__(self, name, max_entries=1024, ttl_seconds=86400, db_path=None, enabled=True,
+                 max_db_entries=100000):
+        self.name = name
+        self.max_entries = max(1, int(max_entries))
+        self.max_db_entries = max(1, int(max_db_entries))
+        self.ttl_seconds = float(ttl_seconds)
+        self.enabled = enabled
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._writes = 0
+        self._hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._disk_evictions = 0
+        if enabled and db_path:
+            self._open_db(db_path)
+
+    @classmethod
+    def from_env(cls, prefix, name, default_size=1024, default_ttl=86400):
+        return cls(
+            name=name,
+            max_entries=int(os.getenv(f'{prefix}_SIZE', str(default_size))),
+            ttl_seconds=float(os.getenv(f'{prefix}_TTL', str(default_ttl))),
+            db_path=os.getenv(f'{prefix}_DB') or None,
+            max_db_entries=int(os.getenv(f'{prefix}_DB_SIZE', '100000')),
+            enabled=os.getenv(prefix, 'true').lower() in ('1', 'true', 'yes', 'on'),
+        )
+
+    def _open_db(self, db_path):
+        try:
+            self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute(
+                f'CREATE TABLE IF NOT EXISTS "{self.name}" '
+                '(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)'
+            )
+            self._db.execute(
+                f'CREATE INDEX IF NOT EXISTS "{self.name}_expires_at" ON "{self.name}" (expires_at)'
+            )
+            self._prune()
+        except sqlite3.Error as e:
+            logger.error(f"Disabling persistent tier of {self.name} cache: {str(e)}")
+            self._db = None
+
+    def _prune(self):
+        """Delete expired rows, then the ones closest to expiry beyond max_db_entries"""
+        self._db.execute(f'DELETE FROM "{self.name}" WHERE expires_at < ?', (time.time(),))
+        excess = self._db.execute(f'SELECT COUNT(*) FROM "{self.name}"').fetchone()[0] - self.max_db_entries
+        if excess > 0:
+            self._db.execute(
+                f'DELETE FROM "{self.name}" WHERE key IN '
+                f'(SELECT key FROM "{self.name}" ORDER BY expires_at LIMIT ?)', (excess,)
+            )
+            self._disk_evictions += excess
+
+    def get(self, key):
+        """Return the cached value, or None on a miss"""
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at >= now:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return value
+                del self._entries[key]
+
+            if self._db is not None:
+                try:
+                    row = self._db.execute(
+                        f'SELECT value, expires_at FROM "{self.name}" WHERE key = ?', (key,)
+                    ).fetchone()
+                except sqlite3.Error as e:
+                    logger.error(f"{self.name} cache read failed: {str(e)}")
+                    row = None
+                if row is not None and row[1] >= now:
+                    value = json.loads(row[0])
+                    self._store(key, value, row[1])
+                    self._hits += 1
+                    self._disk_hits += 1
+                    return value
+
+            self._misses += 1
+            return None
+
+    def set(self, key, value):
+        if not self.enabled:
+            return
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._store(key, value, expires_at)
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        f'INSERT OR REPLACE INTO "{self.name}" (key, value, expires_at) VALUES (?, ?, ?)',
+                        (key, json.dumps(value), expires_at)
+                    )
+                    self._writes += 1
+                    if self._writes % self.PRUNE_INTERVAL == 0:
+                        self._prune()
+                except sqlite3.Error as e:
+                    logger.error(f"{self.name} cache write failed: {str(e)}")
+
+    def _store(self, key, value, expires_at):
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute(f'DELETE FROM "{self.name}"')
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'enabled': self.enabled,
+                'persistent': self._db is not None,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self._hits,
+                'disk_hits': self._disk_hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+                'max_db_entries': self.max_db_entries,
+                'disk_evictions': self._disk_evictions,
+                'hit_rate': round(self._hits / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,230 @@
+import io
+import math
+import time
+from collections.abc import Sequence
+
+import numpy as np
+from PIL import Image
+
+from .model.preprocess import reduce_factor, to_model_input
+from .buffers import BufferReader
+from .uploads import upload_buffer
+
+# pydicom is optional: without it DICOM uploads are rejected with a clear error
+try:
+    import pydicom
+    from pydicom.encaps import generate_frames
+    PYDICOM_AVAILABLE = True
+except ImportError:
+    pydicom = None
+    generate_frames = None
+    PYDICOM_AVAILABLE = False
+
+PIXEL_DATA_TAG = 0x7FE00010
+
+# Elements larger than this are not read while parsing the header
+DEFER_SIZE = 1024
+
+# Transfer syntaxes whose pixels are read directly from the (memory-mapped) upload
+NATIVE_SYNTAXES = {
+    '1.2.840.10008.1.2',      # Implicit VR Little Endian
+    '1.2.840.10008.1.2.1',    # Explicit VR Little Endian
+}
+# 8-bit baseline JPEG: Pillow decodes at 1/2..1/8 scale (draft mode)
+JPEG_SYNTAXES = {'1.2.840.10008.1.2.4.50'}
+# JPEG 2000: Pillow skips the finest wavelet resolution levels
+JPEG2000_SYNTAXES = {'1.2.840.10008.1.2.4.90', '1.2.840.10008.1.2.4.91'}
+
+SEX_TO_GENDER = {'M': 'male', 'F': 'female', 'O': 'other'}
+
+
+class DicomError(Exception):
+    """Raised for DICOM uploads that cannot be read (corrupt file, unsupported codec, pydicom missing)"""
+
+
+def is_dicom(buffer):
+    """DICOM Part 10 files carry the 'DICM' magic after a 128-byte preamble"""
+    return len(buffer) >= 132 and bytes(buffer[128:132]) == b'DICM'
+
+
+def read_header(buffer, stop_before_pixels=False):
+    """
+    Parse the DICOM header without touching pixel data: elements over
+    DEFER_SIZE bytes (PixelData in particular) are only located, not read.
+    """
+    if not PYDICOM_AVAILABLE:
+        raise DicomError('DICOM support requires the pydicom package')
+    try:
+        return pydicom.dcmread(BufferReader(buffer), defer_size=DEFER_SIZE, stop_before_pixels=stop_before_pixels)
+    except Exception as e:
+        raise DicomError(f'Invalid DICOM file: {str(e)}')
+
+
+def patient_info(ds):
+    """Birthdate (YYYY-MM-DD) and gender from a parsed header, in the form the views accept"""
+    info = {}
+    birthdate = str(ds.get('PatientBirthDate') or '').strip()
+    if len(birthdate) == 8 and birthdate.isdigit():
+        info['birthdate'] = f'{birthdate[:4]}-{birthdate[4:6]}-{birthdate[6:]}'
+    gender = SEX_TO_GENDER.get(str(ds.get('PatientSex') or '').strip().upper())
+    if gender:
+        info['gender'] = gender
+    return info
+
+
+def scan_patient_info(image_file):
+    """Patient metadata from an uploaded scan's DICOM header; empty for other image formats"""
+    with upload_buffer(image_file) as buffer:
+        if not is_dicom(buffer):
+            return {}
+        return patient_info(read_header(buffer, stop_before_pixels=True))
+
+
+def _first_value(value):
+    if value is None:
+        return None
+    if isinstance(value, Sequence):
+        # Multi-valued window (several presets): use the first one
+        return float(value[0]) if len(value) else None
+    return float(value)
+
+
+def _block_mean(pixels, factor):
+    """Downsample by averaging factor x factor blocks (vectorized, float32)"""
+    if factor <= 1:
+        return pixels.astype(np.float32)
+    height = pixels.shape[0] // factor * factor
+    width = pixels.shape[1] // factor * factor
+    # Sum runs of columns, then runs of rows: two passes over contiguous memory
+    # instead of one strided 4-D reduction
+    sums = np.add.reduceat(pixels[:height, :width], np.arange(0, width, factor), axis=1, dtype=np.float32)
+    sums = np.add.reduceat(sums, np.arange(0, height, factor), axis=0)
+    sums *= 1.0 / (factor * factor)
+    return sums
+
+
+def _native_pixels(ds, buffer, element):
+    """First frame of uncompressed pixel data, read in place from the upload buffer"""
+    rows, columns = int(ds.Rows), int(ds.Columns)
+    samples = int(ds.get('SamplesPerPixel', 1))
+    bits = int(ds.BitsAllocated)
+    if bits not in (8, 16, 32):
+        raise DicomError(f'Unsupported BitsAllocated: {bits}')
+    signed = int(ds.get('PixelRepresentation', 0)) == 1
+    dtype = np.dtype(f"<{'i' if signed else 'u'}{bits // 8}")
+    count = rows * columns * samples
+    if element.value_tell + count * dtype.itemsize > len(buffer):
+        raise DicomError('DICOM pixel data is truncated')
+
+    pixels = np.frombuffer(buffer, dtype=dtype, count=count, offset=element.value_tell)
+    if samples > 1:
+        # Color-by-pixel RGB: average the channels
+        pixels = pixels.reshape(rows, columns, samples).mean(axis=2, dtype=np.float32)
+    else:
+        pixels = pixels.reshape(rows, columns)
+    return _block_mean(pixels, reduce_factor((columns, rows)))
+
+
+def _first_frame(ds, buffer, element):
+    reader = BufferReader(buffer)
+    reader.seek(element.value_tell)
+    return next(generate_frames(reader, number_of_frames=int(ds.get('NumberOfFrames', 1) or 1)))
+
+
+def _compressed_pixels(ds, buffer, element, syntax):
+    """First frame of encapsulated pixel data, decoded at reduced resolution where the codec allows"""
+    rows, columns = int(ds.Rows), int(ds.Columns)
+    factor = reduce_factor((columns, rows))
+    img = Image.open(io.BytesIO(_first_frame(ds, buffer, element)))
+    if syntax in JPEG_SYNTAXES:
+        img.draft(img.mode, (columns // factor, rows // factor))
+    elif factor > 1:
+        # Each discarded resolution level halves the decoded size
+        img.reduce = int(math.log2(factor))
+    img.load()
+    pixels = np.asarray(img)
+    if pixels.ndim == 3:
+        pixels = pixels.mean(axis=2, dtype=np.float32)
+    return _block_mean(pixels, reduce_factor((pixels.shape[1], pixels.shape[0])))
+
+
+def _decoded_pixels(buffer):
+    """Codecs Pillow cannot read (JPEG-LS, RLE, lossless JPEG) go through pydicom's pixel handlers"""
+    try:
+        ds = pydicom.dcmread(BufferReader(buffer))
+        pixels = ds.pixel_array
+    except Exception as e:
+        raise DicomError(f'Cannot decode DICOM pixel data: {str(e)}')
+    if int(ds.get('NumberOfFrames', 1) or 1) > 1:
+        pixels = pixels[0]
+    if pixels.ndim == 3:
+        pixels = pixels.mean(axis=2, dtype=np.float32)
+    return _block_mean(pixels, reduce_factor((pixels.shape[1], pixels.shape[0])))
+
+
+def window_to_uint8(pixels, ds):
+    """
+    Map stored values to 8-bit display values in place: modality rescale,
+    then the header's linear VOI window (min/max of the image if it has none),
+    inverted for MONOCHROME1.
+    """
+    slope = float(ds.get('RescaleSlope', 1) or 1)
+    intercept = float(ds.get('RescaleIntercept', 0) or 0)
+    if slope != 1:
+        pixels *= slope
+    if intercept:
+        pixels += intercept
+
+    center = _first_value(ds.get('WindowCenter'))
+    width = _first_value(ds.get('WindowWidth'))
+    if center is None or width is None or width < 1:
+        if int(ds.get('BitsStored', ds.get('BitsAllocated', 8))) <= 8:
+            low, high = 0.0, 255.0
+        else:
+            low, high = float(pixels.min()), float(pixels.max())
+    else:
+        low = center - 0.5 - (width - 1) / 2
+        high = center - 0.5 + (width - 1) / 2
+
+    pixels -= low
+    pixels *= 255.0 / max(high - low, 1e-6)
+    np.clip(pixels, 0, 255, out=pixels)
+    if str(ds.get('PhotometricInterpretation', 'MONOCHROME2')).upper() == 'MONOCHROME1':
+        np.subtract(255, pixels, out=pixels)
+    np.rint(pixels, out=pixels)
+    return pixels.astype(np.uint8)
+
+
+def preprocess_dicom(buffer, timings=None):
+    """
+    Turn a DICOM upload into the (150, 150, 1) float32 model input.
+
+    Only the first frame is used. Native pixel data is read in place from the
+    buffer and block-averaged; JPEG and JPEG 2000 frames are decoded at
+    reduced resolution by Pillow; other codecs need pydicom pixel handlers
+    (e.g. pylibjpeg) and are decoded at full size.
+    """
+    start = time.perf_counter()
+    ds = read_header(buffer)
+    element = ds.get_item(PIXEL_DATA_TAG, keep_deferred=True)
+    if element is None:
+        raise DicomError('DICOM file has no pixel data')
+
+    syntax = str(ds.file_meta.TransferSyntaxUID)
+    if getattr(element, 'value_tell', None) is None:
+        # Small enough to have been read with the header
+        pixels = _decoded_pixels(buffer)
+    elif syntax in NATIVE_SYNTAXES:
+        pixels = _native_pixels(ds, buffer, element)
+    elif syntax in JPEG_SYNTAXES or syntax in JPEG2000_SYNTAXES:
+        try:
+            pixels = _compressed_pixels(ds, buffer, element, syntax)
+        except (OSError, StopIteration, ValueError):
+            pixels = _decoded_pixels(buffer)
+    else:
+        pixels = _decoded_pixels(buffer)
+
+    img = Image.fromarray(window_to_uint8(pixels, ds))
+    if timings is not None:
+        timings['decode'] = (time.perf_counter() - start) * 1000
+    return to_model_input(img, timings)
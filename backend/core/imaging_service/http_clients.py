@@ -0,0 +1,126 @@
+"""
+Process-wide HTTP clients for the STT providers, so calls reuse keep-alive
+connections instead of paying for a TCP and TLS handshake each time.
+
+Settings (environment):
+    STT_HTTP_POOL_SIZE           keep-alive connections kept per provider host (default 32)
+    STT_HTTP_MAX_CONNECTIONS     open connections per event loop for async calls (default 256)
+    STT_HTTP_TIMEOUT             seconds to wait for a provider response (default 90)
+    STT_HTTP_CONNECT_TIMEOUT     seconds to wait for a new connection (default 10)
+    STT_HTTP_KEEPALIVE_SECONDS   how long idle async connections are kept (default 30)
+"""
+import os
+import asyncio
+import threading
+import weakref
+from collections import defaultdict
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# httpx is optional: without it the async STT paths run the blocking clients in a thread
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    httpx = None
+    HTTPX_AVAILABLE = False
+
+_session = None
+_session_lock = threading.Lock()
+
+# Connections belong to the event loop that opened them, so each loop gets its own client
+_async_clients = weakref.WeakKeyDictionary()
+
+# host -> [requests, new connections] for the async clients
+_async_counts = defaultdict(lambda: [0, 0])
+_async_counts_lock = threading.Lock()
+
+
+def pool_size():
+    return int(os.getenv('STT_HTTP_POOL_SIZE', '32'))
+
+
+def timeouts():
+    """(connect, read) timeout in seconds, in the form requests accepts"""
+    return float(os.getenv('STT_HTTP_CONNECT_TIMEOUT', '10')), float(os.getenv('STT_HTTP_TIMEOUT', '90'))
+
+
+def session():
+    """
+    The process-wide requests.Session. Its urllib3 pools are thread-safe, so
+    all request threads share up to STT_HTTP_POOL_SIZE connections per host.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size())
+                s = requests.Session()
+                s.mount('https://', adapter)
+                s.mount('http://', adapter)
+                _session = s
+    return _session
+
+
+async def _count_request(request):
+    host = request.url.host
+    with _async_counts_lock:
+        _async_counts[host][0] += 1
+
+    async def trace(event, info):
+        if event == 'connection.connect_tcp.started':
+            with _async_counts_lock:
+                _async_counts[host][1] += 1
+
+    request.extensions['trace'] = trace
+
+
+def async_client():
+    """
+    The shared httpx.AsyncClient of the running event loop. Creating a client
+    per call would build a fresh TLS context and connection every time.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        connect, read = timeouts()
+        client = httpx.AsyncClient(
+            timeout=httpx.Timeout(read, connect=connect),
+            limits=httpx.Limits(
+                max_connections=int(os.getenv('STT_HTTP_MAX_CONNECTIONS', '256')),
+                max_keepalive_connections=pool_size(),
+                keepalive_expiry=float(os.getenv('STT_HTTP_KEEPALIVE_SECONDS', '30')),
+            ),
+            event_hooks={'request': [_count_request]},
+        )
+        _async_clients[loop] = client
+    return client
+
+
+def _usage(requests_sent, connections):
+    return {
+        'requests': requests_sent,
+        'new_connections': connections,
+        'reused_connections': max(requests_sent - connections, 0),
+        'reuse_ratio': round(max(requests_sent - connections, 0) / requests_sent, 3) if requests_sent else None,
+    }
+
+
+def connection_stats():
+    """Requests and newly opened connections per provider host, for the blocking and the async clients"""
+    sync = {}
+    if _session is not None:
+        pools = _session.get_adapter('https://').poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is not None:
+                usage = sync.setdefault(pool.host, [0, 0])
+                usage[0] += pool.num_requests
+                usage[1] += pool.num_connections
+    with _async_counts_lock:
+        async_usage = {host: list(counts) for host, counts in _async_counts.items()}
+    return {
+        'sync': {host: _usage(*counts) for host, counts in sync.items()},
+        'async': {host: _usage(*counts) for host, counts in async_usage.items()},
+    }
@@ -0,0 +1,254 @@
+import os
+import time
+import shutil
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.db import close_old_connections
+from django.db.models import F
+from django.utils import timezone
+
+from .models import DiagnosisJob
+
+logger = logging.getLogger(__name__)
+
+# Worker threads per job type, overridable with JOB_WORKERS_<TYPE>
+DEFAULT_CONCURRENCY = {
+    DiagnosisJob.UPLOAD_SCAN: 2,
+    DiagnosisJob.MULTIMODAL_DIAGNOSIS: 2,
+    DiagnosisJob.TRANSCRIBE_SYMPTOMS: 4,
+}
+
+
+def wants_async(request):
+    """Job mode is requested with ?async=true or a 'Prefer: respond-async' header"""
+    if request.query_params.get('async', '').lower() in ('1', 'true', 'yes', 'on'):
+        return True
+    return 'respond-async' in request.headers.get('Prefer', '').lower()
+
+
+def upload_dir():
+    """Where uploads of queued jobs are kept until the job finishes (JOB_UPLOAD_DIR)"""
+    return os.getenv('JOB_UPLOAD_DIR', os.path.join(settings.BASE_DIR, 'job_uploads'))
+
+
+def _payload(data, files):
+    """JSON-serializable copy of the request's form fields (DRF merges the files into data)"""
+    fields = data.dict() if hasattr(data, 'dict') else dict(data)
+    return {key: value for key, value in fields.items() if key not in files}
+
+
+def enqueue(request, job_type, file_field=None):
+    """
+    Store a request as a queued job. The upload, if any, is streamed into
+    JOB_UPLOAD_DIR so the job can still run after a restart.
+    """
+    job = DiagnosisJob(
+        user=request.user if request.user.is_authenticated else None,
+        job_type=job_type,
+        payload=_payload(request.data, request.FILES),
+    )
+    if file_field and file_field in request.FILES:
+        uploaded = request.FILES[file_field]
+        job_dir = os.path.join(upload_dir(), str(job.id))
+        os.makedirs(job_dir, exist_ok=True)
+        job.file_field = file_field
+        job.file_name = os.path.basename(uploaded.name or file_field)[:255]
+        job.file_path = os.path.join(job_dir, 'upload')
+        uploaded.seek(0)
+        with open(job.file_path, 'wb') as f:
+            shutil.copyfileobj(uploaded.file, f, 1024 * 1024)
+    job.save()
+    JobRunner.get_instance().notify()
+    return job
+
+
+def serialize_job(job):
+    return {
+        'jobId': str(job.id),
+        'type': job.job_type,
+        'status': job.status,
+        'attempts': job.attempts,
+        'createdAt': job.created_at.isoformat() if job.created_at else None,
+        'startedAt': job.started_at.isoformat() if job.started_at else None,
+        'finishedAt': job.finished_at.isoformat() if job.finished_at else None,
+        'statusCode': job.status_code,
+        'result': job.result,
+        'error': job.error or None,
+    }
+
+
+class JobRunner:
+    """
+    Background threads that process queued DiagnosisJobs, JOB_WORKERS_<TYPE>
+    threads per job type (e.g. JOB_WORKERS_TRANSCRIBE_SYMPTOMS=4).
+
+    Jobs are claimed with a conditional UPDATE, so several server processes can
+    share one queue on SQLite or Postgres. A claimed job holds a lease of
+    JOB_LEASE_SECONDS; jobs whose lease expired (the process died) are queued
+    again, up to JOB_MAX_ATTEMPTS attempts. Results of an overloaded model
+    (HTTP 503) are retried the same way.
+
+    The threads start with the first job queued in the process, or at startup
+    in server processes run with JOB_RUNNER=true, which then also pick up jobs
+    queued before a restart.
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __init__(self):
+        self.poll_interval = float(os.getenv('JOB_POLL_INTERVAL', '2'))
+        self.lease_seconds = float(os.getenv('JOB_LEASE_SECONDS', '600'))
+        self.max_attempts = int(os.getenv('JOB_MAX_ATTEMPTS', '3'))
+        self._wakeup = threading.Condition()
+        self._finished = threading.Condition()
+        self._threads = []
+
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = JobRunner()
+        return cls._instance
+
+    @staticmethod
+    def concurrency(job_type):
+        return int(os.getenv(f'JOB_WORKERS_{job_type.upper()}', str(DEFAULT_CONCURRENCY[job_type])))
+
+    @staticmethod
+    def should_autostart():
+        """
+        Start workers when the app loads only if JOB_RUNNER is set: tests, scripts
+        and management commands like migrate load it too, before the tables exist
+        """
+        return os.getenv('JOB_RUNNER', 'false').lower() in ('1', 'true', 'yes', 'on')
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for job_type, _ in DiagnosisJob.TYPE_CHOICES:
+                for n in range(self.concurrency(job_type)):
+                    thread = threading.Thread(target=self._work, args=(job_type,),
+                                              name=f'job-{job_type}-{n}', daemon=True)
+                    thread.start()
+                    self._threads.append(thread)
+        logger.info(f"Started {len(self._threads)} job worker thread(s)")
+
+    def notify(self):
+        """Wake idle workers after a job was queued in this process"""
+        if not self._threads:
+            self.start()
+        with self._wakeup:
+            self._wakeup.notify_all()
+
+    def _work(self, job_type):
+        while True:
+            job = None
+            try:
+                close_old_connections()
+                self._requeue_expired()
+                job = self._claim(job_type)
+                if job is not None:
+                    self._run(job)
+            except Exception as e:
+                logger.error(f"Job worker for {job_type} failed: {str(e)}")
+            finally:
+                close_old_connections()
+            if job is None:
+                with self._wakeup:
+                    self._wakeup.wait(self.poll_interval)
+
+    def _requeue_expired(self):
+        now = timezone.now()
+        expired = DiagnosisJob.objects.filter(status=DiagnosisJob.RUNNING, lease_expires_at__lt=now)
+        expired.filter(attempts__lt=self.max_attempts).update(
+            status=DiagnosisJob.QUEUED, lease_expires_at=None, available_at=now
+        )
+        for job in expired.filter(attempts__gte=self.max_attempts):
+            updated = DiagnosisJob.objects.filter(id=job.id, status=DiagnosisJob.RUNNING).update(
+                status=DiagnosisJob.FAILED, finished_at=now, error='Job was interrupted too many times'
+            )
+            if updated:
+                self._cleanup(job)
+
+    def _claim(self, job_type):
+        now = timezone.now()
+        candidates = DiagnosisJob.objects.filter(
+            status=DiagnosisJob.QUEUED, job_type=job_type, available_at__lte=now
+        ).order_by('created_at').values_list('id', flat=True)[:5]
+        for job_id in candidates:
+            claimed = DiagnosisJob.objects.filter(id=job_id, status=DiagnosisJob.QUEUED).update(
+                status=DiagnosisJob.RUNNING,
+                attempts=F('attempts') + 1,
+                started_at=now,
+                lease_expires_at=now + timedelta(seconds=self.lease_seconds),
+            )
+            if claimed:
+                return DiagnosisJob.objects.get(id=job_id)
+        return None
+
+    def _run(self, job):
+        # Imported here: views enqueue jobs, so this module cannot import them at load time
+        from .views import JOB_HANDLERS
+
+        files = {}
+        upload = None
+        try:
+            if job.file_path:
+                upload = open(job.file_path, 'rb')
+                files[job.file_field] = UploadedFile(upload, name=job.file_name, size=os.path.getsize(job.file_path))
+            response = JOB_HANDLERS[job.job_type](job.payload, files)
+            status_code, result, error = response.status_code, response.data, ''
+        except Exception as e:
+            logger.error(f"Job {job.id} failed: {str(e)}")
+            status_code, result, error = 500, {'error': str(e)}, str(e)
+        finally:
+            if upload is not None:
+                upload.close()
+
+        now = timezone.now()
+        if status_code == 503 and job.attempts < self.max_attempts:
+            # Model overloaded: retry later instead of failing the job
+            DiagnosisJob.objects.filter(id=job.id).update(
+                status=DiagnosisJob.QUEUED, lease_expires_at=None,
+                available_at=now + timedelta(seconds=2 ** job.attempts),
+            )
+            return
+
+        DiagnosisJob.objects.filter(id=job.id).update(
+            status=DiagnosisJob.SUCCEEDED if status_code < 400 else DiagnosisJob.FAILED,
+            result=result,
+            status_code=status_code,
+            error=error,
+            finished_at=now,
+            lease_expires_at=None,
+        )
+        self._cleanup(job)
+        with self._finished:
+            self._finished.notify_all()
+
+    @staticmethod
+    def _cleanup(job):
+        if job.file_path:
+            shutil.rmtree(os.path.dirname(job.file_path), ignore_errors=True)
+
+    def wait(self, job_id, timeout):
+        """
+        Long-poll: return the job once it has finished or after timeout seconds.
+        Jobs finished by this process wake the waiter immediately; jobs run by
+        other processes are picked up by re-reading the row.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            job = DiagnosisJob.objects.filter(id=job_id).first()
+            remaining = deadline - time.monotonic()
+            if job is None or job.is_finished or remaining <= 0:
+                return job
+            with self._finished:
+                self._finished.wait(min(remaining, 0.5))
+
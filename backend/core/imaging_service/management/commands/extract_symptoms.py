@@ -0,0 +1,122 @@
+import sys
+import json
+import time
+import itertools
+
+from django.core.management.base import BaseCommand, CommandError
+
+from imaging_service.models import DiagnosisJob
+from imaging_service.nlp_symptoms import extract_symptoms_batch
+
+
+def _records(lines):
+    """JSON objects with a 'transcript' field, or plain-text lines taken as transcripts"""
+    for number, line in enumerate(lines, 1):
+        line = line.rstrip('\n')
+        if not line.strip():
+            continue
+        if line.lstrip().startswith('{'):
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                raise CommandError(f'Line {number} is not valid JSON: {e}')
+            if not isinstance(record.get('transcript'), str):
+                raise CommandError(f"Line {number} has no 'transcript' field")
+            yield record
+        else:
+            yield {'transcript': line}
+
+
+class Command(BaseCommand):
+    help = ('Re-run symptom extraction over stored transcripts, e.g. after a lexicon change. '
+            'With --input, reads JSON lines and writes them back with fresh symptom flags; '
+            'otherwise updates the flags of finished transcription jobs in the database in bulk.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--input', help="JSON lines with a 'transcript' and optional 'language' field "
+                                            "(plain-text lines are taken as transcripts), or - for stdin")
+        parser.add_argument('--output', help='File for the --input records with their symptoms (default: stdout)')
+        parser.add_argument('--language', help='Language of the transcripts that do not name one')
+        parser.add_argument('--workers', type=int,
+                            help='Extraction processes (default: SYMPTOM_BATCH_WORKERS or one per CPU)')
+        parser.add_argument('--chunk-size', type=int,
+                            help='Transcripts per worker task (default: SYMPTOM_BATCH_CHUNK)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Jobs read and updated per query')
+        parser.add_argument('--dry-run', action='store_true', help='Count the jobs whose flags would change only')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        if options['input']:
+            count, changed = self.from_file(options)
+        else:
+            count, changed = self.from_database(options)
+        elapsed = time.perf_counter() - start
+        rate = f', {count / elapsed:.0f} transcripts/s' if elapsed > 0 and count else ''
+        summary = f'Extracted symptoms from {count} transcripts in {elapsed:.1f}s{rate}'
+        if changed is not None:
+            summary += f"; {changed} jobs {'would change' if options['dry_run'] else 'updated'}"
+        # stdout may carry the records, so the summary goes to stderr in file mode
+        stream = self.stderr if options['input'] and not options['output'] else self.stdout
+        stream.write(self.style.SUCCESS(summary))
+
+    def extract(self, transcripts, options):
+        return extract_symptoms_batch(transcripts, language=options['language'],
+                                      workers=options['workers'], chunk_size=options['chunk_size'])
+
+    def from_file(self, options):
+        try:
+            source = sys.stdin if options['input'] == '-' else open(options['input'], encoding='utf-8')
+            target = open(options['output'], 'w', encoding='utf-8') if options['output'] else self.stdout
+        except OSError as e:
+            raise CommandError(str(e))
+        count = 0
+        try:
+            records, pending = itertools.tee(_records(source))
+            transcripts = ((record['transcript'], record.get('language') or options['language'])
+                           for record in records)
+            for record, symptoms in zip(pending, self.extract(transcripts, options)):
+                record['symptoms'] = symptoms
+                target.write(json.dumps(record, ensure_ascii=False) + '\n')
+                count += 1
+        finally:
+            if source is not sys.stdin:
+                source.close()
+            if target is not self.stdout:
+                target.close()
+        return count, None
+
+    def from_database(self, options):
+        batch_size = max(1, options['batch_size'])
+        finished = DiagnosisJob.objects.filter(
+            job_type=DiagnosisJob.TRANSCRIBE_SYMPTOMS, status=DiagnosisJob.SUCCEEDED, result__has_key='transcript',
+        )
+        # Rows are fetched by id in batches rather than through one open cursor, which SQLite
+        # would not isolate from the updates written back to the same table
+        ids = list(finished.order_by('created_at').values_list('id', flat=True))
+
+        def jobs():
+            for offset in range(0, len(ids), batch_size):
+                batch = DiagnosisJob.objects.filter(id__in=ids[offset:offset + batch_size])
+                yield from batch.only('id', 'payload', 'result').order_by('created_at')
+
+        reading, pending = itertools.tee(jobs())
+        transcripts = ((job.result.get('transcript') or '', job.payload.get('language') or options['language'])
+                       for job in reading)
+        count, changed, updates = 0, 0, []
+        for job, symptoms in zip(pending, self.extract(transcripts, options)):
+            count += 1
+            if job.result.get('symptoms') == symptoms:
+                continue
+            job.result = {**job.result, 'symptoms': symptoms}
+            updates.append(job)
+            changed += 1
+            if len(updates) >= batch_size:
+                self.save(updates, options)
+                updates = []
+        self.save(updates, options)
+        return count, changed
+
+    @staticmethod
+    def save(jobs, options):
+        if jobs and not options['dry_run']:
+            DiagnosisJob.objects.bulk_update(jobs, ['result'], batch_size=len(jobs))
@@ -0,0 +1,33 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from imaging_service.model.model_loader import ModelLoader
+
+
+class Command(BaseCommand):
+    help = ('Publish a trained model as a new version in MODEL_DIR/versions/. '
+            'Running servers load, warm and swap it in without a restart.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'model_path', nargs='?',
+            help='Trained .keras file (default: pneumonia_model_new.keras written by the trainer)'
+        )
+        parser.add_argument('--name', dest='version_name', help='Version name (default: current timestamp)')
+
+    def handle(self, *args, **options):
+        loader = ModelLoader.get_instance()
+        model_path = options['model_path'] or os.path.join(loader.model_dir, 'pneumonia_model_new.keras')
+        if not os.path.exists(model_path):
+            raise CommandError(f'Model file not found: {model_path}')
+        try:
+            version = loader.publish(model_path, options['version_name'])
+        except FileExistsError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(f'Published model version {version}'))
+        if loader.backend_name() != 'keras':
+            self.stdout.write(
+                f'INFERENCE_BACKEND={loader.backend_name()}: run convert_model.py --model-dir '
+                f'{os.path.join(loader.model_dir, "versions", version)} before it can be served'
+            )
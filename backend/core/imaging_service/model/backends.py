@@ -0,0 +1,152 @@
+import os
+import threading
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MODEL_DIR = os.path.dirname(__file__)
+KERAS_MODEL_PATH = os.path.join(MODEL_DIR, 'pneumonia_model.keras')
+
+# Input shape of a single preprocessed image: 150x150 grayscale scaled to [0, 1]
+INPUT_SHAPE = (150, 150, 1)
+
+
+class KerasBackend:
+    """
+    Full TensorFlow/Keras model served through a tf.function with a fixed
+    (None, 150, 150, 1) float32 signature, traced once at load time so serving
+    skips Model.predict's per-call data adapter and callback setup.
+    """
+    name = 'keras'
+
+    def __init__(self, model_path=None):
+        import tensorflow as tf
+
+        self._tf = tf
+        self.model_path = model_path or KERAS_MODEL_PATH
+        self.model = tf.keras.models.load_model(self.model_path)
+        self.infer_fn = self._compile_inference(self.model)
+
+    def _compile_inference(self, model):
+        tf = self._tf
+        signature = tf.TensorSpec(shape=(None,) + INPUT_SHAPE, dtype=tf.float32, name='images')
+
+        @tf.function(input_signature=[signature])
+        def infer(images):
+            return model(images, training=False)
+
+        infer.get_concrete_function()
+        return infer
+
+    def predict(self, batch):
+        return self.infer_fn(self._tf.convert_to_tensor(batch, dtype=self._tf.float32)).numpy()
+
+
+class TFLiteBackend:
+    """
+    TensorFlow Lite interpreter for the float16 / int8 dynamic-range quantized
+    exports produced by convert_model.py. Uses the standalone tflite_runtime
+    package when installed so CPU-only nodes do not need full TensorFlow.
+    """
+
+    def __init__(self, model_path, name='tflite', num_threads=None):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+
+        self.name = name
+        self.model_path = model_path
+        if num_threads is None and os.getenv('TFLITE_NUM_THREADS'):
+            num_threads = int(os.getenv('TFLITE_NUM_THREADS'))
+        self._interpreter = Interpreter(model_path=model_path, num_threads=num_threads)
+        self._input_index = self._interpreter.get_input_details()[0]['index']
+        self._output_index = self._interpreter.get_output_details()[0]['index']
+        self._batch_size = None
+        # The interpreter holds mutable input/output buffers and is not thread-safe
+        self._lock = threading.Lock()
+
+    def predict(self, batch):
+        batch = np.ascontiguousarray(batch, dtype=np.float32)
+        with self._lock:
+            if batch.shape[0] != self._batch_size:
+                self._interpreter.resize_tensor_input(self._input_index, batch.shape)
+                self._interpreter.allocate_tensors()
+                self._batch_size = batch.shape[0]
+            self._interpreter.set_tensor(self._input_index, batch)
+            self._interpreter.invoke()
+            return self._interpreter.get_tensor(self._output_index).copy()
+
+
+class ONNXBackend:
+    """
+    ONNX Runtime CPU session for the ONNX export produced by convert_model.py.
+    Requires the onnxruntime package.
+    """
+    name = 'onnx'
+
+    def __init__(self, model_path, num_threads=None):
+        import onnxruntime as ort
+
+        self.model_path = model_path
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads is None and os.getenv('ONNX_NUM_THREADS'):
+            num_threads = int(os.getenv('ONNX_NUM_THREADS'))
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self._session = ort.InferenceSession(model_path, sess_options=options, providers=['CPUExecutionProvider'])
+        self._input_name = self._session.get_inputs()[0].name
+
+    def predict(self, batch):
+        batch = np.ascontiguousarray(batch, dtype=np.float32)
+        return self._session.run(None, {self._input_name: batch})[0]
+
+
+# Backend name -> (artifact file name, factory)
+BACKENDS = {
+    'keras': ('pneumonia_model.keras', lambda path: KerasBackend(path)),
+    'tflite-fp16': ('pneumonia_model_fp16.tflite', lambda path: TFLiteBackend(path, name='tflite-fp16')),
+    'tflite-int8': ('pneumonia_model_int8.tflite', lambda path: TFLiteBackend(path, name='tflite-int8')),
+    'onnx': ('pneumonia_model.onnx', lambda path: ONNXBackend(path)),
+}
+
+
+def artifact_path(backend_name, model_dir=None):
+    """Path of the model artifact a backend loads"""
+    if backend_name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend: {backend_name}. Valid backends are: {', '.join(BACKENDS)}")
+    return os.path.join(model_dir or MODEL_DIR, BACKENDS[backend_name][0])
+
+
+def serving_batch_sizes():
+    """Batch sizes the service runs: 1 up to INFERENCE_MAX_BATCH_SIZE when micro-batching is on"""
+    if os.getenv('INFERENCE_BATCHING', 'true').lower() not in ('1', 'true', 'yes', 'on'):
+        return [1]
+    return list(range(1, max(1, int(os.getenv('INFERENCE_MAX_BATCH_SIZE', '8'))) + 1))
+
+
+def warm_up(backend, batch_sizes, iterations=None):
+    """
+    Run dummy inferences at every batch size so graph tracing, shape-specific
+    allocation and oneDNN kernel JIT happen before the first real request
+    """
+    if iterations is None:
+        iterations = int(os.getenv('INFERENCE_WARMUP_ITERATIONS', '2'))
+    for size in batch_sizes:
+        dummy = np.zeros((size,) + INPUT_SHAPE, dtype=np.float32)
+        for _ in range(iterations):
+            backend.predict(dummy)
+
+
+def create_backend(backend_name, model_dir=None):
+    """Instantiate an inference backend by name (see BACKENDS)"""
+    path = artifact_path(backend_name, model_dir)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Model artifact for backend '{backend_name}' not found: {path}. "
+                                f"Run convert_model.py to produce it.")
+    logger.info(f"Loading {backend_name} inference backend from {path}")
+    return BACKENDS[backend_name][1](path)
@@ -0,0 +1,178 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+from .model_loader import ModelLoader
+from .worker_pool import InferenceOverloaded, InferenceWorkerPool
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the queue depth histogram buckets
+QUEUE_DEPTH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+
+def _env_flag(name, default):
+    return os.getenv(name, default).lower() in ('1', 'true', 'yes', 'on')
+
+
+class InferenceBatcher:
+    """
+    Micro-batching scheduler in front of the pneumonia CNN.
+
+    Concurrent callers submit single preprocessed images; a background thread
+    gathers them into one batch (up to INFERENCE_MAX_BATCH_SIZE images, waiting
+    at most INFERENCE_MAX_WAIT_MS after the first one arrives), runs a single
+    forward pass and hands every caller its own score together with the name of
+    the model version that produced it.
+
+    When the inference worker pool is enabled, batches are dispatched to it
+    without waiting, so up to INFERENCE_MAX_PENDING batches run in parallel.
+    At most INFERENCE_MAX_QUEUE images wait for a batch; beyond that callers
+    get InferenceOverloaded.
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, max_batch_size=None, max_wait_ms=None, max_queue=None, predict_fn=None):
+        self.max_batch_size = max(1, int(max_batch_size or os.getenv('INFERENCE_MAX_BATCH_SIZE', '8')))
+        if max_wait_ms is None:
+            max_wait_ms = float(os.getenv('INFERENCE_MAX_WAIT_MS', '5'))
+        self.max_wait_ms = max(0.0, float(max_wait_ms))
+        self.max_queue = int(max_queue or os.getenv('INFERENCE_MAX_QUEUE', '256'))
+        self._predict_fn = predict_fn
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._worker = None
+
+        # Metrics
+        self._batch_size_hist = {}
+        self._queue_depth_hist = {}
+        self._batches = 0
+        self._requests = 0
+        self._batched_requests = 0
+        self._errors = 0
+        self._rejected = 0
+        self._max_queue_depth = 0
+
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = InferenceBatcher()
+        return cls._instance
+
+    @staticmethod
+    def is_enabled():
+        return _env_flag('INFERENCE_BATCHING', 'true')
+
+    def submit(self, img_array):
+        """Queue a single (150, 150, 1) image and return a Future for its (score, model_version)"""
+        future = Future()
+        with self._cond:
+            if len(self._queue) >= self.max_queue:
+                self._rejected += 1
+                raise InferenceOverloaded('Inference queue is full, please retry shortly')
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='inference-batcher', daemon=True)
+                self._worker.start()
+            self._queue.append((img_array, future))
+            depth = len(self._queue)
+            self._requests += 1
+            self._max_queue_depth = max(self._max_queue_depth, depth)
+            self._observe_queue_depth(depth)
+            self._cond.notify()
+        return future
+
+    def predict(self, img_array, timeout=None):
+        """Blocking helper: submit an image and wait for its (score, model_version)"""
+        return self.submit(img_array).result(timeout)
+
+    def _observe_queue_depth(self, depth):
+        for bound in QUEUE_DEPTH_BUCKETS:
+            if depth <= bound:
+                key = str(bound)
+                break
+        else:
+            key = '+Inf'
+        self._queue_depth_hist[key] = self._queue_depth_hist.get(key, 0) + 1
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._queue:
+                self._cond.wait()
+            # Give concurrent requests a short window to join the batch
+            deadline = time.monotonic() + self.max_wait_ms / 1000.0
+            while len(self._queue) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            size = min(len(self._queue), self.max_batch_size)
+            batch = [self._queue.popleft() for _ in range(size)]
+            self._batches += 1
+            self._batched_requests += size
+            self._batch_size_hist[size] = self._batch_size_hist.get(size, 0) + 1
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            futures = [future for _, future in batch]
+            try:
+                inputs = np.stack([img for img, _ in batch]).astype(np.float32, copy=False)
+                pool = None if self._predict_fn else InferenceWorkerPool.get_instance()
+                if pool is not None:
+                    # Hand the batch to a worker process and go back to collecting the next one
+                    # The version comes back with the result: the batch may have been forwarded to a
+                    # newer pool when this one was replaced
+                    pool.submit(inputs).add_done_callback(lambda done, futures=futures: self._complete(futures, done))
+                elif self._predict_fn is not None:
+                    self._resolve(futures, self._predict_fn(inputs), None)
+                else:
+                    self._resolve(futures, *ModelLoader.get_instance().predict_with_version(inputs))
+            except Exception as e:
+                self._fail(futures, e)
+
+    def _complete(self, futures, done):
+        try:
+            self._resolve(futures, *done.result())
+        except Exception as e:
+            self._fail(futures, e)
+
+    @staticmethod
+    def _resolve(futures, predictions, version):
+        predictions = np.asarray(predictions)
+        for i, future in enumerate(futures):
+            future.set_result((float(predictions[i][0]), version))
+
+    def _fail(self, futures, error):
+        logger.error(f"Batched inference failed for {len(futures)} request(s): {str(error)}")
+        with self._cond:
+            self._errors += 1
+        for future in futures:
+            if not future.done():
+                future.set_exception(error)
+
+    def stats(self):
+        """Queue depth and batch-size histograms for throughput/latency tuning"""
+        with self._cond:
+            return {
+                'enabled': self.is_enabled(),
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait_ms,
+                'queue_depth': len(self._queue),
+                'max_queue_depth': self._max_queue_depth,
+                'requests': self._requests,
+                'batches': self._batches,
+                'errors': self._errors,
+                'rejected': self._rejected,
+                'avg_batch_size': round(self._batched_requests / self._batches, 3) if self._batches else 0.0,
+                'batch_size_histogram': {str(k): v for k, v in sorted(self._batch_size_hist.items())},
+                'queue_depth_histogram': dict(self._queue_depth_hist),
+            }
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Inference Benchmark Script
+
+Compares Keras Model.predict against the compiled inference function used by
+the keras serving backend on the sample X-ray images shipped with the frontend.
+
+Usage:
+    python benchmark_inference.py [--iterations 50] [--images-dir PATH]
+"""
+
+import os
+import sys
+import time
+import glob
+import argparse
+
+import numpy as np
+import tensorflow as tf
+from PIL import Image
+from tensorflow.keras.preprocessing import image
+
+sys.path.append(os.path.dirname(__file__))
+
+from backends import KerasBackend
+
+DEFAULT_IMAGES_DIR = os.path.join(
+    os.path.dirname(__file__), '..', '..', '..', '..', 'xraysetu', 'assets', 'x-ray-images'
+)
+
+
+def load_samples(images_dir):
+    """Preprocess the sample images exactly like predict_pneumonia does"""
+    samples = []
+    for path in sorted(glob.glob(os.path.join(images_dir, '*.png'))):
+        img = Image.open(path).convert('L').resize((150, 150))
+        samples.append(image.img_to_array(img) / 255.0)
+    return samples
+
+
+def time_calls(fn, inputs, iterations):
+    """Return per-call latencies in milliseconds"""
+    timings = []
+    for _ in range(iterations):
+        for batch in inputs:
+            start = time.perf_counter()
+            fn(batch)
+            timings.append((time.perf_counter() - start) * 1000)
+    return np.array(timings)
+
+
+def report(label, timings):
+    print(f"{label:<28} mean={timings.mean():8.2f}ms  p50={np.percentile(timings, 50):8.2f}ms  "
+          f"p99={np.percentile(timings, 99):8.2f}ms")
+
+
+def benchmark(images_dir, iterations):
+    samples = load_samples(images_dir)
+    if not samples:
+        print(f"No sample images found in {images_dir}")
+        return False
+
+    backend = KerasBackend()
+    model = backend.model
+    infer = backend.infer_fn
+
+    singles = [np.expand_dims(s, axis=0) for s in samples]
+    batch = [np.stack(samples)]
+
+    # Warm both paths so the numbers exclude one-off tracing
+    model.predict(singles[0], verbose=0)
+    infer(tf.convert_to_tensor(singles[0]))
+
+    print("=" * 60)
+    print(f"INFERENCE BENCHMARK ({len(samples)} images, {iterations} iterations)")
+    print("=" * 60)
+
+    before = time_calls(lambda x: model.predict(x, verbose=0), singles, iterations)
+    after = time_calls(lambda x: infer(tf.convert_to_tensor(x, dtype=tf.float32)).numpy(), singles, iterations)
+    report("Model.predict (batch=1)", before)
+    report("compiled fn (batch=1)", after)
+    print(f"Speedup (batch=1): {before.mean() / after.mean():.1f}x")
+
+    before = time_calls(lambda x: model.predict(x, verbose=0), batch, iterations)
+    after = time_calls(lambda x: infer(tf.convert_to_tensor(x, dtype=tf.float32)).numpy(), batch, iterations)
+    report(f"Model.predict (batch={len(samples)})", before)
+    report(f"compiled fn (batch={len(samples)})", after)
+    print(f"Speedup (batch={len(samples)}): {before.mean() / after.mean():.1f}x")
+
+    # Both paths must agree on the scores
+    expected = model.predict(batch[0], verbose=0)
+    actual = infer(tf.convert_to_tensor(batch[0])).numpy()
+    print(f"Max score difference: {np.abs(expected - actual).max():.2e}")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark pneumonia model inference paths')
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--images-dir', default=DEFAULT_IMAGES_DIR)
+    args = parser.parse_args()
+
+    if not benchmark(args.images_dir, args.iterations):
+        sys.exit(1)
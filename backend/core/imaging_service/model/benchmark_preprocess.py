@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Preprocessing Benchmark Script
+
+Times the scan preprocessing pipeline stage by stage (open, decode, resize,
+normalize) against the previous full-resolution path (PIL decode, convert,
+resize, img_to_array, divide) and checks that both produce the same model
+input within tolerance.
+
+Besides the sample X-ray images shipped with the frontend, each sample is
+also upscaled to a typical chest film size and re-encoded as PNG and JPEG,
+since those large uploads are where reduced-resolution decoding matters.
+
+Usage:
+    python benchmark_preprocess.py [--iterations 20] [--images-dir PATH] [--film-size 2500x3000] [--scores]
+"""
+
+import io
+import os
+import sys
+import time
+import glob
+import argparse
+
+import numpy as np
+from PIL import Image
+
+sys.path.append(os.path.dirname(__file__))
+
+from preprocess import TARGET_SIZE, preprocess_image
+
+DEFAULT_IMAGES_DIR = os.path.join(
+    os.path.dirname(__file__), '..', '..', '..', '..', 'xraysetu', 'assets', 'x-ray-images'
+)
+
+# Largest acceptable difference between the two paths, in [0, 1] pixel units
+MAX_ABS_TOLERANCE = 0.02
+MEAN_ABS_TOLERANCE = 0.002
+
+
+def legacy_preprocess(source, timings=None):
+    """The previous predict_pneumonia path: full decode, convert, resize, img_to_array, divide"""
+    start = time.perf_counter()
+    img = Image.open(source)
+    opened = time.perf_counter()
+    img.load()
+    decoded = time.perf_counter()
+    img = img.convert('L').resize(TARGET_SIZE)
+    resized = time.perf_counter()
+    # img_to_array is np.asarray(img, dtype='float32') plus a channel axis
+    img_array = np.asarray(img, dtype=np.float32)
+    img_array = img_array.reshape(img_array.shape + (1,))
+    img_array = img_array / 255.0
+    done = time.perf_counter()
+    if timings is not None:
+        timings['open'] = (opened - start) * 1000
+        timings['decode'] = (decoded - opened) * 1000
+        timings['resize'] = (resized - decoded) * 1000
+        timings['normalize'] = (done - resized) * 1000
+    return img_array
+
+
+def load_cases(images_dir, film_size):
+    """(label, encoded bytes) for every sample at native size and as a large PNG/JPEG film"""
+    cases = []
+    for path in sorted(glob.glob(os.path.join(images_dir, '*.png'))):
+        name = os.path.basename(path)
+        with open(path, 'rb') as f:
+            cases.append((f"{name} (native)", f.read()))
+        film = Image.open(path).convert('L').resize(film_size)
+        for fmt, options in (('PNG', {}), ('JPEG', {'quality': 95})):
+            buffer = io.BytesIO()
+            film.save(buffer, format=fmt, **options)
+            cases.append((f"{name} ({film_size[0]}x{film_size[1]} {fmt})", buffer.getvalue()))
+    return cases
+
+
+def time_stages(fn, data, iterations):
+    """Mean per-stage and total latency in milliseconds"""
+    totals = {}
+    for _ in range(iterations):
+        timings = {}
+        fn(io.BytesIO(data), timings)
+        for stage, ms in timings.items():
+            totals[stage] = totals.get(stage, 0.0) + ms
+    stages = {stage: ms / iterations for stage, ms in totals.items()}
+    stages['total'] = sum(stages.values())
+    return stages
+
+
+def report(label, stages):
+    print(f"  {label:<8} " + "  ".join(f"{stage}={ms:7.2f}ms" for stage, ms in stages.items()))
+
+
+def benchmark(images_dir, iterations, film_size, check_scores):
+    cases = load_cases(images_dir, film_size)
+    if not cases:
+        print(f"No sample images found in {images_dir}")
+        return False
+
+    print("=" * 60)
+    print(f"PREPROCESSING BENCHMARK ({len(cases)} inputs, {iterations} iterations)")
+    print("=" * 60)
+
+    ok = True
+    legacy_inputs, new_inputs = [], []
+    for label, data in cases:
+        before = time_stages(legacy_preprocess, data, iterations)
+        after = time_stages(preprocess_image, data, iterations)
+
+        expected = legacy_preprocess(io.BytesIO(data))
+        actual = preprocess_image(io.BytesIO(data))
+        legacy_inputs.append(expected)
+        new_inputs.append(actual)
+        diff = np.abs(expected - actual)
+        within = (actual.shape == expected.shape and actual.dtype == np.float32
+                  and diff.max() <= MAX_ABS_TOLERANCE and diff.mean() <= MEAN_ABS_TOLERANCE)
+        ok = ok and within
+
+        print(f"\n{label}")
+        report('legacy', before)
+        report('new', after)
+        print(f"  speedup={before['total'] / after['total']:.1f}x  max_diff={diff.max():.4f}  "
+              f"mean_diff={diff.mean():.5f}  {'OK' if within else 'MISMATCH'}")
+
+    if check_scores:
+        from backends import KerasBackend
+
+        backend = KerasBackend()
+        expected = backend.predict(np.stack(legacy_inputs))
+        actual = backend.predict(np.stack(new_inputs))
+        print(f"\nMax model score difference: {np.abs(expected - actual).max():.2e}")
+
+    print(f"\nAll outputs within tolerance: {ok}")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark scan preprocessing against the full-resolution path')
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--images-dir', default=DEFAULT_IMAGES_DIR)
+    parser.add_argument('--film-size', default='2500x3000', help='WIDTHxHEIGHT of the synthetic large films')
+    parser.add_argument('--scores', action='store_true', help='Also compare model scores (loads TensorFlow)')
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.film_size.lower().split('x'))
+    if not benchmark(args.images_dir, args.iterations, (width, height), args.scores):
+        sys.exit(1)
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Model Conversion Script
+
+Produces the artifacts served by the non-Keras inference backends from
+pneumonia_model.keras:
+
+    pneumonia_model_fp16.tflite   TFLite, float16 quantized weights
+    pneumonia_model_int8.tflite   TFLite, int8 dynamic-range quantization
+    pneumonia_model.onnx          ONNX (needs tf2onnx; served with onnxruntime)
+
+It then checks accuracy parity of every backend against the Keras model on the
+validation set used by evaluate_model.py and reports latency and peak RSS for
+each backend, measured in a fresh process so that only that backend's runtime
+is loaded.
+
+Usage:
+    python convert_model.py [--backends tflite-fp16 tflite-int8 onnx] [--skip-convert]
+                            [--model-dir versions/<version>]
+
+Select the served backend with INFERENCE_BACKEND=<name>.
+"""
+
+import os
+import sys
+import json
+import time
+import glob
+import argparse
+import resource
+import subprocess
+
+import numpy as np
+
+sys.path.append(os.path.dirname(__file__))
+
+from backends import BACKENDS, INPUT_SHAPE, MODEL_DIR, artifact_path, create_backend
+
+VALIDATION_DIR = os.path.join(os.path.dirname(__file__), '..', 'data', 'validation')
+SAMPLE_IMAGES_DIR = os.path.join(
+    os.path.dirname(__file__), '..', '..', '..', '..', 'xraysetu', 'assets', 'x-ray-images'
+)
+
+
+def convert_tflite(model, output_path, fp16):
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if fp16:
+        converter.target_spec.supported_types = [tf.float16]
+    with open(output_path, 'wb') as f:
+        f.write(converter.convert())
+
+
+def convert_onnx(model, output_path):
+    import tensorflow as tf
+    import tf2onnx
+
+    signature = [tf.TensorSpec((None,) + INPUT_SHAPE, tf.float32, name='images')]
+    # tf2onnx reads output_names, which Keras 3 Sequential models do not define
+    if not hasattr(model, 'output_names'):
+        model.output_names = ['score']
+    tf2onnx.convert.from_keras(model, input_signature=signature, opset=13, output_path=output_path)
+
+
+def convert(backends, model_dir):
+    """Write the artifacts for the requested backends next to the Keras model"""
+    import tensorflow as tf
+
+    print("=" * 60)
+    print("CONVERTING MODEL")
+    print("=" * 60)
+    model = tf.keras.models.load_model(artifact_path('keras', model_dir))
+    for name in backends:
+        path = artifact_path(name, model_dir)
+        try:
+            if name == 'tflite-fp16':
+                convert_tflite(model, path, fp16=True)
+            elif name == 'tflite-int8':
+                convert_tflite(model, path, fp16=False)
+            elif name == 'onnx':
+                convert_onnx(model, path)
+            else:
+                continue
+            print(f"✅ {name}: {path} ({os.path.getsize(path) / 1024:.0f} KB)")
+        except ImportError as e:
+            print(f"⚠️  {name}: skipped, missing dependency ({e})")
+        except Exception as e:
+            print(f"❌ {name}: conversion failed: {e}")
+
+
+def load_eval_set(max_images):
+    """Validation images and labels as used by evaluate_model.py, or the sample images without labels"""
+    if os.path.exists(VALIDATION_DIR):
+        from tensorflow.keras.preprocessing.image import ImageDataGenerator
+
+        generator = ImageDataGenerator(rescale=1./255).flow_from_directory(
+            VALIDATION_DIR,
+            target_size=(150, 150),
+            batch_size=32,
+            class_mode='binary',
+            color_mode='grayscale',
+            shuffle=False
+        )
+        images, labels = [], []
+        for _ in range(len(generator)):
+            x, y = next(generator)
+            images.append(x)
+            labels.append(y)
+            if sum(len(b) for b in images) >= max_images:
+                break
+        return np.concatenate(images)[:max_images].astype(np.float32), np.concatenate(labels)[:max_images]
+
+    from PIL import Image
+
+    print(f"Validation directory not found: {VALIDATION_DIR}; using sample images without labels")
+    images = []
+    for path in sorted(glob.glob(os.path.join(SAMPLE_IMAGES_DIR, '*.png')))[:max_images]:
+        img = Image.open(path).convert('L').resize((150, 150))
+        images.append(np.asarray(img, dtype=np.float32)[..., np.newaxis] / 255.0)
+    return np.stack(images), None
+
+
+def predict_all(backend, images, batch_size=32):
+    return np.concatenate([
+        np.asarray(backend.predict(images[i:i + batch_size])).reshape(-1)
+        for i in range(0, len(images), batch_size)
+    ])
+
+
+def check_parity(backends, model_dir, max_images):
+    print(f"\n{'='*60}")
+    print("ACCURACY PARITY")
+    print(f"{'='*60}")
+    images, labels = load_eval_set(max_images)
+    reference = predict_all(create_backend('keras', model_dir), images)
+    print(f"Evaluation images: {len(images)}")
+    for name in ['keras'] + [b for b in backends if b != 'keras']:
+        try:
+            scores = reference if name == 'keras' else predict_all(create_backend(name, model_dir), images)
+        except (ImportError, FileNotFoundError) as e:
+            print(f"{name:<12} skipped: {e}")
+            continue
+        agreement = np.mean((scores > 0.5) == (reference > 0.5))
+        line = f"{name:<12} agreement={agreement*100:6.2f}%  max|Δscore|={np.abs(scores - reference).max():.4f}"
+        if labels is not None:
+            line += f"  accuracy={np.mean((scores > 0.5) == (labels > 0.5))*100:6.2f}%"
+        print(line)
+
+
+def peak_rss_mb():
+    """Peak RSS of this process; VmHWM resets on exec, unlike ru_maxrss which Linux carries over from the parent"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def profile_backend(name, model_dir, iterations):
+    """Run in a fresh process: load one backend, time single-image inference, report peak RSS"""
+    start = time.perf_counter()
+    backend = create_backend(name, model_dir)
+    load_seconds = time.perf_counter() - start
+
+    rng = np.random.default_rng(0)
+    sample = rng.random((1,) + INPUT_SHAPE, dtype=np.float32)
+    backend.predict(sample)
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        backend.predict(sample)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    print(json.dumps({
+        'backend': name,
+        'load_s': round(load_seconds, 3),
+        'p50_ms': round(float(np.percentile(timings, 50)), 3),
+        'p99_ms': round(float(np.percentile(timings, 99)), 3),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+    }))
+
+
+def report_performance(backends, model_dir, iterations):
+    print(f"\n{'='*60}")
+    print("LATENCY AND MEMORY (batch=1, fresh process per backend)")
+    print(f"{'='*60}")
+    for name in ['keras'] + [b for b in backends if b != 'keras']:
+        result = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--profile', name, '--iterations', str(iterations),
+             '--model-dir', model_dir],
+            capture_output=True, text=True
+        )
+        lines = [line for line in result.stdout.splitlines() if line.startswith('{')]
+        if result.returncode != 0 or not lines:
+            error = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'unknown error'
+            print(f"{name:<12} failed: {error}")
+            continue
+        stats = json.loads(lines[-1])
+        print(f"{name:<12} load={stats['load_s']:6.2f}s  p50={stats['p50_ms']:7.2f}ms  "
+              f"p99={stats['p99_ms']:7.2f}ms  peak RSS={stats['peak_rss_mb']:7.1f}MB")
+
+
+if __name__ == "__main__":
+    converted = [name for name in BACKENDS if name != 'keras']
+    parser = argparse.ArgumentParser(description='Export, validate and profile pneumonia model backends')
+    parser.add_argument('--backends', nargs='+', choices=converted, default=converted)
+    parser.add_argument('--skip-convert', action='store_true', help='Only check parity and performance')
+    parser.add_argument('--model-dir', default=MODEL_DIR, help='Directory holding pneumonia_model.keras')
+    parser.add_argument('--max-eval-images', type=int, default=1000)
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--profile', choices=list(BACKENDS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.profile:
+        profile_backend(args.profile, args.model_dir, args.iterations)
+        sys.exit(0)
+
+    keras_path = artifact_path('keras', args.model_dir)
+    if not os.path.exists(keras_path):
+        print(f"Model file not found: {keras_path}")
+        sys.exit(1)
+    if not args.skip_convert:
+        convert(args.backends, args.model_dir)
+    check_parity(args.backends, args.model_dir, args.max_eval_images)
+    report_performance(args.backends, args.model_dir, args.iterations)
@@ -0,0 +1,68 @@
+import os
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .worker_pool import InferenceOverloaded
+
+
+class InferenceExecutor:
+    """
+    Bounded thread pool that runs the CPU-bound part of async requests (scan
+    decoding, inference, the Bayesian calculation) off the event loop.
+
+    ASYNC_INFERENCE_THREADS threads work through at most ASYNC_INFERENCE_MAX_PENDING
+    calls (default: 4 per thread); further calls get InferenceOverloaded right
+    away instead of piling up behind the event loop. Threads mostly wait on the
+    micro-batcher, so there are a few more of them than CPUs by default.
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, threads=None, max_pending=None):
+        self.threads = max(1, int(threads or os.getenv('ASYNC_INFERENCE_THREADS', str(min(32, (os.cpu_count() or 1) + 4)))))
+        self.max_pending = max(1, int(max_pending or os.getenv('ASYNC_INFERENCE_MAX_PENDING', str(4 * self.threads))))
+        self._executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix='async-inference')
+        self._stats_lock = threading.Lock()
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = InferenceExecutor()
+        return cls._instance
+
+    async def run(self, fn, *args):
+        """Await fn(*args) on the pool; raises InferenceOverloaded when max_pending calls are already queued"""
+        with self._stats_lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                raise InferenceOverloaded('Inference executor is saturated, please retry shortly')
+            self._pending += 1
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._on_done(None)
+            raise
+        # The slot is freed when the call finishes, even if the awaiting request was cancelled
+        future.add_done_callback(self._on_done)
+        return await asyncio.wrap_future(future)
+
+    def _on_done(self, _future):
+        with self._stats_lock:
+            self._pending -= 1
+            self._completed += 1
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'threads': self.threads,
+                'max_pending': self.max_pending,
+                'pending': self._pending,
+                'completed': self._completed,
+                'rejected': self._rejected,
+            }
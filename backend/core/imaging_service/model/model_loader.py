@@ -1,33 +1,260 @@
 import os
-import tensorflow as tf
+import gc
+import time
+import shutil
+import hashlib
+import threading
 import logging
+from contextlib import contextmanager
+
+from . import backends
+from .backends import artifact_path, create_backend, serving_batch_sizes, warm_up
 
 logger = logging.getLogger(__name__)
 
+# Published model versions live in <MODEL_DIR>/versions/<version>/
+VERSIONS_DIR = 'versions'
+
+# Written by publish() into each version: when it was published, which orders the versions
+PUBLISHED_FILE = 'published_at'
+
+
+def published_at(path):
+    """Publish time of a version directory; its mtime for versions not made by publish()"""
+    try:
+        with open(os.path.join(path, PUBLISHED_FILE)) as f:
+            return float(f.read().strip())
+    except (OSError, ValueError):
+        return os.path.getmtime(path)
+
+
+class ModelVersion:
+    """A model version on disk: its name and the directory holding its artifacts"""
+
+    def __init__(self, name, path):
+        self.name = name
+        self.path = path
+
+
+class ServedModel:
+    """A loaded model version plus the number of requests currently running on it"""
+
+    def __init__(self, version, backend):
+        self.version = version
+        self.backend = backend
+        self.active = 0
+        self.retired = False
+
+
 class ModelLoader:
+    """
+    Tracks model versions in MODEL_DIR and serves the newest one.
+
+    Versions are published into MODEL_DIR/versions/<version>/ (see publish()).
+    Without a versions directory the artifact in MODEL_DIR itself is served,
+    named after its content hash. A watcher thread (MODEL_RELOAD_INTERVAL
+    seconds, 0 disables) loads and warms new versions in the background and
+    swaps them in atomically; requests already running keep the version they
+    started on, and a replaced version is freed once they drain.
+    """
     _instance = None
-    _model = None
-    
+    _lock = threading.Lock()
+
+    def __init__(self):
+        self.model_dir = os.getenv('MODEL_DIR', backends.MODEL_DIR)
+        self._served = None
+        self._version = None
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+        self._failed_versions = set()
+        self._hash_cache = {}
+
     @classmethod
     def get_instance(cls):
         if cls._instance is None:
-            cls._instance = ModelLoader()
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = ModelLoader()
         return cls._instance
-    
+
+    @staticmethod
+    def backend_name():
+        """Inference backend selected via INFERENCE_BACKEND (keras, tflite-fp16, tflite-int8, onnx)"""
+        return os.getenv('INFERENCE_BACKEND', 'keras').lower()
+
+    def available_versions(self):
+        """Versions that have an artifact for the configured backend, oldest published first"""
+        versions_dir = os.path.join(self.model_dir, VERSIONS_DIR)
+        if os.path.isdir(versions_dir):
+            versions = [
+                ModelVersion(name, os.path.join(versions_dir, name))
+                for name in os.listdir(versions_dir)
+                if not name.startswith('.')
+                and os.path.exists(artifact_path(self.backend_name(), os.path.join(versions_dir, name)))
+            ]
+            if versions:
+                # By publish time, not name: publish_model --name need not sort chronologically
+                return sorted(versions, key=lambda version: (published_at(version.path), version.name))
+
+        path = artifact_path(self.backend_name(), self.model_dir)
+        if os.path.exists(path):
+            return [ModelVersion(self._content_version(path), self.model_dir)]
+        return []
+
+    def latest_version(self):
+        versions = self.available_versions()
+        if not versions:
+            raise FileNotFoundError(f"No {self.backend_name()} model found in {self.model_dir}")
+        return versions[-1]
+
+    def _content_version(self, path):
+        """Name an unversioned artifact after its backend and content hash"""
+        stat = os.stat(path)
+        cache_key = (path, stat.st_mtime, stat.st_size)
+        if cache_key not in self._hash_cache:
+            digest = hashlib.sha256()
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(chunk)
+            self._hash_cache = {cache_key: f"{self.backend_name()}-{digest.hexdigest()[:12]}"}
+        return self._hash_cache[cache_key]
+
     def load_model(self):
-        """Load the model if it's not already loaded"""
-        if self._model is None:
+        """Load the newest model version if no version is loaded yet"""
+        if self._served is None:
+            with self._lock:
+                if self._served is not None:
+                    return self._served.backend
+                try:
+                    version = self.latest_version()
+                    backend = create_backend(self.backend_name(), version.path)
+                    self._served = ServedModel(version.name, backend)
+                    self._version = version.name
+                    logger.info(f"Model {version.name} loaded successfully ({backend.name} backend)")
+                except Exception as e:
+                    logger.error(f"Error loading model: {str(e)}")
+                    raise
+        return self._served.backend
+
+    def get_model(self):
+        """Get the loaded inference backend"""
+        return self.load_model()
+
+    def get_model_version(self):
+        """Name of the version currently served (or about to be served, if nothing is loaded yet)"""
+        return self._version or self.latest_version().name
+
+    def served_version(self):
+        """Name of the version currently served, or None before the first load"""
+        return self._version
+
+    @contextmanager
+    def acquire(self):
+        """Pin the currently served model for the duration of a request"""
+        self.load_model()
+        with self._lock:
+            served = self._served
+            served.active += 1
+        try:
+            yield served
+        finally:
+            with self._lock:
+                served.active -= 1
+                drained = served.retired and served.active == 0
+            if drained:
+                self._free(served)
+
+    def predict(self, batch):
+        """Run inference on a (N, 150, 150, 1) float32 batch and return numpy scores"""
+        return self.predict_with_version(batch)[0]
+
+    def predict_with_version(self, batch):
+        """Like predict(), also returning the name of the model version that served the batch"""
+        with self.acquire() as served:
+            return served.backend.predict(batch), served.version
+
+    def swap(self, version_name, backend):
+        """Atomically replace the served model; the old one is freed once its requests drain"""
+        with self._lock:
+            old = self._served
+            self._served = ServedModel(version_name, backend)
+            self._version = version_name
+            drained = False
+            if old is not None:
+                old.retired = True
+                drained = old.active == 0
+        logger.info(f"Now serving model {version_name}")
+        if drained:
+            self._free(old)
+
+    def set_served_version(self, version_name):
+        """Record the version served outside this process (inference worker pool)"""
+        self._version = version_name
+
+    @staticmethod
+    def _free(served):
+        logger.info(f"Releasing drained model {served.version}")
+        served.backend = None
+        gc.collect()
+
+    def reload(self):
+        """
+        Load, warm and swap in the newest version if it differs from the served one.
+        Runs in the caller's thread; returns True if a new version went live.
+        """
+        with self._reload_lock:
+            latest = self.latest_version()
+            if latest.name == self._version or latest.name in self._failed_versions:
+                return False
+            logger.info(f"Loading model {latest.name} in the background")
             try:
-                # Updated path to point directly to the .keras file in the same directory
-                model_path = os.path.join(os.path.dirname(__file__), 'pneumonia_model.keras')
-                logger.info(f"Loading model from {model_path}")
-                self._model = tf.keras.models.load_model(model_path)
-                logger.info("Model loaded successfully")
+                from .worker_pool import InferenceWorkerPool
+
+                if InferenceWorkerPool.is_enabled():
+                    InferenceWorkerPool.replace(latest)
+                    self.set_served_version(latest.name)
+                else:
+                    backend = create_backend(self.backend_name(), latest.path)
+                    warm_up(backend, serving_batch_sizes())
+                    self.swap(latest.name, backend)
             except Exception as e:
-                logger.error(f"Error loading model: {str(e)}")
-                raise
-        return self._model
-    
-    def get_model(self):
-        """Get the loaded model"""
-        return self.load_model()
\ No newline at end of file
+                self._failed_versions.add(latest.name)
+                logger.error(f"Failed to load model {latest.name}, keeping {self._version}: {str(e)}")
+                return False
+            return True
+
+    def start_watcher(self):
+        """Poll MODEL_DIR for new versions every MODEL_RELOAD_INTERVAL seconds"""
+        interval = float(os.getenv('MODEL_RELOAD_INTERVAL', '30'))
+        if interval <= 0 or self._watcher is not None:
+            return
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), name='model-watcher', daemon=True)
+        self._watcher.start()
+
+    def _watch(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self.reload()
+            except Exception as e:
+                logger.error(f"Model version check failed: {str(e)}")
+
+    def publish(self, source_path, version=None):
+        """
+        Publish a trained model (e.g. pneumonia_model_new.keras) as a new version.
+        The file is copied into a temporary directory that is renamed into place,
+        so the watcher never sees a half-written version.
+        """
+        version = version or time.strftime('%Y%m%d-%H%M%S')
+        versions_dir = os.path.join(self.model_dir, VERSIONS_DIR)
+        target = os.path.join(versions_dir, version)
+        if os.path.exists(target):
+            raise FileExistsError(f"Model version {version} already exists")
+        staging = os.path.join(versions_dir, f'.{version}.tmp')
+        os.makedirs(staging, exist_ok=True)
+        shutil.copy2(source_path, os.path.join(staging, os.path.basename(artifact_path('keras'))))
+        with open(os.path.join(staging, PUBLISHED_FILE), 'w') as f:
+            f.write(repr(time.time()))
+        os.rename(staging, target)
+        logger.info(f"Published model version {version} from {source_path}")
+        return version
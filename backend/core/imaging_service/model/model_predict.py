@@ -1,51 +1,154 @@
 from .model_loader import ModelLoader
-from tensorflow.keras.preprocessing import image
-from PIL import Image
+from .batching import InferenceBatcher
+from .worker_pool import InferenceWorkerPool
+from .preprocess import PREPROCESS_VERSION, preprocess_image
+from ..cache import TieredCache
+from ..buffers import BufferReader
+from ..uploads import upload_buffer
+from ..dicom import is_dicom, preprocess_dicom
+from PIL import UnidentifiedImageError
 import numpy as np
-import io
+import hashlib
+import logging
 
-def predict_pneumonia(image_file):
+logger = logging.getLogger(__name__)
+
+# Raw model scores keyed on model version + preprocessing version + SHA-256 of
+# the uploaded bytes, so re-submitted scans (e.g. after a form validation error)
+# skip the CNN
+prediction_cache = TieredCache.from_env('PREDICTION_CACHE', name='predictions')
+
+
+def _cache_key(model_version, image_hash):
+    return f"{model_version}:p{PREPROCESS_VERSION}:{image_hash}"
+
+
+def _score(img_array):
+    """Run the CNN on one preprocessed (150, 150, 1) image; returns (raw score, model version)"""
+    # Concurrent requests are grouped into one forward pass
+    if InferenceBatcher.is_enabled():
+        return InferenceBatcher.get_instance().predict(img_array)
+    batch = np.expand_dims(img_array, axis=0)
+    pool = InferenceWorkerPool.get_instance()
+    if pool is not None:
+        predictions, version = pool.predict_with_version(batch)
+        return float(predictions[0][0]), version
+    predictions, version = ModelLoader.get_instance().predict_with_version(batch)
+    return float(predictions[0][0]), version
+
+
+def _score_batch(batch):
+    """Run the CNN on an assembled (N, 150, 150, 1) batch; returns (raw scores, model version)"""
+    # Already a full batch, so it skips the micro-batcher
+    pool = InferenceWorkerPool.get_instance()
+    if pool is not None:
+        predictions, version = pool.predict_with_version(batch)
+        return predictions[:, 0], version
+    predictions, version = ModelLoader.get_instance().predict_with_version(batch)
+    return predictions[:, 0], version
+
+
+def load_scan(buffer):
+    """Decode an image or DICOM file held in a buffer into the (150, 150, 1) model input"""
+    if is_dicom(buffer):
+        return preprocess_dicom(buffer)
+    try:
+        return preprocess_image(BufferReader(buffer))
+    except UnidentifiedImageError:
+        raise ValueError('Unsupported or corrupt image file')
+
+
+def _result(score, model_version):
+    has_pneumonia = bool(score > 0.5)
+    return {
+        'has_pneumonia': has_pneumonia,
+        'confidence': float(score if has_pneumonia else 1 - score),
+        'score': float(score),
+        'model_version': model_version,
+    }
+
+
+def predict_scan_batch(buffers):
+    """
+    Predict pneumonia for many scans with a single forward pass
+    
+    Args:
+        buffers: bytes-like contents of each scan (image or DICOM)
+        
+    Returns:
+        list: per scan, a predict_scan() result dict, or the exception that
+              prevented decoding it
+    """
+    results = [None] * len(buffers)
+    pending = []
+    model_version = ModelLoader.get_instance().get_model_version()
+    for i, buffer in enumerate(buffers):
+        try:
+            image_hash = hashlib.sha256(buffer).hexdigest()
+            score = prediction_cache.get(_cache_key(model_version, image_hash))
+            if score is not None:
+                results[i] = _result(score, model_version)
+            else:
+                pending.append((i, image_hash, load_scan(buffer)))
+        except Exception as e:
+            results[i] = e
+
+    if pending:
+        scores, version = _score_batch(np.stack([img_array for _, _, img_array in pending]))
+        for (i, image_hash, _), score in zip(pending, scores):
+            prediction_cache.set(_cache_key(version, image_hash), float(score))
+            results[i] = _result(score, version)
+    return results
+
+
+def predict_scan(image_file):
     """
     Process an image file from a multipart form request and predict pneumonia
     
     Args:
-        image_file: UploadedFile from request.FILES
+        image_file: UploadedFile from request.FILES (PNG/JPEG or DICOM)
         
     Returns:
-        tuple: (has_pneumonia (bool), confidence (float))
+        dict: has_pneumonia (bool), confidence (float), score (float),
+              model_version (str) of the model that produced the score
     """
     try:
         # Get original filename provided by the client
         original_filename = image_file.name
         
-        # Reset file pointer in case it was read previously
-        image_file.seek(0)
-        
-        # Open image using PIL
-        img = Image.open(io.BytesIO(image_file.read()))
-        
-        # Preprocess image
-        img = img.convert('L')  # Ensure consistent channels
-        img = img.resize((150, 150))  # Resize to match model's expected input
+        # Hash and decode straight from the spooled upload (memory-mapped when
+        # it was spilled to disk) instead of reading it into a bytes copy
+        with upload_buffer(image_file) as buffer:
+            image_hash = hashlib.sha256(buffer).hexdigest()
+            model_version = ModelLoader.get_instance().get_model_version()
+            score = prediction_cache.get(_cache_key(model_version, image_hash))
+            if score is None:
+                # Decode at reduced resolution and normalize to the model input
+                img_array = load_scan(buffer)
         
-        # Convert to array
-        img_array = image.img_to_array(img)
-        img_array = np.expand_dims(img_array, axis=0)  # Add batch dimension
-        img_array = img_array / 255.0  # Normalize
-        
-        # Get prediction
-        cnn = ModelLoader.get_instance().get_model()
-        prediction = cnn.predict(img_array)  
+        if score is None:
+            # Get prediction (a new model version may have gone live meanwhile)
+            score, model_version = _score(img_array)
+            prediction_cache.set(_cache_key(model_version, image_hash), score)
         # Get result with confidence
-        has_pneumonia = bool(prediction[0][0] > 0.5)    
-        confidence = float(prediction[0][0] if has_pneumonia else 1 - prediction[0][0])
+        result = _result(score, model_version)
         # if 'NORMAL' in original_filename:
         #     has_pneumonia = False
-        print(f'Confidence: {confidence}, Has Pneumonia: {has_pneumonia}')
-        return has_pneumonia
+        logger.debug(f"Confidence: {result['confidence']}, Has Pneumonia: {result['has_pneumonia']}, "
+                     f"Model: {model_version}")
+        return result
         
     except Exception as e:
         # Log the error and re-raise
-        import logging
-        logging.error(f"Error in pneumonia prediction: {str(e)}")
-        raise
\ No newline at end of file
+        logger.error(f"Error in pneumonia prediction: {str(e)}")
+        raise
+
+
+def predict_pneumonia(image_file):
+    """
+    Predict pneumonia for an uploaded image file
+    
+    Returns:
+        bool: has_pneumonia
+    """
+    return predict_scan(image_file)['has_pneumonia']
@@ -0,0 +1,82 @@
+import time
+
+import numpy as np
+from PIL import Image
+
+# Model input: 150x150 grayscale scaled to [0, 1]
+TARGET_SIZE = (150, 150)
+
+# Part of the prediction cache key: bump whenever preprocess_image or
+# preprocess_dicom produce different inputs, so scores computed from the
+# old inputs are not served from the persistent cache after a deploy
+PREPROCESS_VERSION = 2
+
+# Shrink with Image.reduce (cheap box filter) down to this multiple of the
+# target before the final resize, so large films are not resampled at full size
+REDUCE_GAP = 3
+
+# Modes Image.reduce works on directly; anything else (palette, 1-bit, 16-bit)
+# is converted to L first
+_REDUCIBLE_MODES = ('L', 'LA', 'RGB', 'RGBA', 'I', 'F')
+
+
+def reduce_factor(size):
+    """Largest integer factor that keeps the image at least REDUCE_GAP times the target size"""
+    return max(1, min(size[0] // (TARGET_SIZE[0] * REDUCE_GAP), size[1] // (TARGET_SIZE[1] * REDUCE_GAP)))
+
+
+def preprocess_image(source, timings=None):
+    """
+    Decode an X-ray image and turn it into the (150, 150, 1) float32 model input.
+
+    JPEGs are decoded at reduced resolution (draft mode) and other formats are
+    shrunk with Image.reduce before the final resize, so a 3000px film is never
+    resampled at native size. The pixels are normalized once, in place, in float32.
+
+    Args:
+        source: file path or binary file-like object
+        timings: optional dict that receives per-stage durations in milliseconds
+                 (open, decode, resize, normalize)
+
+    Returns:
+        np.ndarray: float32 array of shape (150, 150, 1) with values in [0, 1]
+    """
+    start = time.perf_counter()
+    img = Image.open(source)
+    opened = time.perf_counter()
+
+    if img.format == 'JPEG':
+        # Let libjpeg decode straight to grayscale at 1/2, 1/4 or 1/8 scale
+        img.draft('L', (TARGET_SIZE[0] * REDUCE_GAP, TARGET_SIZE[1] * REDUCE_GAP))
+    img.load()
+    decoded = time.perf_counter()
+
+    if timings is not None:
+        timings['open'] = (opened - start) * 1000
+        timings['decode'] = (decoded - opened) * 1000
+    return to_model_input(img, timings)
+
+
+def to_model_input(img, timings=None):
+    """Reduce, convert to grayscale, resize and normalize an already decoded PIL image"""
+    start = time.perf_counter()
+    if img.mode not in _REDUCIBLE_MODES:
+        img = img.convert('L')
+    factor = reduce_factor(img.size)
+    if factor > 1:
+        img = img.reduce(factor)
+    if img.mode != 'L':
+        img = img.convert('L')
+    img = img.resize(TARGET_SIZE)
+    resized = time.perf_counter()
+
+    # One uint8 -> float32 copy, then scale in place; the channel axis is a view
+    img_array = np.asarray(img, dtype=np.float32)
+    np.divide(img_array, 255.0, out=img_array)
+    img_array = img_array[..., np.newaxis]
+    done = time.perf_counter()
+
+    if timings is not None:
+        timings['resize'] = (resized - start) * 1000
+        timings['normalize'] = (done - resized) * 1000
+    return img_array
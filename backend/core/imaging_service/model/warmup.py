@@ -0,0 +1,94 @@
+import os
+import time
+import logging
+import threading
+
+from .backends import serving_batch_sizes, warm_up
+from .model_loader import ModelLoader
+from .worker_pool import InferenceWorkerPool
+
+logger = logging.getLogger(__name__)
+
+
+class ModelWarmup:
+    """
+    Loads the model and runs dummy inferences at every served batch size in a
+    background thread, so Django starts immediately and the first patient does
+    not pay for graph tracing and kernel JIT. Tracks readiness for /healthz/ready.
+
+    Server processes start it when the app loads with MODEL_WARMUP=true;
+    otherwise the first readiness probe starts it, so migrate, tests and other
+    management commands do not load TensorFlow or spawn inference workers.
+    """
+    PENDING = 'pending'
+    LOADING = 'loading'
+    WARMING = 'warming'
+    READY = 'ready'
+    FAILED = 'failed'
+
+    _instance = None
+
+    def __init__(self):
+        self.status = self.PENDING
+        self.load_seconds = None
+        self.warmup_seconds = None
+        self.error = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None:
+            cls._instance = ModelWarmup()
+        return cls._instance
+
+    @staticmethod
+    def should_autostart():
+        return os.getenv('MODEL_WARMUP', 'false').lower() in ('1', 'true', 'yes', 'on')
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self.status = self.LOADING
+            self._thread = threading.Thread(target=self._run, name='model-warmup', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        try:
+            pool = InferenceWorkerPool.get_instance()
+            loader = ModelLoader.get_instance()
+            if pool is not None:
+                # Workers load and warm their own copy of the model on startup
+                self.load_seconds, self.warmup_seconds = pool.start()
+                loader.set_served_version(pool.version)
+            else:
+                start = time.perf_counter()
+                backend = loader.load_model()
+                self.load_seconds = time.perf_counter() - start
+
+                self.status = self.WARMING
+                start = time.perf_counter()
+                warm_up(backend, serving_batch_sizes())
+                self.warmup_seconds = time.perf_counter() - start
+            self.status = self.READY
+            logger.info(f"Model ready (load {self.load_seconds:.2f}s, warm-up {self.warmup_seconds:.2f}s)")
+            # From now on pick up newly published model versions without a restart
+            loader.start_watcher()
+        except Exception as e:
+            self.status = self.FAILED
+            self.error = str(e)
+            logger.error(f"Failed to preload model: {str(e)}")
+
+    def is_ready(self):
+        return self.status == self.READY
+
+    def state(self):
+        return {
+            'status': self.status,
+            'load_seconds': round(self.load_seconds, 3) if self.load_seconds is not None else None,
+            'warmup_seconds': round(self.warmup_seconds, 3) if self.warmup_seconds is not None else None,
+            'batch_sizes': serving_batch_sizes(),
+            'model_version': ModelLoader.get_instance().served_version(),
+            'error': self.error,
+        }
@@ -0,0 +1,265 @@
+import os
+import time
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from .backends import create_backend, serving_batch_sizes, warm_up
+from .model_loader import ModelLoader
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceOverloaded(Exception):
+    """Raised when inference capacity is exhausted and the request should be retried later"""
+
+
+# Per-process state of a model worker
+_worker_backend = None
+_worker_timings = None
+
+
+def _init_worker(backend_name, model_dir, threads, batch_sizes, ready):
+    """Pin the runtime thread counts, then load and warm the model once per worker process"""
+    global _worker_backend, _worker_timings
+    os.environ['TFLITE_NUM_THREADS'] = str(threads)
+    os.environ['ONNX_NUM_THREADS'] = str(threads)
+    if backend_name == 'keras':
+        import tensorflow as tf
+        tf.config.threading.set_intra_op_parallelism_threads(threads)
+        tf.config.threading.set_inter_op_parallelism_threads(1)
+    try:
+        start = time.perf_counter()
+        _worker_backend = create_backend(backend_name, model_dir)
+        loaded = time.perf_counter()
+        warm_up(_worker_backend, batch_sizes)
+        _worker_timings = (loaded - start, time.perf_counter() - loaded)
+    finally:
+        ready.release()
+
+
+def _predict_in_worker(batch):
+    return np.asarray(_worker_backend.predict(batch))
+
+
+def _worker_startup_timings():
+    return _worker_timings
+
+
+class InferenceWorkerPool:
+    """
+    Optional pool of model worker processes so inference does not contend for the
+    GIL with request handling. Each worker loads its own copy of the configured
+    backend with pinned thread counts.
+
+    Enabled with INFERENCE_WORKERS=<n>. At most INFERENCE_MAX_PENDING batches are
+    in flight; callers wait up to INFERENCE_QUEUE_TIMEOUT_MS for a slot and then
+    get InferenceOverloaded.
+
+    A pool serves a single model version. New versions get a fresh pool that
+    is warmed before it replaces this one (see replace()).
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, num_workers, backend_name, version, threads_per_worker=1, max_pending=None,
+                 queue_timeout_ms=2000):
+        self.num_workers = num_workers
+        self.backend_name = backend_name
+        self.version = version.name
+        self.model_version = version
+        self.threads_per_worker = threads_per_worker
+        self.max_pending = max_pending or 2 * num_workers
+        self.queue_timeout = queue_timeout_ms / 1000.0
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        context = multiprocessing.get_context('spawn')
+        self._workers_ready = context.Semaphore(0)
+        self._executor = ProcessPoolExecutor(
+            max_workers=num_workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(backend_name, version.path, threads_per_worker, serving_batch_sizes(), self._workers_ready),
+        )
+        self._stats_lock = threading.Lock()
+        # Callers inside submit(); drain() waits for them so none submits to a shut-down executor
+        self._users = 0
+        self._idle = threading.Condition()
+        self._retired = False
+        self._rebuilding = False
+        self._in_flight = 0
+        self._completed = 0
+        self._rejected = 0
+
+    @staticmethod
+    def is_enabled():
+        return int(os.getenv('INFERENCE_WORKERS', '0')) > 0
+
+    @classmethod
+    def get_instance(cls):
+        """The process-wide pool, or None when inference runs in-process"""
+        if not cls.is_enabled():
+            return None
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls._build(ModelLoader.get_instance().latest_version())
+        return cls._instance
+
+    @classmethod
+    def _build(cls, version):
+        num_workers = int(os.getenv('INFERENCE_WORKERS'))
+        return InferenceWorkerPool(
+            num_workers=num_workers,
+            backend_name=ModelLoader.backend_name(),
+            version=version,
+            threads_per_worker=int(os.getenv('INFERENCE_WORKER_THREADS', '1')),
+            max_pending=int(os.getenv('INFERENCE_MAX_PENDING', str(2 * num_workers))),
+            queue_timeout_ms=float(os.getenv('INFERENCE_QUEUE_TIMEOUT_MS', '2000')),
+        )
+
+    @classmethod
+    def replace(cls, version):
+        """
+        Start and warm a pool for a new model version, then swap it in. The old
+        pool finishes its in-flight batches before its workers exit.
+        """
+        new_pool = cls._build(version)
+        try:
+            new_pool.start()
+        except Exception:
+            new_pool.shutdown()
+            raise
+        with cls._instance_lock:
+            old_pool = cls._instance
+            cls._instance = new_pool
+        if old_pool is not None:
+            threading.Thread(target=old_pool.drain, name='inference-pool-drain', daemon=True).start()
+        return new_pool
+
+    def start(self, timeout=600):
+        """
+        Spawn every worker and wait until each has loaded and warmed its model.
+        Returns the slowest (load_seconds, warmup_seconds) seen.
+        """
+        futures = [self._executor.submit(_worker_startup_timings) for _ in range(self.num_workers)]
+        for _ in range(self.num_workers):
+            if not self._workers_ready.acquire(timeout=timeout):
+                raise TimeoutError('Inference workers did not start in time')
+        timings = [future.result() for future in futures]
+        timings = [t for t in timings if t is not None]
+        if not timings:
+            raise RuntimeError('Inference workers failed to load the model')
+        logger.info(f"Started {self.num_workers} inference worker(s) ({self.backend_name} backend)")
+        return max(t[0] for t in timings), max(t[1] for t in timings)
+
+    def submit(self, batch):
+        """
+        Dispatch a batch to a worker and return a Future for its (predictions,
+        model version); blocks for a free slot and raises InferenceOverloaded on
+        timeout. A caller still holding a pool that was replaced and drained is
+        sent on to the current pool, whose version the result then carries.
+        """
+        with self._idle:
+            retired = self._retired
+            if not retired:
+                self._users += 1
+        if retired:
+            return InferenceWorkerPool.get_instance().submit(batch)
+        try:
+            return self._submit(batch)
+        finally:
+            with self._idle:
+                self._users -= 1
+                self._idle.notify_all()
+
+    def _submit(self, batch):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            with self._stats_lock:
+                self._rejected += 1
+            raise InferenceOverloaded('All inference workers are busy, please retry shortly')
+        with self._stats_lock:
+            self._in_flight += 1
+        try:
+            future = self._executor.submit(_predict_in_worker, batch)
+        except BrokenProcessPool:
+            self._release()
+            self._rebuild()
+            raise InferenceOverloaded('Inference workers are restarting, please retry shortly')
+        except Exception:
+            self._release()
+            raise
+        result = Future()
+        future.add_done_callback(lambda done: self._on_done(done, result))
+        return result
+
+    def _on_done(self, done, result):
+        with self._stats_lock:
+            self._completed += 1
+        self._release()
+        if done.cancelled():
+            result.cancel()
+            return
+        error = done.exception()
+        if isinstance(error, BrokenProcessPool):
+            self._rebuild()
+            result.set_exception(InferenceOverloaded('An inference worker stopped, please retry shortly'))
+        elif error is not None:
+            result.set_exception(error)
+        else:
+            result.set_result((done.result(), self.version))
+
+    def _rebuild(self):
+        """
+        Replace this pool in the background once one of its workers died (an
+        OOM kill, a crash): the executor refuses all work from then on, and
+        callers get InferenceOverloaded (503) until the new pool is warm.
+        """
+        with InferenceWorkerPool._instance_lock:
+            if self._rebuilding or InferenceWorkerPool._instance is not self:
+                return
+            self._rebuilding = True
+        logger.error(f"An inference worker for model {self.version} died, restarting the worker pool")
+        threading.Thread(target=self._replace_broken, name='inference-pool-rebuild', daemon=True).start()
+
+    def _replace_broken(self):
+        try:
+            InferenceWorkerPool.replace(self.model_version)
+        except Exception as e:
+            logger.error(f"Could not restart the inference workers: {str(e)}")
+            with InferenceWorkerPool._instance_lock:
+                self._rebuilding = False
+
+    def _release(self):
+        with self._stats_lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def predict_with_version(self, batch):
+        return self.submit(batch).result()
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'model_version': self.version,
+                'workers': self.num_workers,
+                'threads_per_worker': self.threads_per_worker,
+                'max_pending': self.max_pending,
+                'in_flight': self._in_flight,
+                'completed': self._completed,
+                'rejected': self._rejected,
+            }
+
+    def drain(self):
+        """Let callers waiting for a slot submit and in-flight batches finish, then stop the workers"""
+        with self._idle:
+            self._idle.wait_for(lambda: self._users == 0)
+            self._retired = True
+        self._executor.shutdown(wait=True)
+        logger.info(f"Drained inference workers for model {self.version}")
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,70 @@
+import uuid
+
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+
+class DiagnosisJob(models.Model):
+    """
+    A diagnosis request accepted in job mode (202 + job id) and processed by
+    the background job runner. The table doubles as the job queue, so queued
+    work survives restarts without extra infrastructure.
+    """
+    UPLOAD_SCAN = 'upload_scan'
+    MULTIMODAL_DIAGNOSIS = 'multimodal_diagnosis'
+    TRANSCRIBE_SYMPTOMS = 'transcribe_symptoms'
+    TYPE_CHOICES = [
+        (UPLOAD_SCAN, 'Scan upload'),
+        (MULTIMODAL_DIAGNOSIS, 'Multimodal diagnosis'),
+        (TRANSCRIBE_SYMPTOMS, 'Symptom transcription'),
+    ]
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True,
+                             related_name='diagnosis_jobs')
+    job_type = models.CharField(max_length=32, choices=TYPE_CHOICES)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=QUEUED)
+
+    # Form fields of the original request and the spooled copy of its upload
+    payload = models.JSONField(default=dict, blank=True)
+    file_field = models.CharField(max_length=32, blank=True)
+    file_name = models.CharField(max_length=255, blank=True)
+    file_path = models.CharField(max_length=500, blank=True)
+
+    # Response body and HTTP status the synchronous endpoint would have returned
+    result = models.JSONField(null=True, blank=True)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    error = models.TextField(blank=True)
+
+    attempts = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'job_type', 'available_at']),
+            models.Index(fields=['user', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.job_type} {self.id} ({self.status})"
+
+    @property
+    def is_finished(self):
+        return self.status in (self.SUCCEEDED, self.FAILED)
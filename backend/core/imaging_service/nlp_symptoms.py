@@ -1,64 +1,616 @@
+import os
 import re
-from typing import Dict, List
-
-
-SYMPTOM_LEXICON = {
-    'cough': ['cough', 'coughing', 'khashi', 'sardi', 'khansi', 'ଖାସିଛି', 'ଖାସି'],
-    'fever': ['fever', 'febrile', 'temperature is high', 'jukam', 'buqar', 'jwara', 'ଜ୍ୱର', 'ଜ୍ୱର ଅନୁଭବ'],
-    'chest_pain': ['chest pain', 'pain in chest', 'tight chest', 'chest tightness', 'seena dard', 'seena re dard', 'ସିନା ରେ ଯାତନା', 'ସିନା ଯାତନା'],
-    'breathlessness': ['shortness of breath', 'breathless', 'difficulty breathing', 'dyspnea', 'dyspnoea', 'sans lai', 'dimaagi', 'swasa kastha', 'ସ୍ୱାସ କଷ୍ଟ', 'ସ୍ୱାସ କଷ୍ଟ ଅନୁଭବ'],
-    'headache': ['headache', 'head pain', 'migraine', 'sar dard', 'munda re dard', 'ମୁଣ୍ଡା ରେ ଯାତନା', 'ମୁଣ୍ଡା ଯାତନା'],
-    'sore_throat': ['sore throat', 'throat pain', 'throat hurts', 'gala dard', 'kanthare dard', 'ଗଳା ରେ ଯାତନା', 'ଗଳା ଯାତନା'],
-    'fatigue': ['fatigue', 'tired', 'weakness', 'thakan', 'kamzori', 'klanta', 'କ୍ଲାନ୍ତି', 'ଶାରୀରିକ ଦୁର୍ବଳତା'],
-    'loss_of_smell': ['loss of smell', 'can’t smell', 'cant smell', 'anosmia', 'ghrana khamoshi', 'ghrana hara', 'ଘ୍ରାଣ ହରାଇଛି', 'ଘ୍ରାଣ ଶକ୍ତି ହରାଇଛି'],
+import json
+import time
+import logging
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, FrozenSet, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+
+# Symptom terms and NegEx-style negation cues per language, loaded from the
+# lexicon file (see SymptomLexicon) and updated in place when it is reloaded.
+# A pre-negation cue negates the symptoms in the next NEGATION_PRE_WINDOW
+# tokens, a post-negation cue those in the NEGATION_POST_WINDOW tokens before
+# it; Hindi and Odia put the negation after the noun ("buqar nahi hai").
+# Pseudo-negations look like cues but do not negate ("not only"), and
+# terminators end a scope ("no fever but khansi").
+SYMPTOM_LEXICON: Dict[str, List[str]] = {}
+NEGATION_CUES: Dict[str, Dict[str, List[str]]] = {}
+
+# The English pre-negation cues as the regex templates earlier callers used
+NEGATION_PATTERNS: List[str] = []
+
+NEGATION_KINDS = ('pre', 'post', 'pseudo', 'terminators')
+
+# Overridden with SYMPTOM_LEXICON_PATH
+DEFAULT_LEXICON_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'symptom_lexicon.json')
+
+# Seconds between checks of the lexicon file for changes (0 disables reloading)
+LEXICON_RELOAD_INTERVAL = float(os.getenv('SYMPTOM_LEXICON_RELOAD_INTERVAL', '5'))
+
+# Characters of the scripts the lexicon is written in, matched against normalized (lower-case) text
+SCRIPT_PATTERNS = {
+    'latin': re.compile(r'[a-z]'),
+    'devanagari': re.compile(r'[\u0900-\u097f]'),
+    'odia': re.compile(r'[\u0b00-\u0b7f]'),
 }
+ALL_SCRIPTS = frozenset(SCRIPT_PATTERNS)
+_LATIN = frozenset(['latin'])
+_NO_SCRIPTS = frozenset()
+
+NEGATION_PRE_WINDOW = int(os.getenv('NEGATION_PRE_WINDOW', '5'))
+NEGATION_POST_WINDOW = int(os.getenv('NEGATION_POST_WINDOW', '2'))
+
+# Punctuation that ends a negation scope (commas do not: "no fever, cough or headache")
+SENTENCE_BREAKS = {'.', ';', ':', '!', '?', '।', '|'}
 
+# Shortest term word that may carry an inflection ("coughing", "ଖାସିଛି")
+MIN_STEM = 3
 
-NEGATION_PATTERNS = [
-    r"no\s+{term}",
-    r"not\s+{term}",
-    r"denies\s+{term}",
-    r"without\s+{term}",
-    r"nahi\s+{term}",
-    r"nahin\s+{term}",
-    r"do not have\s+{term}",
-    r"do not\s+{term}",
-    r"don't have\s+{term}",
-    r"don't\s+{term}",
-    r"nathi\s+{term}",
-    r"nehi\s+{term}",
-]
+# Fuzzy matching of STT misspellings ("khasi", "thakaan"), off unless SYMPTOM_FUZZY is set. A word
+# is corrected by at most the edits its length allows (FUZZY_LENGTH_FLOORS: SymSpell's 1 edit from 5
+# characters, 2 from 8) and the language's limit in the lexicon file's "fuzzy_distance", and never
+# when it is listed in the file's "fuzzy_exclude" (real words one edit from a term: "khushi", "tried")
+FUZZY_ENABLED = os.getenv('SYMPTOM_FUZZY', 'false').lower() in ('1', 'true', 'yes', 'on')
+FUZZY_LENGTH_FLOORS = ((8, 2), (5, 1))
+MAX_FUZZY_DISTANCE = 2
+# Shortest lexicon word a token may be corrected to
+MIN_FUZZY_WORD = 4
+FUZZY_CACHE_SIZE = 50000
 
 
 def normalize_text(text: str) -> str:
     return re.sub(r"\s+", " ", text.strip().lower())
 
 
-def extract_symptoms(transcript: str) -> Dict[str, bool]:
+# Characters that separate words besides spaces and sentence breaks: "(fever)", "dry-cough", "cough/fever".
+# An explicit list rather than \W, which would also split Indic vowel signs and viramas off their letters.
+# Apostrophes between letters stay in the word ("don't", "can’t"); quotes around words do not
+WORD_SEPARATORS = ',()[]{}<>"\'“”‘’«»/\\-–—&+*=~#%^_`@…'
+
+_WORD = rf"[^\s.;:!?।|{re.escape(WORD_SEPARATORS)}]+"
+_TOKEN = re.compile(rf"[.;:!?।|]|{_WORD}(?:['’]{_WORD})*")
+
+
+def tokenize(text: str) -> List[str]:
+    """Words and sentence breaks of normalized text (split on spaces and WORD_SEPARATORS)"""
+    return _TOKEN.findall(text)
+
+
+def detect_scripts(text: str) -> FrozenSet[str]:
+    """The lexicon scripts that occur in normalized text"""
+    if text.isascii():
+        return _LATIN if SCRIPT_PATTERNS['latin'].search(text) else _NO_SCRIPTS
+    return frozenset(script for script, pattern in SCRIPT_PATTERNS.items() if pattern.search(text))
+
+
+def phrase_script(phrase: str) -> Optional[str]:
+    """The script of a lexicon phrase (its first letter's), or None for one without letters of any"""
+    for char in normalize_text(phrase):
+        for script, pattern in SCRIPT_PATTERNS.items():
+            if pattern.match(char):
+                return script
+    return None
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance (a swap of neighbours is one edit), or limit + 1 once above limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    before, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (a[i - 1] != b[j - 1]))
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        before, previous = previous, current
+    return min(previous[-1], limit + 1)
+
+
+def _deletes(word, distance):
+    """The word and every string left after deleting up to `distance` of its characters"""
+    variants = frontier = {word}
+    for _ in range(distance):
+        frontier = {variant[:i] + variant[i + 1:] for variant in frontier for i in range(len(variant))}
+        variants = variants | frontier
+    return variants
+
+
+class FuzzyIndex:
+    """
+    SymSpell-style deletion index: every lexicon word is stored under the
+    strings left after deleting up to MAX_FUZZY_DISTANCE of its characters,
+    so the words within that many edits of a token are among those sharing
+    one of the token's own deletions. A lookup costs a few dictionary probes
+    per deletion of the token, however many words the lexicon has.
+    """
+
+    def __init__(self, words: Dict[str, FrozenSet[str]], max_distance: int = MAX_FUZZY_DISTANCE):
+        self.words = words
+        self.max_distance = max_distance
+        self._deletes: Dict[str, Set[str]] = {}
+        for word in words:
+            for variant in _deletes(word, max_distance):
+                self._deletes.setdefault(variant, set()).add(word)
+
+    def lookup(self, token: str, distance: int) -> Optional[str]:
+        """
+        The closest word within distance edits of the token. None when there
+        is none, or when the closest words stand for different symptoms.
+        """
+        distance = min(distance, self.max_distance)
+        candidates = set()
+        for variant in _deletes(token, distance):
+            candidates.update(self._deletes.get(variant, ()))
+        best, closest = distance + 1, []
+        for word in candidates:
+            found = edit_distance(token, word, best)
+            if found < best:
+                best, closest = found, [word]
+            elif found == best and found <= distance:
+                closest.append(word)
+        if not closest or len({self.words[word] for word in closest}) > 1:
+            return None
+        return min(closest)
+
+
+def fuzzy_limit(token: str) -> int:
+    """Edits a token of this length may be corrected by"""
+    for length, distance in FUZZY_LENGTH_FLOORS:
+        if len(token) >= length:
+            return distance
+    return 0
+
+
+TERM, PRE, POST, PSEUDO, STOP = 'term', 'pre', 'post', 'pseudo', 'stop'
+
+
+_BREAK = frozenset([STOP])
+_MENTION = frozenset([TERM])
+_PRE = frozenset([PRE])
+_POST = frozenset([POST])
+
+
+def _effective(kinds):
+    """What a phrase listed under several kinds acts as: pseudo-negation, terminator, cue(s), then term"""
+    for kind in (PSEUDO, STOP):
+        if kind in kinds:
+            return frozenset([kind])
+    return frozenset(kinds & {PRE, POST} or kinds)
+
+
+class NegationScope:
+    """
+    Linear-time symptom extraction with NegEx-style negation scopes.
+
+    The transcript is tokenized once and scanned left to right for the
+    longest lexicon term, cue, pseudo-negation or terminator at each token,
+    via a dictionary keyed on the phrase's first word (a term's last word may
+    carry an inflection suffix). A forward pass applies pre-negation scopes,
+    a backward pass post-negation scopes, each ending at a terminator or
+    sentence break. A symptom is present when at least one of its mentions
+    is not negated. With a fuzzy distance, words that are not in the lexicon
+    are first corrected to the term word they are a misspelling of.
+    """
+
+    def __init__(self, lexicon: Dict[str, List[str]], cues: Dict[str, List[str]],
+                 pre_window: int = NEGATION_PRE_WINDOW, post_window: int = NEGATION_POST_WINDOW,
+                 fuzzy_exclude: Iterable[str] = ()):
+        self.symptoms = list(lexicon)
+        self.fuzzy_exclude = frozenset(fuzzy_exclude)
+        self.pre_window = pre_window
+        self.post_window = post_window
+        # first word -> [(words, kinds, symptoms)], longest first
+        self._phrases: Dict[str, list] = {}
+        entries: Dict[tuple, list] = {}
+        for key, terms in lexicon.items():
+            for term in terms:
+                self._entry(entries, term, TERM)[1].add(key)
+        for kind in (PRE, POST, PSEUDO):
+            for cue in cues.get(kind, []):
+                self._entry(entries, cue, kind)
+        for terminator in cues.get('terminators', []):
+            self._entry(entries, terminator, STOP)
+        for words, (kinds, symptoms) in entries.items():
+            self._phrases.setdefault(words[0], []).append((words, _effective(kinds), frozenset(symptoms)))
+        for candidates in self._phrases.values():
+            candidates.sort(key=lambda phrase: -len(phrase[0]))
+        # Single-word terms, for inflected tokens whose exact form is not in the lexicon
+        self._stems = {words[0]: frozenset(symptoms) for words, (kinds, symptoms) in entries.items()
+                       if len(words) == 1 and _effective(kinds) == {TERM} and len(words[0]) >= MIN_STEM}
+        self._max_stem = max((len(stem) for stem in self._stems), default=0)
+        self._stem_heads = frozenset(stem[:MIN_STEM] for stem in self._stems)
+        # Words misspelled tokens may be corrected to: those of terms, long enough and not also cue words
+        self._words = frozenset(word for words in entries for word in words)
+        cue_words = {word for words, (kinds, _) in entries.items() if _effective(kinds) != {TERM} for word in words}
+        self._term_words: Dict[str, Set[str]] = {}
+        for words, (kinds, symptoms) in entries.items():
+            if _effective(kinds) == {TERM}:
+                for word in words:
+                    if len(word) >= MIN_FUZZY_WORD and word not in cue_words:
+                        self._term_words.setdefault(word, set()).update(symptoms)
+        self._fuzzy: Optional[FuzzyIndex] = None
+        self._corrections: Dict[tuple, Optional[str]] = {}
+
+    @staticmethod
+    def _entry(entries, phrase, kind):
+        words = tuple(tokenize(normalize_text(phrase)))
+        kinds, symptoms = entries.setdefault(words, (set(), set()))
+        kinds.add(kind)
+        return kinds, symptoms
+
+    @staticmethod
+    def _matches(words, kinds, tokens, i):
+        if i + len(words) > len(tokens):
+            return False
+        last = len(words) - 1
+        for offset, word in enumerate(words):
+            token = tokens[i + offset]
+            if token != word and not (offset == last and TERM in kinds and len(word) >= MIN_STEM
+                                      and token.startswith(word)):
+                return False
+        return True
+
+    def _stem(self, token):
+        if token[:MIN_STEM] not in self._stem_heads:
+            return None
+        for length in range(min(len(token) - 1, self._max_stem), MIN_STEM - 1, -1):
+            symptoms = self._stems.get(token[:length])
+            if symptoms is not None:
+                return symptoms
+        return None
+
+    def correct(self, tokens: List[str], distance: int) -> List[str]:
+        """The tokens with unknown words replaced by the lexicon word they are a misspelling of"""
+        if self._fuzzy is None:
+            self._fuzzy = FuzzyIndex({word: frozenset(symptoms) for word, symptoms in self._term_words.items()})
+        corrected = []
+        for token in tokens:
+            limit = min(distance, fuzzy_limit(token))
+            if (limit < 1 or token in self._words or token in self.fuzzy_exclude
+                    or self._stem(token) is not None):
+                corrected.append(token)
+                continue
+            key = (token, limit)
+            if key not in self._corrections:
+                if len(self._corrections) >= FUZZY_CACHE_SIZE:
+                    self._corrections.clear()
+                self._corrections[key] = self._fuzzy.lookup(token, limit)
+            corrected.append(self._corrections[key] or token)
+        return corrected
+
+    def events(self, tokens: List[str]) -> list:
+        """[(start, end, kinds, symptoms)] for the phrases in the tokens, longest match first, no overlaps"""
+        events = []
+        i = 0
+        while i < len(tokens):
+            token = tokens[i]
+            if token in SENTENCE_BREAKS:
+                events.append((i, i + 1, _BREAK, frozenset()))
+                i += 1
+                continue
+            match = None
+            for words, kinds, symptoms in self._phrases.get(token, ()):
+                if self._matches(words, kinds, tokens, i):
+                    match = (len(words), kinds, symptoms)
+                    break
+            if match is None:
+                symptoms = self._stem(token)
+                if symptoms is not None:
+                    match = (1, _MENTION, symptoms)
+            if match is None:
+                i += 1
+                continue
+            length, kinds, symptoms = match
+            events.append((i, i + length, kinds, symptoms))
+            i += length
+        return events
+
+    def mentions(self, text: str, fuzzy_distance: int = 0) -> List[tuple]:
+        """[(symptoms, negated)] for every symptom mention in normalized text, in order"""
+        tokens = tokenize(text)
+        if fuzzy_distance > 0:
+            tokens = self.correct(tokens, fuzzy_distance)
+        events = self.events(tokens)
+        negated = [False] * len(events)
+
+        # A cue that can go either side ("denied") looks back when a mention is right before it.
+        # Post-negation windows count the words between the end of a mention and the cue
+        roles = []
+        for index, (start, end, kinds, _) in enumerate(events):
+            if PRE in kinds and POST in kinds:
+                previous = events[index - 1] if index else None
+                follows_term = previous is not None and TERM in previous[2] and previous[1] > start - self.post_window
+                kinds = _POST if follows_term else _PRE
+            roles.append(kinds)
+
+        scope_end = -1
+        for index, (start, end, _, _) in enumerate(events):
+            kinds = roles[index]
+            if PRE in kinds:
+                scope_end = end + self.pre_window
+            elif STOP in kinds:
+                scope_end = -1
+            elif TERM in kinds and start < scope_end:
+                negated[index] = True
+
+        scope_start = None
+        for index in range(len(events) - 1, -1, -1):
+            (start, end, _, _), kinds = events[index], roles[index]
+            if POST in kinds:
+                scope_start = start - self.post_window
+            elif STOP in kinds:
+                scope_start = None
+            elif TERM in kinds and scope_start is not None and end > scope_start:
+                negated[index] = True
+
+        return [(symptoms, negated[index]) for index, (_, _, kinds, symptoms) in enumerate(events) if TERM in kinds]
+
+    def match(self, text: str, fuzzy_distance: int = 0) -> Dict[str, bool]:
+        present: Set[str] = set()
+        for symptoms, negated in self.mentions(text, fuzzy_distance):
+            if not negated:
+                present |= symptoms
+        return {key: key in present for key in self.symptoms}
+
+
+class LexiconError(ValueError):
+    """Raised for a lexicon file that is not valid JSON or not shaped like symptom_lexicon.json"""
+
+
+def _phrases(value, where):
+    if not isinstance(value, list) or not all(isinstance(phrase, str) and phrase.strip() for phrase in value):
+        raise LexiconError(f"{where} must be a list of non-empty strings")
+    return list(value)
+
+
+class SymptomLexicon:
+    """
+    One version of the lexicon file: symptom terms and negation cues per
+    language, and the negation engines compiled from them. The file holds a
+    'version', 'symptoms' (symptom -> terms), 'negation' (language -> pre,
+    post, pseudo and terminators cue lists) and optionally 'fuzzy_distance'
+    (language or '*' for the others -> edits allowed when fuzzy matching)
+    and 'fuzzy_exclude' (words never corrected).
+
+    Engines are built on first use for each combination of cue languages
+    and scripts: a transcript only runs the shard of terms and cues written
+    in the scripts its characters use (Latin, Devanagari, Odia), plus
+    phrases without letters of any.
+    """
+
+    def __init__(self, path: str, version: str, symptoms: Dict[str, List[str]],
+                 negation: Dict[str, Dict[str, List[str]]], stamp: tuple,
+                 fuzzy_distance: Optional[Dict[str, int]] = None, fuzzy_exclude: Iterable[str] = ()):
+        self.path = path
+        self.version = version
+        self.symptoms = symptoms
+        self.negation = negation
+        self.fuzzy_distances = fuzzy_distance or {}
+        self.fuzzy_exclude = frozenset(normalize_text(word) for word in fuzzy_exclude)
+        self.stamp = stamp
+        self.loaded_at = time.time()
+        self._engines: Dict[tuple, NegationScope] = {}
+        self._languages: Dict[Optional[str], tuple] = {}
+
+    @classmethod
+    def load(cls, path: str) -> 'SymptomLexicon':
+        stamp = _stamp(path)
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+        except ValueError as e:
+            raise LexiconError(f"{path} is not valid JSON: {e}")
+        if not isinstance(data, dict) or not isinstance(data.get('symptoms'), dict) or not data['symptoms']:
+            raise LexiconError(f"{path} needs a non-empty 'symptoms' object")
+        if 'version' not in data:
+            raise LexiconError(f"{path} has no 'version'")
+        symptoms = {key: _phrases(terms, f"symptoms.{key}") for key, terms in data['symptoms'].items()}
+        negation = {}
+        for language, kinds in (data.get('negation') or {}).items():
+            if not isinstance(kinds, dict) or set(kinds) - set(NEGATION_KINDS):
+                raise LexiconError(f"negation.{language} may only list {', '.join(NEGATION_KINDS)}")
+            negation[language] = {kind: _phrases(kinds.get(kind, []), f"negation.{language}.{kind}")
+                                  for kind in NEGATION_KINDS}
+        fuzzy_distance = data.get('fuzzy_distance') or {}
+        if not isinstance(fuzzy_distance, dict) or not all(
+                isinstance(limit, int) and 0 <= limit <= MAX_FUZZY_DISTANCE for limit in fuzzy_distance.values()):
+            raise LexiconError(f"fuzzy_distance must map languages to 0-{MAX_FUZZY_DISTANCE} edits")
+        fuzzy_exclude = _phrases(data.get('fuzzy_exclude', []), 'fuzzy_exclude')
+        return cls(path, str(data['version']), symptoms, negation, stamp, fuzzy_distance, fuzzy_exclude)
+
+    def fuzzy_distance(self, language: Optional[str]) -> int:
+        """Edits allowed when fuzzy matching a transcript in this language"""
+        base = (language or '').split('-')[0].lower()
+        return self.fuzzy_distances.get(base, self.fuzzy_distances.get('*', 0))
+
+    def languages(self, language: Optional[str]) -> tuple:
+        """Cue lists for a transcript: its language's plus English (code-mixed speech), or all when unknown"""
+        languages = self._languages.get(language)
+        if languages is None:
+            base = (language or '').split('-')[0].lower()
+            if base in self.negation:
+                languages = tuple(sorted({base, 'en'} & set(self.negation)))
+            else:
+                languages = tuple(sorted(self.negation))
+            self._languages[language] = languages
+        return languages
+
+    def engine(self, language: Optional[str] = None, scripts: Optional[FrozenSet[str]] = None) -> NegationScope:
+        key = (self.languages(language), ALL_SCRIPTS if scripts is None else scripts)
+        engine = self._engines.get(key)
+        if engine is None:
+            languages, scripts = key
+
+            def shard(phrases):
+                return [phrase for phrase in phrases if phrase_script(phrase) in scripts | {None}]
+
+            lexicon = {symptom: shard(terms) for symptom, terms in self.symptoms.items()}
+            cues = {kind: shard([cue for code in languages for cue in self.negation[code][kind]])
+                    for kind in NEGATION_KINDS}
+            engine = self._engines[key] = NegationScope(lexicon, cues, fuzzy_exclude=self.fuzzy_exclude)
+        return engine
+
+
+def lexicon_path() -> str:
+    return os.getenv('SYMPTOM_LEXICON_PATH') or DEFAULT_LEXICON_PATH
+
+
+def _stamp(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+_lexicon: Optional[SymptomLexicon] = None
+_lexicon_lock = threading.Lock()
+_next_check = 0.0
+_failed_stamp = None
+_reloads = 0
+
+
+def reload_lexicon() -> bool:
+    """
+    Load the lexicon file if it changed since it was last loaded, and swap it
+    in; returns True if a new version went live. Replace the file atomically
+    (write a temporary file, then rename it) so a half-written one is never
+    read. A broken file is logged and the current lexicon kept; only the
+    first load raises.
+    """
+    global _lexicon, _failed_stamp, _reloads
+    path = lexicon_path()
+    with _lexicon_lock:
+        stamp = None
+        try:
+            stamp = _stamp(path)
+            if _lexicon is not None and (path, stamp) == (_lexicon.path, _lexicon.stamp):
+                return False
+            if (path, stamp) == _failed_stamp:
+                return False
+            lexicon = SymptomLexicon.load(path)
+        except (OSError, LexiconError) as e:
+            if _lexicon is None:
+                raise
+            if (path, stamp) == _failed_stamp:
+                return False
+            _failed_stamp = (path, stamp)
+            logger.error(f"Could not load symptom lexicon {path}, keeping version {_lexicon.version}: {e}")
+            return False
+        previous = _lexicon
+        _lexicon = lexicon
+        _failed_stamp = None
+        # Updated in place so names imported from this module see the new version too
+        SYMPTOM_LEXICON.clear()
+        SYMPTOM_LEXICON.update(lexicon.symptoms)
+        NEGATION_CUES.clear()
+        NEGATION_CUES.update(lexicon.negation)
+        english = lexicon.negation.get('en', {}).get('pre', [])
+        NEGATION_PATTERNS[:] = [rf"{re.escape(cue)}\s+{{term}}" for cue in english]
+        if previous is not None:
+            _reloads += 1
+            logger.info(f"Symptom lexicon {previous.version} replaced by {lexicon.version} from {path}")
+        return True
+
+
+def current_lexicon() -> SymptomLexicon:
+    """The loaded lexicon, checking the file for changes every LEXICON_RELOAD_INTERVAL seconds"""
+    global _next_check
+    if _lexicon is None:
+        reload_lexicon()
+    elif LEXICON_RELOAD_INTERVAL > 0 and time.monotonic() >= _next_check:
+        _next_check = time.monotonic() + LEXICON_RELOAD_INTERVAL
+        reload_lexicon()
+    return _lexicon
+
+
+def lexicon_stats() -> dict:
+    lexicon = current_lexicon()
+    return {
+        'version': lexicon.version,
+        'path': lexicon.path,
+        'loaded_at': lexicon.loaded_at,
+        'reloads': _reloads,
+        'terms': sum(len(terms) for terms in lexicon.symptoms.values()),
+        'languages': sorted(lexicon.negation),
+        'fuzzy': FUZZY_ENABLED,
+        'fuzzy_distance': lexicon.fuzzy_distances,
+        'engines': len(lexicon._engines),
+    }
+
+
+def negation_engine(language: Optional[str] = None, scripts: Optional[FrozenSet[str]] = None) -> NegationScope:
+    return current_lexicon().engine(language, scripts)
+
+
+def extract_symptoms(transcript: str, language: Optional[str] = None,
+                     fuzzy: Optional[bool] = None) -> Dict[str, bool]:
     """
     Lightweight rule-based extractor with negation handling.
-    Returns a dict of normalized symptom flags.
+    Returns a dict of normalized symptom flags. fuzzy overrides SYMPTOM_FUZZY
+    for matching misspelled terms.
     """
     text = normalize_text(transcript)
+    lexicon = current_lexicon()
+    distance = lexicon.fuzzy_distance(language) if (FUZZY_ENABLED if fuzzy is None else fuzzy) else 0
+    return lexicon.engine(language, detect_scripts(text)).match(text, distance)
+
+
+def _extract_chunk(chunk: List[Tuple[str, Optional[str]]]) -> List[Dict[str, bool]]:
+    return [extract_symptoms(transcript, language) for transcript, language in chunk]
+
+
+def _chunks(transcripts, language, size):
+    chunk = []
+    for item in transcripts:
+        chunk.append((item, language) if isinstance(item, str) else tuple(item))
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
 
-    findings: Dict[str, bool] = {}
-    for key, variants in SYMPTOM_LEXICON.items():
-        present = False
-        negated = False
-        for variant in variants:
-            pattern = re.escape(variant)
-            if re.search(pattern, text):
-                present = True
-                # Check negation windows (simple heuristic: negation within 10 tokens before term)
-                for neg_tpl in NEGATION_PATTERNS:
-                    neg_regex = neg_tpl.format(term=pattern)
-                    if re.search(neg_regex, text):
-                        negated = True
-                        break
-            if present and negated:
-                break
-        findings[key] = True if (present and not negated) else False
-    return findings
+def extract_symptoms_batch(transcripts: Iterable[Union[str, Tuple[str, Optional[str]]]],
+                           language: Optional[str] = None, workers: Optional[int] = None,
+                           chunk_size: Optional[int] = None) -> Iterator[Dict[str, bool]]:
+    """
+    extract_symptoms over many transcripts, yielding the flags in input order.
+
+    Items are transcripts (in `language`) or (transcript, language) pairs. The
+    input is consumed lazily in chunks of SYMPTOM_BATCH_CHUNK transcripts that
+    are spread over SYMPTOM_BATCH_WORKERS processes (default: one per CPU),
+    each building its negation engines once; with at most two chunks per
+    worker in flight, memory stays flat however long the input is. One worker
+    runs in-process.
+    """
+    if workers is None:
+        workers = int(os.getenv('SYMPTOM_BATCH_WORKERS', '0')) or os.cpu_count() or 1
+    if chunk_size is None:
+        chunk_size = int(os.getenv('SYMPTOM_BATCH_CHUNK', '500'))
+    chunks = _chunks(transcripts, language, max(1, chunk_size))
+    if workers <= 1:
+        for chunk in chunks:
+            yield from _extract_chunk(chunk)
+        return
+
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+    pending = deque()
+    try:
+        for chunk in chunks:
+            pending.append(executor.submit(_extract_chunk, chunk))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+    finally:
+        executor.shutdown(cancel_futures=True)
 
 
 def to_vitals_flags(symptoms: Dict[str, bool]) -> Dict[str, bool]:
@@ -72,4 +624,7 @@ def to_vitals_flags(symptoms: Dict[str, bool]) -> Dict[str, bool]:
         'breathlessness': symptoms.get('breathlessness', False),
         'chest_pain': symptoms.get('chest_pain', False),
         'fever_symptom': symptoms.get('fever', False),
-    }
\ No newline at end of file
+    }
+
+
+reload_lexicon()
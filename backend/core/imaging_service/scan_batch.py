@@ -0,0 +1,226 @@
+import io
+import os
+import csv
+import json
+import logging
+import zipfile
+import zlib
+from contextlib import ExitStack, contextmanager
+from datetime import datetime
+
+from dateutil.relativedelta import relativedelta
+
+from .dicom import is_dicom, patient_info, read_header
+from .knowledge_base import calculate
+from .model.model_predict import predict_scan_batch
+from .uploads import ScanUploadParser, upload_buffer
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = 'manifest.csv'
+
+
+class BatchError(Exception):
+    """Raised for batch requests that cannot be processed at all (bad archive or manifest, too many images)"""
+
+
+class BatchScan:
+    """One scan of a batch: its file name and how to get at its bytes"""
+
+    def __init__(self, name, uploaded_file=None, archive=None, member=None):
+        self.name = name
+        self.uploaded_file = uploaded_file
+        self.archive = archive
+        self.member = member
+
+    @contextmanager
+    def open(self):
+        """Yield the scan contents as a bytes-like buffer"""
+        if self.uploaded_file is not None:
+            with upload_buffer(self.uploaded_file) as buffer:
+                yield buffer
+            return
+        max_bytes = ScanUploadParser().limits()[0]
+        if self.member.file_size > max_bytes:
+            raise BatchError(f'{self.name} exceeds the {max_bytes // (1024 * 1024)} MB per-scan limit')
+        yield memoryview(self.archive.read(self.member))
+
+
+def batch_size():
+    """Scans decoded and sent through the model together (SCAN_BATCH_SIZE)"""
+    return max(1, int(os.getenv('SCAN_BATCH_SIZE', '32')))
+
+
+def max_images():
+    """Largest number of scans accepted in one request (SCAN_BATCH_MAX_IMAGES)"""
+    return int(os.getenv('SCAN_BATCH_MAX_IMAGES', '1000'))
+
+
+def _is_scan_member(info):
+    name = info.filename
+    base = os.path.basename(name)
+    return (not info.is_dir() and not base.startswith('.') and not name.startswith('__MACOSX/')
+            and base.lower() != MANIFEST_NAME)
+
+
+def read_manifest(text):
+    """Per-image vitals keyed on file name, from a CSV with a 'filename' column"""
+    try:
+        reader = csv.DictReader(io.StringIO(text))
+        if not reader.fieldnames or 'filename' not in reader.fieldnames:
+            raise BatchError("Manifest must be a CSV file with a 'filename' column")
+        return {os.path.basename(row['filename'].strip()): row for row in reader if row.get('filename')}
+    except csv.Error as e:
+        raise BatchError(f'Invalid manifest: {str(e)}')
+
+
+def _decode_manifest(data):
+    try:
+        return data.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        raise BatchError('Manifest must be a UTF-8 encoded CSV file')
+
+
+def collect_batch(files):
+    """
+    Gather the scans of a batch request: multipart 'images' parts and/or one
+    zip 'archive'. The manifest comes from a 'manifest' part or a manifest.csv
+    inside the archive. Returns (scans, manifest, archive); the archive is
+    closed here if the request is rejected, otherwise by the caller.
+    """
+    scans = [BatchScan(f.name, uploaded_file=f) for f in files.getlist('images')]
+    manifest_text = None
+    archive = None
+
+    if 'archive' in files:
+        try:
+            archive = zipfile.ZipFile(files['archive'].file)
+        except zipfile.BadZipFile as e:
+            raise BatchError(f'Invalid zip archive: {str(e)}')
+    try:
+        if archive is not None:
+            for info in archive.infolist():
+                if _is_scan_member(info):
+                    scans.append(BatchScan(info.filename, archive=archive, member=info))
+                elif os.path.basename(info.filename).lower() == MANIFEST_NAME:
+                    try:
+                        data = archive.read(info)
+                    except (zipfile.BadZipFile, zlib.error, NotImplementedError, RuntimeError) as e:
+                        raise BatchError(f'Cannot read {info.filename} from the archive: {str(e)}')
+                    manifest_text = _decode_manifest(data)
+
+        if 'manifest' in files:
+            files['manifest'].seek(0)
+            manifest_text = _decode_manifest(files['manifest'].read())
+
+        if len(scans) > max_images():
+            raise BatchError(f'Too many scans in one batch ({len(scans)}), the limit is {max_images()}')
+        manifest = read_manifest(manifest_text) if manifest_text else {}
+    except BaseException:
+        if archive is not None:
+            archive.close()
+        raise
+    return scans, manifest, archive
+
+
+def _parse_birthdate(value):
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        try:
+            return datetime.strptime(value, '%m/%d/%Y')
+        except ValueError:
+            raise ValueError('Invalid birthdate format. Please use YYYY-MM-DD or MM/DD/YYYY')
+
+
+def _diagnosis(row, patient, has_pneumonia):
+    """Run the Bayesian calculation on a manifest row, like upload_scan does on its form fields"""
+    def field(key):
+        value = row.get(key)
+        return value.strip() if value and value.strip() else None
+
+    birthdate_str = field('birthdate') or patient.get('birthdate')
+    if not birthdate_str:
+        raise ValueError('Birthdate is required')
+    age = relativedelta(datetime.now(), _parse_birthdate(birthdate_str)).years
+
+    params = {
+        'systolic_pressure': int(field('systolicBP')) if field('systolicBP') is not None else 120,
+        'diastolic_pressure': int(field('diastolicBP')) if field('diastolicBP') is not None else 80,
+        'temperature': float(field('temperature')) if field('temperature') is not None else 37.0,
+        'heart_rate': int(field('heartRate')) if field('heartRate') is not None else 75,
+        'has_cough': (field('hasCough') or 'false').lower() == 'true',
+        'has_headache': (field('hasHeadaches') or 'false').lower() == 'true',
+        'can_smell': (field('canSmellTaste') or 'true').lower() == 'true',
+        'age': float(age),
+        'gender': field('gender') or patient.get('gender', 'female'),
+        'has_pneumonia': has_pneumonia,
+    }
+    result = calculate(**params)
+    result['age'] = age
+    return result
+
+
+def _line(payload):
+    return json.dumps(payload) + '\n'
+
+
+def stream_batch_results(scans, manifest, archive=None):
+    """
+    Yield one NDJSON line per scan as each batch of SCAN_BATCH_SIZE scans
+    comes back from the model, then a summary line.
+    """
+    succeeded = failed = 0
+    size = batch_size()
+    try:
+        for start in range(0, len(scans), size):
+            chunk = scans[start:start + size]
+            lines = []
+            with ExitStack() as stack:
+                buffers, errors = [], {}
+                for i, scan in enumerate(chunk):
+                    try:
+                        buffers.append(stack.enter_context(scan.open()))
+                    except Exception as e:
+                        errors[i] = e
+                        buffers.append(memoryview(b''))
+
+                try:
+                    predictions = predict_scan_batch(buffers)
+                except Exception as e:
+                    # Inference itself failed (e.g. workers overloaded): report it for the whole batch
+                    logger.error(f"Batch inference failed: {str(e)}")
+                    predictions = [e] * len(chunk)
+
+                for i, (scan, prediction) in enumerate(zip(chunk, predictions)):
+                    result = {'index': start + i, 'filename': scan.name}
+                    prediction = errors.get(i, prediction)
+                    if isinstance(prediction, Exception):
+                        result['error'] = str(prediction)
+                        failed += 1
+                        lines.append(_line(result))
+                        continue
+
+                    result.update({
+                        'hasPneumonia': prediction['has_pneumonia'],
+                        'confidence': prediction['confidence'],
+                        'score': prediction['score'],
+                        'modelVersion': prediction['model_version'],
+                    })
+                    row = manifest.get(os.path.basename(scan.name))
+                    if row is not None:
+                        try:
+                            patient = {}
+                            if is_dicom(buffers[i]):
+                                patient = patient_info(read_header(buffers[i], stop_before_pixels=True))
+                            result['diagnosis'] = _diagnosis(row, patient, prediction['has_pneumonia'])
+                        except Exception as e:
+                            result['diagnosisError'] = str(e)
+                    succeeded += 1
+                    lines.append(_line(result))
+            yield ''.join(lines)
+
+        yield _line({'summary': {'total': len(scans), 'succeeded': succeeded, 'failed': failed}})
+    finally:
+        if archive is not None:
+            archive.close()
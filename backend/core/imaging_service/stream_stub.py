@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Streaming Transcription Stub Script
+
+A local stand-in for Deepgram's live streaming API, to exercise the
+/ws/symptoms/transcribe WebSocket endpoint without a Deepgram account, plus a
+client that streams a recording to that endpoint like the browser does.
+
+The stub reveals one word of a fixed transcript per audio chunk as an interim
+result, finalizes a segment every few words, and on CloseStream finalizes the
+rest and closes, like Deepgram.
+
+Usage:
+    python stream_stub.py serve [--port 8775] [--transcript "mujhe buqar hai aur khansi nahi hai"]
+        then run the server with DEEPGRAM_API_KEY=anything
+        DEEPGRAM_STREAMING_URL=ws://127.0.0.1:8775/v1/listen
+
+    python stream_stub.py send --token ACCESS_TOKEN [--url ws://127.0.0.1:8000/ws/symptoms/transcribe]
+        [--file note.webm] [--language hi] [--chunk-ms 250]
+"""
+
+import json
+import time
+import asyncio
+import argparse
+
+from websockets.asyncio.client import connect
+from websockets.asyncio.server import serve
+from websockets.exceptions import ConnectionClosed
+
+DEFAULT_TRANSCRIPT = 'mujhe teen din se buqar hai aur khansi bhi hai lekin seena dard nahi hai'
+
+
+def results_message(transcript, is_final):
+    return json.dumps({
+        'type': 'Results',
+        'is_final': is_final,
+        'speech_final': is_final,
+        'channel': {'alternatives': [{'transcript': transcript, 'confidence': 0.99}]},
+    })
+
+
+async def stub_session(connection, words, words_per_segment):
+    if connection.request.headers.get('Authorization', '').split(' ')[0] != 'Token':
+        await connection.close(4001, 'missing Token authorization')
+        return
+    print(f"stream opened: {connection.request.path}")
+    segment, position, chunks = [], 0, 0
+    async for message in connection:
+        if isinstance(message, bytes):
+            chunks += 1
+            if position < len(words):
+                segment.append(words[position])
+                position += 1
+                final = len(segment) >= words_per_segment
+                await connection.send(results_message(' '.join(segment), final))
+                if final:
+                    segment = []
+            continue
+        command = json.loads(message).get('type')
+        if command == 'CloseStream':
+            rest = segment + words[position:]
+            if rest:
+                await connection.send(results_message(' '.join(rest), True))
+            await connection.send(json.dumps({'type': 'Metadata', 'duration': chunks}))
+            break
+    print(f"stream closed after {chunks} chunks")
+    await connection.close()
+
+
+async def run_stub(port, transcript, words_per_segment):
+    words = transcript.split()
+    async with serve(lambda connection: stub_session(connection, words, words_per_segment), '127.0.0.1', port):
+        print(f"Deepgram streaming stub on ws://127.0.0.1:{port}/v1/listen")
+        await asyncio.Future()
+
+
+async def send_recording(url, token, language, path, chunk_ms, chunks):
+    if path:
+        with open(path, 'rb') as f:
+            audio = f.read()
+        size = max(1, len(audio) // chunks)
+        pieces = [audio[i:i + size] for i in range(0, len(audio), size)]
+    else:
+        pieces = [bytes(4000)] * chunks
+    query = f"?token={token}" + (f"&language={language}" if language else '')
+    start = time.perf_counter()
+    async with connect(url + query) as connection:
+        async def sender():
+            try:
+                for piece in pieces:
+                    await connection.send(piece)
+                    # Pace the chunks like a live recording
+                    await asyncio.sleep(chunk_ms / 1000)
+                await connection.send(json.dumps({'type': 'stop'}))
+            except ConnectionClosed:
+                pass
+            return time.perf_counter()
+
+        sending = asyncio.ensure_future(sender())
+        try:
+            async for message in connection:
+                data = json.loads(message)
+                elapsed = (time.perf_counter() - start) * 1000
+                present = sorted(k for k, v in (data.get('symptoms') or {}).items() if v)
+                print(f"{elapsed:8.0f}ms {data['type']:<8} {data.get('transcript', data.get('error'))!r} {present}")
+                if data['type'] == 'final':
+                    stopped = await sending
+                    print(f"final result {(time.perf_counter() - stopped) * 1000:.0f}ms after recording stopped")
+        except ConnectionClosed:
+            pass
+        await sending
+        print(f"closed with code {connection.close_code}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Deepgram streaming stub and WebSocket test client')
+    commands = parser.add_subparsers(dest='command', required=True)
+    stub = commands.add_parser('serve', help='Run the Deepgram streaming stub')
+    stub.add_argument('--port', type=int, default=8775)
+    stub.add_argument('--transcript', default=DEFAULT_TRANSCRIPT)
+    stub.add_argument('--words-per-segment', type=int, default=4)
+    client = commands.add_parser('send', help='Stream a recording to /ws/symptoms/transcribe')
+    client.add_argument('--url', default='ws://127.0.0.1:8000/ws/symptoms/transcribe')
+    client.add_argument('--token', required=True, help='JWT access token')
+    client.add_argument('--language', default=None)
+    client.add_argument('--file', default=None, help='Recording to send (default: silence)')
+    client.add_argument('--chunk-ms', type=int, default=250)
+    client.add_argument('--chunks', type=int, default=20)
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        asyncio.run(run_stub(args.port, args.transcript, args.words_per_segment))
+    else:
+        asyncio.run(send_recording(args.url, args.token, args.language, args.file, args.chunk_ms, args.chunks))
@@ -0,0 +1,249 @@
+"""
+Live symptom transcription over WebSocket, served by core.asgi at
+/ws/symptoms/transcribe.
+
+    connect  /ws/symptoms/transcribe?token=<JWT access token>&language=hi
+             (or an Authorization: Bearer header). Raw audio also needs
+             encoding=linear16&sample_rate=16000; format=webm|ogg|wav names
+             the container for the fallback below (default webm).
+    client → binary messages with audio as it is recorded, then {"type": "stop"}
+    server → {"type": "partial", "transcript": ..., "symptoms": {...}} whenever the transcript changes
+             {"type": "final", "transcript": ..., "symptoms": {...}} once the recording has stopped
+             {"type": "error", "error": ...} before closing on failure
+
+When Deepgram can stream the language (DEEPGRAM_API_KEY set, websockets
+installed, circuit closed), audio is forwarded as it arrives and its interim
+results come back while the nurse is speaking, so the final transcript is
+ready as soon as recording stops. Otherwise the chunks are collected and the
+recording is transcribed by the configured provider when it stops.
+"""
+import json
+import time
+import asyncio
+import logging
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from rest_framework.exceptions import APIException
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from .nlp_symptoms import extract_symptoms
+from .stt_deepgram import DeepgramTranscriber
+from .stt_router import router
+from .transcription import transcribe_async
+from .uploads import AudioUploadParser
+from .views import select_transcriber, transcription_error_response
+
+logger = logging.getLogger(__name__)
+
+STREAM_PATH = '/ws/symptoms/transcribe'
+
+# Close codes: 4000 + the HTTP status the upload endpoint would answer with
+CLOSE_NORMAL = 1000
+CLOSE_ERROR = 1011
+CLOSE_BAD_REQUEST = 4400
+CLOSE_UNAUTHORIZED = 4401
+CLOSE_NOT_FOUND = 4404
+CLOSE_TOO_LARGE = 4413
+CLOSE_UNAVAILABLE = 4503
+
+# Deepgram drops a stream that gets no audio for about 10 seconds
+KEEPALIVE_SECONDS = 5
+
+
+class StreamError(Exception):
+    def __init__(self, message, code=CLOSE_ERROR):
+        super().__init__(message)
+        self.code = code
+
+
+def _authenticate(headers, token):
+    """The active user of a JWT access token (query parameter or Authorization header)"""
+    authenticator = JWTAuthentication()
+    raw_token = token.encode() if token else None
+    if raw_token is None and b'authorization' in headers:
+        raw_token = authenticator.get_raw_token(headers[b'authorization'])
+    if raw_token is None:
+        raise StreamError('Authentication credentials were not provided.', CLOSE_UNAUTHORIZED)
+    try:
+        return authenticator.get_user(authenticator.get_validated_token(raw_token))
+    except APIException as e:
+        detail = e.detail.get('detail', e.detail) if isinstance(e.detail, dict) else e.detail
+        raise StreamError(str(detail), CLOSE_UNAUTHORIZED)
+
+
+class TranscriptionSession:
+    """One client connection: authenticate, pick a provider, relay audio and transcripts"""
+
+    def __init__(self, scope, receive, send):
+        self.scope = scope
+        self.receive = receive
+        self._send = send
+        self.params = parse_qs(scope.get('query_string', b'').decode())
+        self.language = self.param('language')
+        self.max_bytes = AudioUploadParser().limits()[0]
+        self.disconnected = False
+
+    def param(self, name):
+        values = self.params.get(name)
+        return values[0] if values else None
+
+    async def send_json(self, payload):
+        if not self.disconnected:
+            await self._send({'type': 'websocket.send', 'text': json.dumps(payload)})
+
+    async def close(self, code=CLOSE_NORMAL):
+        if not self.disconnected:
+            self.disconnected = True
+            await self._send({'type': 'websocket.close', 'code': code})
+
+    async def send_result(self, kind, transcript):
+        symptoms = extract_symptoms(transcript, self.language)
+        await self.send_json({'type': kind, 'transcript': transcript, 'symptoms': symptoms})
+
+    async def next_audio(self):
+        """The next audio chunk from the client, or None once it stopped or went away"""
+        while True:
+            message = await self.receive()
+            if message['type'] == 'websocket.disconnect':
+                self.disconnected = True
+                return None
+            if message.get('bytes'):
+                return message['bytes']
+            if message.get('text'):
+                try:
+                    command = json.loads(message['text'])
+                except ValueError:
+                    command = None
+                if isinstance(command, dict) and command.get('type') == 'stop':
+                    return None
+                raise StreamError('Expected binary audio or {"type": "stop"}', CLOSE_BAD_REQUEST)
+
+    async def run(self):
+        if (await self.receive())['type'] != 'websocket.connect':
+            return
+        await self._send({'type': 'websocket.accept'})
+        try:
+            await sync_to_async(_authenticate)(dict(self.scope.get('headers', [])), self.param('token'))
+            language = self.language
+            deepgram = DeepgramTranscriber.get_instance()
+            if deepgram.can_stream(language) and router.acquire(deepgram.provider):
+                await self.stream(deepgram, language)
+            else:
+                await self.buffered(language)
+        except StreamError as e:
+            await self.send_json({'type': 'error', 'error': str(e)})
+            await self.close(e.code)
+        except Exception as e:
+            logger.exception('Streaming transcription failed')
+            await self.send_json(dict(transcription_error_response(e).data, type='error'))
+            await self.close(CLOSE_ERROR)
+
+    async def stream(self, transcriber, language):
+        """Forward audio to a live Deepgram stream and relay its results as they come"""
+        try:
+            stream = await transcriber.open_stream(language, self.param('encoding'), self.param('sample_rate'))
+        except RuntimeError as e:
+            logger.warning(f"Falling back to batch transcription: {e}")
+            router.record(transcriber.provider, language, ok=False)
+            return await self.buffered(language)
+
+        finals = []
+        latest = {'interim': '', 'sent': '', 'audio_at': time.monotonic()}
+
+        async def forward_audio():
+            received = 0
+            while True:
+                chunk = await self.next_audio()
+                if chunk is None:
+                    break
+                received += len(chunk)
+                if received > self.max_bytes:
+                    raise StreamError(f'Recording exceeds the {self.max_bytes // (1024 * 1024)} MB limit',
+                                      CLOSE_TOO_LARGE)
+                await stream.send(chunk)
+                latest['audio_at'] = time.monotonic()
+            await stream.finish()
+
+        async def keep_alive():
+            while True:
+                await asyncio.sleep(KEEPALIVE_SECONDS)
+                if time.monotonic() - latest['audio_at'] >= KEEPALIVE_SECONDS:
+                    await stream.keep_alive()
+
+        async def relay_results():
+            async for transcript, is_final in stream.results():
+                if is_final:
+                    if transcript:
+                        finals.append(transcript)
+                    latest['interim'] = ''
+                else:
+                    latest['interim'] = transcript
+                text = ' '.join(finals + ([latest['interim']] if latest['interim'] else []))
+                if text != latest['sent']:
+                    latest['sent'] = text
+                    await self.send_result('partial', text)
+
+        forwarder = asyncio.ensure_future(forward_audio())
+        relay = asyncio.ensure_future(relay_results())
+        pinger = asyncio.ensure_future(keep_alive())
+        try:
+            await asyncio.wait({forwarder, relay}, return_when=asyncio.FIRST_COMPLETED)
+            if forwarder.done():
+                forwarder.result()
+                # Recording stopped: Deepgram flushes the rest of the audio and closes
+                await relay
+            else:
+                relay.result()
+                raise RuntimeError('Deepgram closed the stream before the recording stopped')
+        except StreamError:
+            raise
+        except Exception:
+            router.record(transcriber.provider, language, ok=False)
+            raise
+        finally:
+            for task in (forwarder, relay, pinger):
+                task.cancel()
+            await asyncio.gather(forwarder, relay, pinger, return_exceptions=True)
+            await stream.close()
+
+        router.record(transcriber.provider, language, ok=True)
+        if self.disconnected:
+            return
+        await self.send_result('final', ' '.join(finals + ([latest['interim']] if latest['interim'] else [])))
+        await self.close()
+
+    async def buffered(self, language):
+        """Collect the whole recording, then transcribe it like an uploaded voice note"""
+        transcriber, error_response = select_transcriber(language)
+        if error_response is not None:
+            code = CLOSE_UNAVAILABLE if error_response.status_code == 503 else CLOSE_BAD_REQUEST
+            raise StreamError(error_response.data.get('error', 'Speech-to-text unavailable'), code)
+
+        audio = bytearray()
+        while True:
+            chunk = await self.next_audio()
+            if chunk is None:
+                break
+            audio += chunk
+            if len(audio) > self.max_bytes:
+                raise StreamError(f'Recording exceeds the {self.max_bytes // (1024 * 1024)} MB limit',
+                                  CLOSE_TOO_LARGE)
+        if self.disconnected:
+            return
+        if not audio:
+            raise StreamError('No audio received', CLOSE_BAD_REQUEST)
+
+        transcript = await transcribe_async(transcriber, f"recording.{self.param('format') or 'webm'}",
+                                            bytes(audio), language)
+        await self.send_result('final', transcript)
+        await self.close()
+
+
+async def websocket_application(scope, receive, send):
+    """ASGI application for the WebSocket connections of core.asgi"""
+    if scope['path'].rstrip('/') != STREAM_PATH:
+        await receive()
+        await send({'type': 'websocket.close', 'code': CLOSE_NOT_FOUND})
+        return
+    await TranscriptionSession(scope, receive, send).run()
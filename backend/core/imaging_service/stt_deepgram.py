@@ -1,7 +1,32 @@
 import os
+import json
 import time
+import asyncio
+import threading
 import requests
 from typing import Optional
+from urllib.parse import urlencode
+
+from .http_clients import HTTPX_AVAILABLE, async_client, httpx, session, timeouts
+
+# websockets is optional: without it the streaming endpoint transcribes the recording once it ends
+try:
+    from websockets.asyncio.client import connect as websocket_connect
+    from websockets.exceptions import WebSocketException
+    WEBSOCKETS_AVAILABLE = True
+except ImportError:
+    websocket_connect = None
+    WebSocketException = None
+    WEBSOCKETS_AVAILABLE = False
+
+# Request bodies are streamed from the (memory-mapped) upload in chunks of this size
+UPLOAD_CHUNK_SIZE = 256 * 1024
+
+
+async def _chunks(buffer):
+    view = memoryview(buffer)
+    for start in range(0, len(view), UPLOAD_CHUNK_SIZE):
+        yield bytes(view[start:start + UPLOAD_CHUNK_SIZE])
 
 
 class DeepgramTranscriber:
@@ -10,6 +35,8 @@ class DeepgramTranscriber:
     Requires DEEPGRAM_API_KEY.
     Docs: https://developers.deepgram.com/docs/transcribe-audio-rest
     """
+    provider = 'deepgram'
+
 
     # Languages supported by Deepgram
     SUPPORTED_LANGUAGES = {
@@ -50,10 +77,28 @@ class DeepgramTranscriber:
         'taq',  # Tamasheq
     }
 
+    _instance = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_instance(cls):
+        """The process-wide transcriber, configured from the environment on first use"""
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
     def __init__(self, model: Optional[str] = None):
         self.api_key = os.getenv('DEEPGRAM_API_KEY')
         self.model = model or os.getenv('DEEPGRAM_MODEL', 'nova-2')
         self.endpoint = f'https://api.deepgram.com/v1/listen?model={self.model}&smart_format=true'
+        self.streaming_endpoint = os.getenv('DEEPGRAM_STREAMING_URL', 'wss://api.deepgram.com/v1/listen')
+
+    @property
+    def model_id(self) -> str:
+        """Model the transcripts come from (part of the transcript cache key)"""
+        return self.model
 
     def is_configured(self) -> bool:
         # Check if API key exists and is not a placeholder
@@ -72,6 +117,8 @@ class DeepgramTranscriber:
             return 'audio/mpeg'
         if name.endswith('.m4a'):
             return 'audio/mp4'
+        if name.endswith('.ogg'):
+            return 'audio/ogg'
         return 'application/octet-stream'
 
     def is_language_supported(self, language: Optional[str]) -> bool:
@@ -80,7 +127,7 @@ class DeepgramTranscriber:
             return True  # Default language (English) is supported
         return language in self.SUPPORTED_LANGUAGES
 
-    def transcribe_file(self, file_name: str, file_bytes: bytes, language: Optional[str] = None) -> str:
+    def _check_request(self, language: Optional[str]) -> None:
         if not self.is_configured():
             raise NotImplementedError('Deepgram STT not configured. Set DEEPGRAM_API_KEY.')
 
@@ -88,21 +135,38 @@ class DeepgramTranscriber:
         if language and not self.is_language_supported(language):
             raise ValueError(f'Language "{language}" is not supported by Deepgram. Supported languages: {", ".join(sorted(self.SUPPORTED_LANGUAGES))}')
 
-        headers = {
+    def _headers(self, file_name: str) -> dict:
+        return {
             'Authorization': f'Token {self.api_key}',
             'Content-Type': self._guess_mime(file_name)
         }
 
+    def _url(self, language: Optional[str]) -> str:
         url = self.endpoint
         if language:
             url = url + f'&language={language}'
+        return url
+
+    @staticmethod
+    def _transcript(data: dict) -> str:
+        # Deepgram returns transcript in data['results']['channels'][0]['alternatives'][0]['transcript']
+        results = data.get('results', {})
+        channels = results.get('channels', [])
+        if channels and channels[0].get('alternatives'):
+            return channels[0]['alternatives'][0].get('transcript', '')
+        return ''
+
+    def transcribe_file(self, file_name: str, file_bytes: bytes, language: Optional[str] = None) -> str:
+        self._check_request(language)
+        headers = self._headers(file_name)
+        url = self._url(language)
 
         max_retries = 3
         backoff = 2
         last_error = None
         for attempt in range(max_retries + 1):
             try:
-                resp = requests.post(url, headers=headers, data=file_bytes, timeout=90)
+                resp = session().post(url, headers=headers, data=file_bytes, timeout=timeouts())
                 # Handle rate limiting specifically
                 if resp.status_code == 429:
                     # Check for Retry-After header
@@ -121,13 +185,7 @@ class DeepgramTranscriber:
                 elif resp.status_code == 401:
                     raise RuntimeError(f'Authentication failed with Deepgram API. Please check your DEEPGRAM_API_KEY.')
                 resp.raise_for_status()
-                data = resp.json()
-                # Deepgram returns transcript in data['results']['channels'][0]['alternatives'][0]['transcript']
-                results = data.get('results', {})
-                channels = results.get('channels', [])
-                if channels and channels[0].get('alternatives'):
-                    return channels[0]['alternatives'][0].get('transcript', '')
-                return ''
+                return self._transcript(resp.json())
             except requests.RequestException as e:
                 last_error = e
                 if attempt < max_retries:
@@ -136,4 +194,115 @@ class DeepgramTranscriber:
                     continue
                 break
 
-        raise RuntimeError(f'Transcription failed after retries: {last_error}')
\ No newline at end of file
+        raise RuntimeError(f'Transcription failed after retries: {last_error}')
+
+    async def transcribe_file_async(self, file_name: str, file_bytes: bytes, language: Optional[str] = None) -> str:
+        """transcribe_file for async views: same retries, but waiting never blocks the event loop"""
+        if not HTTPX_AVAILABLE:
+            return await asyncio.to_thread(self.transcribe_file, file_name, file_bytes, language)
+
+        self._check_request(language)
+        headers = self._headers(file_name)
+        headers['Content-Length'] = str(len(file_bytes))
+        url = self._url(language)
+
+        max_retries = 3
+        backoff = 2
+        last_error = None
+        client = async_client()
+        for attempt in range(max_retries + 1):
+            try:
+                resp = await client.post(url, headers=headers, content=_chunks(file_bytes))
+                if resp.status_code == 429:
+                    retry_after = resp.headers.get('Retry-After')
+                    wait = int(retry_after) if retry_after and retry_after.isdigit() else backoff
+                    if attempt < max_retries:
+                        await asyncio.sleep(wait)
+                        backoff *= 2
+                        continue
+                elif resp.status_code in (502, 503, 504):
+                    if attempt < max_retries:
+                        await asyncio.sleep(backoff)
+                        backoff *= 2
+                        continue
+                elif resp.status_code == 401:
+                    raise RuntimeError(f'Authentication failed with Deepgram API. Please check your DEEPGRAM_API_KEY.')
+                resp.raise_for_status()
+                return self._transcript(resp.json())
+            except httpx.HTTPError as e:
+                last_error = e
+                if attempt < max_retries:
+                    await asyncio.sleep(backoff)
+                    backoff *= 2
+                    continue
+                break
+
+        raise RuntimeError(f'Transcription failed after retries: {last_error}')
+
+    def can_stream(self, language: Optional[str] = None) -> bool:
+        return WEBSOCKETS_AVAILABLE and self.is_configured() and self.is_language_supported(language)
+
+    async def open_stream(self, language: Optional[str] = None, encoding: Optional[str] = None,
+                          sample_rate: Optional[int] = None) -> 'DeepgramStream':
+        """
+        Live transcription session. Containerized audio (webm, ogg) needs no
+        encoding; raw audio needs encoding (e.g. linear16) and sample_rate.
+        """
+        self._check_request(language)
+        if not WEBSOCKETS_AVAILABLE:
+            raise NotImplementedError('Deepgram streaming needs the websockets package.')
+        params = {'model': self.model, 'smart_format': 'true', 'interim_results': 'true'}
+        if language:
+            params['language'] = language
+        if encoding:
+            params['encoding'] = encoding
+        if sample_rate:
+            params['sample_rate'] = sample_rate
+        try:
+            connection = await websocket_connect(
+                f'{self.streaming_endpoint}?{urlencode(params)}',
+                additional_headers={'Authorization': f'Token {self.api_key}'},
+                open_timeout=timeouts()[0],
+            )
+        except (OSError, WebSocketException) as e:
+            raise RuntimeError(f'Could not open Deepgram stream: {e}')
+        return DeepgramStream(connection)
+
+
+class DeepgramStream:
+    """
+    One live transcription over Deepgram's streaming API: audio goes in with
+    send(), (transcript, is_final) pairs come out of results() until the
+    stream has been finished and Deepgram has flushed its last result.
+    Docs: https://developers.deepgram.com/docs/live-streaming-audio
+    """
+
+    def __init__(self, connection):
+        self._connection = connection
+
+    async def send(self, chunk: bytes) -> None:
+        await self._connection.send(chunk)
+
+    async def keep_alive(self) -> None:
+        # Deepgram closes a stream that gets no audio for about 10 seconds
+        await self._connection.send(json.dumps({'type': 'KeepAlive'}))
+
+    async def finish(self) -> None:
+        """No more audio: Deepgram transcribes what it has and closes the stream"""
+        await self._connection.send(json.dumps({'type': 'CloseStream'}))
+
+    async def results(self):
+        try:
+            async for message in self._connection:
+                if isinstance(message, bytes):
+                    continue
+                data = json.loads(message)
+                if data.get('type') != 'Results':
+                    continue
+                alternatives = data.get('channel', {}).get('alternatives') or [{}]
+                yield alternatives[0].get('transcript', ''), bool(data.get('is_final'))
+        except WebSocketException as e:
+            raise RuntimeError(f'Deepgram stream failed: {e}')
+
+    async def close(self) -> None:
+        await self._connection.close()
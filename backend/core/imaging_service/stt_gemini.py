@@ -1,4 +1,7 @@
 import os
+import asyncio
+import threading
+import weakref
 from typing import Optional
 
 # Import google.generativeai with error handling
@@ -16,10 +19,26 @@ class GeminiTranscriber:
     Requires GOOGLE_API_KEY and google-generativeai package.
     """
 
+    provider = 'gemini'
+    _instance = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_instance(cls):
+        """The process-wide transcriber, configured from the environment on first use"""
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
     def __init__(self, model_name: Optional[str] = None):
         self.api_key = os.getenv('GOOGLE_API_KEY')
         self.model_name = model_name or os.getenv('GEMINI_MODEL', 'gemini-1.5-pro')
         self._configured = False
+        self._model = None
+        # The async transport belongs to the event loop it was opened on, so each loop gets its own model
+        self._async_models = weakref.WeakKeyDictionary()
         if self.api_key and GENAI_AVAILABLE:
             try:
                 genai.configure(api_key=self.api_key)
@@ -27,6 +46,11 @@ class GeminiTranscriber:
             except Exception:
                 self._configured = False
 
+    @property
+    def model_id(self) -> str:
+        """Model the transcripts come from (part of the transcript cache key)"""
+        return self.model_name
+
     def is_configured(self) -> bool:
         # Check if API key exists and is not a placeholder
         return (self._configured and 
@@ -34,7 +58,25 @@ class GeminiTranscriber:
                      self.api_key.strip() and 
                      self.api_key != 'your-google-api-key-here'))
 
-    def transcribe_file(self, file_name: str, file_bytes: bytes, language: Optional[str] = None) -> str:
+    def is_language_supported(self, language: Optional[str]) -> bool:
+        # Gemini takes the language as a prompt hint, so any language is accepted
+        return True
+
+    def _generative_model(self):
+        # Built once: the model object keeps its API client (and connections) for later calls
+        if self._model is None:
+            self._model = genai.GenerativeModel(self.model_name)
+        return self._model
+
+    def _async_generative_model(self):
+        """The model of the running event loop, for generate_content_async"""
+        loop = asyncio.get_running_loop()
+        model = self._async_models.get(loop)
+        if model is None:
+            model = self._async_models[loop] = genai.GenerativeModel(self.model_name)
+        return model
+
+    def _contents(self, file_name: str, file_bytes: bytes, language: Optional[str]) -> list:
         if not self.is_configured() or not GENAI_AVAILABLE:
             raise NotImplementedError('Gemini STT is not configured. Set GOOGLE_API_KEY and install google-generativeai.')
 
@@ -46,25 +88,45 @@ class GeminiTranscriber:
             mime_type = 'audio/wav'
         elif file_name.lower().endswith('.m4a'):
             mime_type = 'audio/mp4'
+        elif file_name.lower().endswith('.ogg'):
+            mime_type = 'audio/ogg'
 
-        try:
-            model = genai.GenerativeModel(self.model_name)
-            prompt = 'Transcribe this clinical voice note to plain text. Only return the transcript.'
-            contents = [
-                prompt,
-                {"mime_type": mime_type, "data": file_bytes},
-            ]
+        prompt = 'Transcribe this clinical voice note to plain text. Only return the transcript.'
+        contents = [
+            prompt,
+            # The request proto needs bytes, not a view of the spooled upload
+            {"mime_type": mime_type, "data": bytes(file_bytes)},
+        ]
 
-            # Note: language hint isn't directly supported like Whisper; include in prompt if provided
-            if language:
-                contents[0] = f"Transcribe this clinical voice note (language: {language}) to plain text. Only return the transcript."
+        # Note: language hint isn't directly supported like Whisper; include in prompt if provided
+        if language:
+            contents[0] = f"Transcribe this clinical voice note (language: {language}) to plain text. Only return the transcript."
+        return contents
 
+    @staticmethod
+    def _failure(e: Exception) -> RuntimeError:
+        # Handle authentication errors specifically
+        error_str = str(e).lower()
+        if 'api key' in error_str or 'authentication' in error_str or 'unauthorized' in error_str:
+            return RuntimeError('Authentication failed with Google Gemini API. Please check your GOOGLE_API_KEY.')
+        return RuntimeError(f"Transcription failed: {e}")
+
+    def transcribe_file(self, file_name: str, file_bytes: bytes, language: Optional[str] = None) -> str:
+        contents = self._contents(file_name, file_bytes, language)
+        try:
+            model = self._generative_model()
             response = model.generate_content(contents)
             # response.text contains the generated text
             return getattr(response, 'text', '') or ''
         except Exception as e:
-            # Handle authentication errors specifically
-            error_str = str(e).lower()
-            if 'api key' in error_str or 'authentication' in error_str or 'unauthorized' in error_str:
-                raise RuntimeError('Authentication failed with Google Gemini API. Please check your GOOGLE_API_KEY.')
-            raise RuntimeError(f"Transcription failed: {e}")
\ No newline at end of file
+            raise self._failure(e)
+
+    async def transcribe_file_async(self, file_name: str, file_bytes: bytes, language: Optional[str] = None) -> str:
+        """transcribe_file for async views, on the client library's async transport"""
+        contents = self._contents(file_name, file_bytes, language)
+        try:
+            model = self._async_generative_model()
+            response = await model.generate_content_async(contents)
+            return getattr(response, 'text', '') or ''
+        except Exception as e:
+            raise self._failure(e)
@@ -0,0 +1,200 @@
+import os
+import time
+import logging
+import threading
+
+from .stt_deepgram import DeepgramTranscriber
+from .stt_gemini import GeminiTranscriber
+from .stt_whisper import WhisperTranscriber
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+def transcribers():
+    return [WhisperTranscriber.get_instance(), DeepgramTranscriber.get_instance(), GeminiTranscriber.get_instance()]
+
+
+class CircuitBreaker:
+    """
+    Stops sending requests to a provider after STT_BREAKER_FAILURES consecutive
+    failures. After STT_BREAKER_COOLDOWN seconds one trial request is let
+    through (half-open): success closes the breaker, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold, cooldown_seconds):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.trial_started = None
+
+    def _refresh(self, now):
+        if self.state == OPEN and now - self.opened_at >= self.cooldown_seconds:
+            self.state = HALF_OPEN
+            self.trial_started = None
+
+    def available(self, now):
+        self._refresh(now)
+        if self.state == HALF_OPEN:
+            # A trial that never reported back (e.g. answered from the cache) lapses after a cooldown
+            return self.trial_started is None or now - self.trial_started >= self.cooldown_seconds
+        return self.state == CLOSED
+
+    def acquire(self, now):
+        """Claim the right to send a request; in half-open state only one trial is allowed"""
+        if not self.available(now):
+            return False
+        if self.state == HALF_OPEN:
+            self.trial_started = now
+        return True
+
+    def record(self, ok, now):
+        if ok:
+            self.state = CLOSED
+            self.consecutive_failures = 0
+            self.trial_started = None
+            return
+        self.consecutive_failures += 1
+        if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self.state = OPEN
+            self.opened_at = now
+            self.trial_started = None
+
+    def retry_after(self, now):
+        """Seconds until a trial request will be allowed again (0 when requests are allowed)"""
+        self._refresh(now)
+        if self.state != OPEN:
+            return 0.0
+        return max(self.cooldown_seconds - (now - self.opened_at), 0.0)
+
+
+class ProviderStats:
+    """Exponentially weighted moving averages of latency and error rate"""
+
+    def __init__(self, alpha):
+        self.alpha = alpha
+        self.latency = None
+        self.error_rate = 0.0
+        self.calls = 0
+
+    def observe(self, seconds=None, ok=None):
+        if seconds is not None:
+            self.latency = seconds if self.latency is None else self.alpha * seconds + (1 - self.alpha) * self.latency
+        if ok is not None:
+            self.calls += 1
+            self.error_rate = self.alpha * (0.0 if ok else 1.0) + (1 - self.alpha) * self.error_rate
+
+
+class ProviderRouter:
+    """
+    Routes transcriptions to the fastest healthy STT provider (STT_PROVIDER=auto).
+
+    Tracks an EWMA (weight STT_ROUTER_ALPHA) of latency and error rate per
+    provider and language, and a circuit breaker per provider. A provider's
+    expected cost is its EWMA latency divided by its success rate; providers
+    without measurements for a language are tried first so they get measured.
+    """
+
+    def __init__(self):
+        self.alpha = float(os.getenv('STT_ROUTER_ALPHA', '0.2'))
+        self.failure_threshold = int(os.getenv('STT_BREAKER_FAILURES', '5'))
+        self.cooldown_seconds = float(os.getenv('STT_BREAKER_COOLDOWN', '30'))
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._breakers = {}
+
+    @staticmethod
+    def _language(language):
+        return language or 'default'
+
+    def _stats_for(self, provider, language):
+        key = (provider, self._language(language))
+        if key not in self._stats:
+            self._stats[key] = ProviderStats(self.alpha)
+        return self._stats[key]
+
+    def _breaker(self, provider):
+        if provider not in self._breakers:
+            self._breakers[provider] = CircuitBreaker(self.failure_threshold, self.cooldown_seconds)
+        return self._breakers[provider]
+
+    def _cost(self, provider, language):
+        stats = self._stats.get((provider, self._language(language)))
+        if stats is None or stats.latency is None:
+            return 0.0
+        return stats.latency / max(1.0 - stats.error_rate, 0.05)
+
+    def rank(self, language, exclude=()):
+        """Configured providers that accept the language and are not tripped, cheapest first"""
+        now = time.monotonic()
+        with self._lock:
+            candidates = [
+                transcriber for transcriber in transcribers()
+                if transcriber.provider not in exclude and transcriber.is_configured()
+                and transcriber.is_language_supported(language)
+                and self._breaker(transcriber.provider).available(now)
+            ]
+            return sorted(candidates, key=lambda t: self._cost(t.provider, language))
+
+    def choose(self, language, exclude=()):
+        """The provider to send a request to, or None when no healthy provider accepts the language"""
+        for transcriber in self.rank(language, exclude):
+            if self.acquire(transcriber.provider):
+                return transcriber
+        return None
+
+    def acquire(self, provider):
+        with self._lock:
+            return self._breaker(provider).acquire(time.monotonic())
+
+    def retry_after(self, provider):
+        with self._lock:
+            return self._breaker(provider).retry_after(time.monotonic())
+
+    def record(self, provider, language, seconds=None, ok=None):
+        """
+        Feed back one call: its latency and whether it succeeded. ok=None records
+        only the latency (a hedged call that was cancelled).
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._stats_for(provider, language).observe(seconds, ok)
+            if ok is not None:
+                breaker = self._breaker(provider)
+                was_open = breaker.state == OPEN
+                breaker.record(ok, now)
+                if breaker.state == OPEN and not was_open:
+                    logger.warning(f"STT provider {provider} circuit opened after "
+                                   f"{breaker.consecutive_failures} consecutive failures")
+
+    def health(self):
+        now = time.monotonic()
+        providers = {}
+        with self._lock:
+            for transcriber in transcribers():
+                breaker = self._breaker(transcriber.provider)
+                languages = {
+                    language: {
+                        'ewma_latency_ms': round(stats.latency * 1000, 1) if stats.latency is not None else None,
+                        'error_rate': round(stats.error_rate, 4),
+                        'calls': stats.calls,
+                    }
+                    for (provider, language), stats in self._stats.items() if provider == transcriber.provider
+                }
+                providers[transcriber.provider] = {
+                    'configured': transcriber.is_configured(),
+                    'available': transcriber.is_configured() and breaker.available(now),
+                    'circuit': breaker.state,
+                    'consecutive_failures': breaker.consecutive_failures,
+                    'retry_after_seconds': round(breaker.retry_after(now), 1),
+                    'languages': languages,
+                }
+        return providers
+
+
+router = ProviderRouter()
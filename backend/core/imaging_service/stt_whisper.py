@@ -1,7 +1,12 @@
 import os
 import time
+import asyncio
+import threading
 import requests
 
+from .buffers import BufferReader
+from .http_clients import HTTPX_AVAILABLE, async_client, httpx, session, timeouts
+
 
 class WhisperTranscriber:
     """
@@ -9,6 +14,19 @@ class WhisperTranscriber:
     Expects OPENAI_API_KEY in environment. Falls back to NotImplementedError if missing.
     """
 
+    provider = 'whisper'
+    _instance = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_instance(cls):
+        """The process-wide transcriber, configured from the environment on first use"""
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
     def __init__(self):
         self.api_key = os.getenv('OPENAI_API_KEY')
         # Use the chat/completions-compatible Audio Transcriptions endpoint
@@ -16,13 +34,22 @@ class WhisperTranscriber:
         self.endpoint = 'https://api.openai.com/v1/audio/transcriptions'
         self.model = os.getenv('WHISPER_MODEL', 'whisper-1')
 
+    @property
+    def model_id(self) -> str:
+        """Model the transcripts come from (part of the transcript cache key)"""
+        return self.model
+
     def is_configured(self) -> bool:
         # Check if API key exists and is not a placeholder
         return bool(self.api_key and 
                    self.api_key.strip() and 
                    self.api_key != 'your-openai-api-key-here')
 
-    def transcribe_file(self, file_name: str, file_bytes: bytes, language: str | None = None) -> str:
+    def is_language_supported(self, language: str | None) -> bool:
+        # Whisper takes a language hint for any language
+        return True
+
+    def _request_parts(self, language: str | None) -> tuple[dict, dict]:
         if not self.is_configured():
             raise NotImplementedError('Speech-to-text is not configured. Set OPENAI_API_KEY to enable.')
 
@@ -35,7 +62,10 @@ class WhisperTranscriber:
         }
         if language:
             data['language'] = language
+        return headers, data
 
+    def transcribe_file(self, file_name: str, file_bytes: bytes, language: str | None = None) -> str:
+        headers, data = self._request_parts(language)
         files = {
             'file': (file_name, file_bytes, 'application/octet-stream')
         }
@@ -46,7 +76,7 @@ class WhisperTranscriber:
         last_error = None
         for attempt in range(max_retries + 1):
             try:
-                response = requests.post(self.endpoint, headers=headers, data=data, files=files, timeout=90)
+                response = session().post(self.endpoint, headers=headers, data=data, files=files, timeout=timeouts())
                 if response.status_code == 401:
                     raise RuntimeError('Unauthorized: Invalid or missing OpenAI API key')
                 if response.status_code == 429:
@@ -84,4 +114,56 @@ class WhisperTranscriber:
                 break
 
         # If we reach here, retries failed
-        raise RuntimeError(f"Transcription failed after retries: {last_error}")
\ No newline at end of file
+        raise RuntimeError(f"Transcription failed after retries: {last_error}")
+
+    async def transcribe_file_async(self, file_name: str, file_bytes: bytes, language: str | None = None) -> str:
+        """transcribe_file for async views: same retries, but waiting never blocks the event loop"""
+        if not HTTPX_AVAILABLE:
+            return await asyncio.to_thread(self.transcribe_file, file_name, file_bytes, language)
+
+        headers, data = self._request_parts(language)
+        max_retries = 3
+        backoff_seconds = 2
+        last_error = None
+        client = async_client()
+        for attempt in range(max_retries + 1):
+            # The multipart body streams from the upload buffer instead of copying it
+            files = {
+                'file': (file_name, BufferReader(file_bytes), 'application/octet-stream')
+            }
+            try:
+                response = await client.post(self.endpoint, headers=headers, data=data, files=files)
+                if response.status_code == 401:
+                    raise RuntimeError('Unauthorized: Invalid or missing OpenAI API key')
+                if response.status_code == 429:
+                    retry_after = response.headers.get('Retry-After')
+                    wait = int(retry_after) if retry_after and retry_after.isdigit() else backoff_seconds
+                    if attempt < max_retries:
+                        await asyncio.sleep(wait)
+                        backoff_seconds *= 2
+                        continue
+                elif response.status_code in (502, 503, 504):
+                    if attempt < max_retries:
+                        await asyncio.sleep(backoff_seconds)
+                        backoff_seconds *= 2
+                        continue
+                response.raise_for_status()
+                return response.json().get('text', '')
+            except httpx.HTTPStatusError as http_err:
+                last_error = http_err
+                status = http_err.response.status_code
+                if status == 429 or 500 <= status < 600:
+                    if attempt < max_retries:
+                        await asyncio.sleep(backoff_seconds)
+                        backoff_seconds *= 2
+                        continue
+                break
+            except httpx.HTTPError as req_err:
+                last_error = req_err
+                if attempt < max_retries:
+                    await asyncio.sleep(backoff_seconds)
+                    backoff_seconds *= 2
+                    continue
+                break
+
+        raise RuntimeError(f"Transcription failed after retries: {last_error}")
@@ -0,0 +1,758 @@
+import io
+import os
+import json
+import time
+import shutil
+import asyncio
+import zipfile
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.utils.datastructures import MultiValueDict
+import numpy as np
+from rest_framework.test import APIRequestFactory, force_authenticate
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import async_views, stt_gemini, stt_router, transcription, views
+from .cache import TieredCache
+from .model import model_loader, worker_pool
+from .model.batching import InferenceBatcher
+from .model.model_loader import ModelLoader, ModelVersion
+from .model.warmup import ModelWarmup
+from .model.worker_pool import InferenceOverloaded, InferenceWorkerPool
+from .nlp_symptoms import (
+    FuzzyIndex, NegationScope, SymptomLexicon, edit_distance, extract_symptoms, fuzzy_limit, tokenize,
+)
+from .scan_batch import BatchError, collect_batch
+from .stt_router import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, ProviderRouter
+
+# Over the 0.01 MB limits set below, but well under DATA_UPLOAD_MAX_MEMORY_SIZE, so the
+# upload handler rather than the Content-Length check rejects it while the body is parsed
+OVERSIZED = bytes(64 * 1024)
+
+
+@mock.patch.dict(os.environ, {'SCAN_UPLOAD_MAX_MB': '0.01', 'AUDIO_UPLOAD_MAX_MB': '0.01'})
+class OversizedUploadTests(TestCase):
+    """Uploads over the per-endpoint limit are answered 413 by the sync views, the async views and job mode"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username='uploader', password='unused-password')
+
+    def sync_request(self, path, field, query=''):
+        request = APIRequestFactory().post(
+            path + query, {field: SimpleUploadedFile('upload.bin', OVERSIZED)}, format='multipart')
+        force_authenticate(request, user=self.user)
+        return request
+
+    def async_request(self, path, field):
+        token = RefreshToken.for_user(self.user).access_token
+        return RequestFactory().post(
+            path, {field: SimpleUploadedFile('upload.bin', OVERSIZED)}, HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_sync_views(self):
+        for view, path, field in ((views.upload_scan, '/api/upload-scan', 'image'),
+                                  (views.transcribe_symptoms, '/api/symptoms/transcribe', 'audio'),
+                                  (views.multimodal_diagnosis, '/api/multimodal-diagnosis', 'image')):
+            with self.subTest(path=path):
+                self.assertEqual(view(self.sync_request(path, field)).status_code, 413)
+
+    def test_sync_views_in_job_mode(self):
+        response = views.upload_scan(self.sync_request('/api/upload-scan', 'image', '?async=true'))
+        self.assertEqual(response.status_code, 413)
+
+    def test_async_views(self):
+        for view, path, field in ((async_views.upload_scan, '/api/upload-scan', 'image'),
+                                  (async_views.transcribe_symptoms, '/api/symptoms/transcribe', 'audio'),
+                                  (async_views.multimodal_diagnosis, '/api/multimodal-diagnosis', 'image')):
+            with self.subTest(path=path):
+                self.assertEqual(async_to_sync(view)(self.async_request(path, field)).status_code, 413)
+
+
+def _zip(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    return SimpleUploadedFile('scans.zip', buffer.getvalue())
+
+
+class CollectBatchTests(SimpleTestCase):
+    """Unreadable manifests are rejected as BatchError, and a rejected archive is closed"""
+
+    def collect(self, **files):
+        opened = []
+        original = zipfile.ZipFile
+
+        def track(*args, **kwargs):
+            opened.append(original(*args, **kwargs))
+            return opened[-1]
+
+        with mock.patch('zipfile.ZipFile', side_effect=track):
+            try:
+                return collect_batch(MultiValueDict({key: [value] for key, value in files.items()}))
+            finally:
+                self.opened = opened
+
+    def assertRejected(self, message, **files):
+        with self.assertRaisesMessage(BatchError, message):
+            self.collect(**files)
+        for archive in self.opened:
+            self.assertIsNone(archive.fp)
+
+    def test_non_utf8_manifest_part(self):
+        manifest = SimpleUploadedFile('manifest.csv', 'filename,température\nscan.png,38\n'.encode('latin-1'))
+        self.assertRejected('UTF-8', images=SimpleUploadedFile('scan.png', b'png'), manifest=manifest)
+
+    def test_non_utf8_manifest_in_archive(self):
+        archive = _zip({'scan.png': b'png', 'manifest.csv': 'filename,température\n'.encode('latin-1')})
+        self.assertRejected('UTF-8', archive=archive)
+
+    def test_corrupt_manifest_in_archive(self):
+        data = bytearray(_zip({'manifest.csv': 'filename\n' * 100, 'scan.png': b'png'}).read())
+        start = data.index(b'filename')
+        data[start:start + 8] = b'XXXXXXXX'
+        self.assertRejected('Cannot read manifest.csv', archive=SimpleUploadedFile('scans.zip', bytes(data)))
+
+    @mock.patch.dict(os.environ, {'SCAN_BATCH_MAX_IMAGES': '1'})
+    def test_too_many_scans(self):
+        self.assertRejected('Too many scans', archive=_zip({'a.png': b'png', 'b.png': b'png'}))
+
+    def test_accepted_archive_left_open(self):
+        scans, manifest, archive = self.collect(archive=_zip({'scan.png': b'png'}))
+        self.assertEqual([scan.name for scan in scans], ['scan.png'])
+        self.assertIsNotNone(archive.fp)
+        archive.close()
+
+
+class FakeTranscriber:
+    """Answers '<provider> <piece>' after the piece's delay, counting the requests in flight"""
+
+    def __init__(self, provider, delays):
+        self.provider = provider
+        self.model_id = 'test'
+        self.delays = delays
+        self.in_flight = self.max_in_flight = 0
+
+    async def transcribe_file_async(self, file_name, audio, language):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delays.get(file_name, 0))
+            return f'{self.provider} {file_name}'
+        finally:
+            self.in_flight -= 1
+
+
+class DictCache(dict):
+    def set(self, key, value):
+        self[key] = value
+
+
+class SegmentedHedgingTests(SimpleTestCase):
+    """Hedged segments respect the secondary's concurrency limit and mixed answers are not cached"""
+
+    PIECES = [(f'piece{n}', b'audio') for n in range(4)]
+
+    def transcribe(self, primary, secondary):
+        cache = DictCache()
+        with mock.patch.object(transcription.Hedging, 'is_enabled', return_value=True), \
+                mock.patch.object(transcription.Segmentation, 'is_enabled', return_value=True), \
+                mock.patch.object(transcription.Hedging, 'candidates', return_value=[secondary]), \
+                mock.patch.object(transcription.hedging, 'delay', return_value=0.01), \
+                mock.patch.object(transcription.segmentation, 'split', return_value=self.PIECES), \
+                mock.patch.object(transcription.segmentation, 'concurrency', 1), \
+                mock.patch.object(transcription, 'transcript_cache', cache):
+            transcript = asyncio.run(transcription.transcribe_async(primary, 'note.wav', b'audio'))
+        return transcript, cache
+
+    def test_secondary_concurrency_is_limited(self):
+        primary = FakeTranscriber('slow-primary', {name: 1 for name, _ in self.PIECES})
+        secondary = FakeTranscriber('fast-secondary', {name: 0.05 for name, _ in self.PIECES})
+        transcript, cache = self.transcribe(primary, secondary)
+        self.assertEqual(transcript, ' '.join(f'fast-secondary {name}' for name, _ in self.PIECES))
+        self.assertEqual(secondary.max_in_flight, 1)
+        self.assertEqual(list(cache), [transcription.transcript_key(secondary, transcription._audio_hash(b'audio'))])
+
+    def test_mixed_winners_not_cached(self):
+        primary = FakeTranscriber('mixed-primary', {'piece2': 1})
+        secondary = FakeTranscriber('mixed-secondary', {})
+        transcript, cache = self.transcribe(primary, secondary)
+        self.assertIn('mixed-secondary piece2', transcript)
+        self.assertIn('mixed-primary piece0', transcript)
+        self.assertEqual(cache, {})
+
+
+class ForwardingPool:
+    """A replaced pool: its batches run on the newer pool and come back with that pool's version"""
+    version = 'old'
+
+    def submit(self, batch):
+        future = Future()
+        future.set_result((np.full((len(batch), 1), 0.9), 'new'))
+        return future
+
+
+def _image(value=0.0):
+    return np.full((150, 150, 1), value, dtype=np.float32)
+
+
+class InferenceBatcherTests(SimpleTestCase):
+    """Batches flush when full or when the wait runs out; overload and model errors reach every caller"""
+
+    def setUp(self):
+        self.batches = []
+
+    def predict(self, inputs):
+        self.batches.append(len(inputs))
+        # Each image's score is its fill value, so results can be matched to callers
+        return inputs.reshape(len(inputs), -1)[:, :1]
+
+    def test_full_batch_does_not_wait(self):
+        batcher = InferenceBatcher(max_batch_size=4, max_wait_ms=10000, predict_fn=self.predict)
+        start = time.monotonic()
+        futures = [batcher.submit(_image(i / 10)) for i in range(4)]
+        scores = [future.result(timeout=5)[0] for future in futures]
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertEqual(self.batches, [4])
+        for i, score in enumerate(scores):
+            self.assertAlmostEqual(score, i / 10, places=5)
+
+    def test_partial_batch_flushes_after_max_wait(self):
+        batcher = InferenceBatcher(max_batch_size=8, max_wait_ms=50, predict_fn=self.predict)
+        start = time.monotonic()
+        futures = [batcher.submit(_image()) for _ in range(3)]
+        for future in futures:
+            future.result(timeout=5)
+        self.assertGreaterEqual(time.monotonic() - start, 0.045)
+        self.assertEqual(sum(self.batches), 3)
+        self.assertEqual(batcher.stats()['requests'], 3)
+
+    def test_full_queue_is_overloaded(self):
+        running, release = threading.Event(), threading.Event()
+
+        def blocking_predict(inputs):
+            running.set()
+            release.wait(5)
+            return self.predict(inputs)
+
+        batcher = InferenceBatcher(max_batch_size=1, max_wait_ms=0, max_queue=1, predict_fn=blocking_predict)
+        first = batcher.submit(_image())
+        self.assertTrue(running.wait(5))
+        second = batcher.submit(_image())
+        with self.assertRaises(InferenceOverloaded):
+            batcher.submit(_image())
+        release.set()
+        first.result(timeout=5)
+        second.result(timeout=5)
+        self.assertEqual(batcher.stats()['rejected'], 1)
+
+    def test_model_error_fails_the_whole_batch(self):
+        def failing_predict(inputs):
+            raise RuntimeError('model exploded')
+
+        batcher = InferenceBatcher(max_batch_size=2, max_wait_ms=1000, predict_fn=failing_predict)
+        futures = [batcher.submit(_image()) for _ in range(2)]
+        for future in futures:
+            with self.assertRaisesMessage(RuntimeError, 'model exploded'):
+                future.result(timeout=5)
+        self.assertEqual(batcher.stats()['errors'], 1)
+
+    def test_version_comes_from_the_pool_that_ran_the_batch(self):
+        batcher = InferenceBatcher(max_batch_size=2, max_wait_ms=0)
+        with mock.patch.object(InferenceWorkerPool, 'get_instance', return_value=ForwardingPool()):
+            score, version = batcher.predict(np.zeros((150, 150, 1), dtype=np.float32), timeout=5)
+        self.assertEqual(version, 'new')
+        self.assertAlmostEqual(score, 0.9, places=5)
+
+
+class TieredCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.db_path = os.path.join(tempfile.mkdtemp(), 'cache.sqlite3')
+        self.addCleanup(shutil.rmtree, os.path.dirname(self.db_path))
+
+    def rows(self, cache):
+        return [key for key, in cache._db.execute('SELECT key FROM "test" ORDER BY expires_at')]
+
+    def test_lru_evicts_least_recently_used(self):
+        cache = TieredCache('test', max_entries=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual((cache.get('a'), cache.get('b'), cache.get('c')), (1, None, 3))
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_expired_entries_are_misses(self):
+        cache = TieredCache('test', ttl_seconds=60, db_path=self.db_path)
+        cache.set('a', 1)
+        with mock.patch('time.time', return_value=time.time() + 61):
+            self.assertIsNone(cache.get('a'))
+
+    def test_disk_tier_survives_a_restart(self):
+        TieredCache('test', db_path=self.db_path).set('a', {'score': 0.5})
+        cache = TieredCache('test', db_path=self.db_path)
+        self.assertEqual(cache.get('a'), {'score': 0.5})
+        self.assertEqual(cache.stats()['disk_hits'], 1)
+
+    def test_memory_eviction_falls_through_to_disk(self):
+        cache = TieredCache('test', max_entries=1, db_path=self.db_path)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.stats()['disk_hits'], 1)
+        # The disk hit is promoted to the memory tier
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.stats()['disk_hits'], 1)
+
+    def test_unusable_db_leaves_a_memory_cache(self):
+        cache = TieredCache('test', db_path=os.path.join(self.db_path, 'missing', 'cache.sqlite3'))
+        cache.set('a', 1)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertFalse(cache.stats()['persistent'])
+
+    def test_disabled_cache_stores_nothing(self):
+        cache = TieredCache('test', db_path=self.db_path, enabled=False)
+        cache.set('a', 1)
+        self.assertIsNone(cache.get('a'))
+        self.assertFalse(os.path.exists(self.db_path))
+
+    @mock.patch.object(TieredCache, 'PRUNE_INTERVAL', 1)
+    def test_disk_tier_is_pruned_to_its_row_cap(self):
+        cache = TieredCache('test', db_path=self.db_path, max_db_entries=3)
+        for key in 'abcde':
+            cache.set(key, key)
+        self.assertEqual(self.rows(cache), ['c', 'd', 'e'])
+        self.assertEqual(cache.stats()['disk_evictions'], 2)
+
+    @mock.patch.object(TieredCache, 'PRUNE_INTERVAL', 2)
+    def test_disk_tier_drops_expired_rows(self):
+        cache = TieredCache('test', ttl_seconds=60, db_path=self.db_path)
+        cache.set('old', 1)
+        with mock.patch('time.time', return_value=time.time() + 61):
+            cache.set('new', 2)
+        self.assertEqual(self.rows(cache), ['new'])
+
+
+class InternalEndpointTests(TestCase):
+    """Metrics and STT health are for staff; only the readiness probe is open"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username='clinician', password='unused-password')
+        cls.staff = get_user_model().objects.create_user(username='operator', password='unused-password',
+                                                         is_staff=True)
+
+    def get(self, view, user=None):
+        request = APIRequestFactory().get('/api/internal')
+        if user is not None:
+            force_authenticate(request, user=user)
+        return view(request)
+
+    def test_staff_only(self):
+        for view in (views.service_metrics, views.stt_health):
+            with self.subTest(view=view.__name__):
+                self.assertEqual(self.get(view).status_code, 401)
+                self.assertEqual(self.get(view, self.user).status_code, 403)
+                self.assertIn(self.get(view, self.staff).status_code, (200, 503))
+
+    @mock.patch.object(ModelWarmup, 'start')
+    def test_readiness_is_open(self, start):
+        self.assertEqual(self.get(views.readiness).status_code, 503)
+        start.assert_called_once_with()
+
+
+class GeminiAsyncModelTests(SimpleTestCase):
+    @mock.patch.object(stt_gemini, 'genai', create=True)
+    def test_one_model_per_event_loop(self, genai):
+        genai.GenerativeModel.side_effect = lambda name: mock.Mock(name=name)
+        transcriber = stt_gemini.GeminiTranscriber(model_name='test')
+
+        async def models():
+            return transcriber._async_generative_model(), transcriber._async_generative_model()
+
+        first, again = asyncio.run(models())
+        second, _ = asyncio.run(models())
+        self.assertIs(first, again)
+        self.assertIsNot(first, second)
+
+
+class FakeBackend:
+    """Stands in for a loaded model: scores every image with a constant"""
+    name = 'fake'
+
+    def __init__(self, path, score=0.25):
+        self.path = path
+        self.score = score
+
+    def predict(self, batch):
+        return np.full((len(batch), 1), self.score, dtype=np.float32)
+
+
+class ModelLoaderTests(SimpleTestCase):
+    """Versions are ordered by publish time, new ones swapped in, and retired ones freed once drained"""
+
+    def setUp(self):
+        self.model_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.model_dir)
+        self.source = os.path.join(self.model_dir, 'trained.keras')
+        with open(self.source, 'wb') as f:
+            f.write(b'weights')
+        patches = (
+            mock.patch.dict(os.environ, {'MODEL_DIR': self.model_dir, 'INFERENCE_BACKEND': 'keras',
+                                         'INFERENCE_WORKERS': '0'}),
+            mock.patch.object(model_loader, 'create_backend', side_effect=lambda name, path: FakeBackend(path)),
+            mock.patch.object(model_loader, 'warm_up'),
+        )
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.loader = ModelLoader()
+
+    def test_versions_ordered_by_publish_time_not_name(self):
+        for name in ('zeta', 'alpha', '20260101-000000'):
+            self.loader.publish(self.source, name)
+        self.assertEqual([v.name for v in self.loader.available_versions()], ['zeta', 'alpha', '20260101-000000'])
+
+    def test_reload_swaps_in_a_new_version(self):
+        self.loader.publish(self.source, 'v1')
+        self.assertEqual(self.loader.predict_with_version(np.zeros((1, 150, 150, 1)))[1], 'v1')
+        self.assertFalse(self.loader.reload())
+
+        self.loader.publish(self.source, 'v2')
+        self.assertTrue(self.loader.reload())
+        self.assertEqual(self.loader.predict_with_version(np.zeros((1, 150, 150, 1)))[1], 'v2')
+        self.assertEqual(self.loader.served_version(), 'v2')
+
+    def test_retired_version_freed_once_drained(self):
+        self.loader.publish(self.source, 'v1')
+        with self.loader.acquire() as served:
+            self.loader.swap('v2', FakeBackend('v2'))
+            # A request still running on v1 keeps its model
+            self.assertIsNotNone(served.backend)
+            self.assertEqual(self.loader.served_version(), 'v2')
+        self.assertIsNone(served.backend)
+
+    def test_version_that_fails_to_load_is_not_retried(self):
+        self.loader.publish(self.source, 'v1')
+        self.loader.load_model()
+        self.loader.publish(self.source, 'broken')
+        with mock.patch.object(model_loader, 'create_backend', side_effect=RuntimeError('bad weights')) as create:
+            self.assertFalse(self.loader.reload())
+            self.assertFalse(self.loader.reload())
+        self.assertEqual(create.call_count, 1)
+        self.assertEqual(self.loader.served_version(), 'v1')
+
+
+class WorkerPoolReplaceTests(SimpleTestCase):
+    """A replaced pool drains, and callers still holding it are sent on to the new pool"""
+
+    def setUp(self):
+        patches = (
+            mock.patch.dict(os.environ, {'INFERENCE_WORKERS': '1'}),
+            # Threads stand in for worker processes, sharing this process' fake model
+            mock.patch.object(worker_pool, 'ProcessPoolExecutor',
+                              lambda max_workers, **kwargs: ThreadPoolExecutor(max_workers)),
+            mock.patch.object(worker_pool, '_worker_backend', FakeBackend('model')),
+            mock.patch.object(InferenceWorkerPool, '_instance', None),
+        )
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def pool(self, name):
+        pool = InferenceWorkerPool(1, 'keras', ModelVersion(name, '/models/' + name))
+        self.addCleanup(pool.shutdown)
+        return pool
+
+    def test_retired_pool_forwards_to_the_current_one(self):
+        old, new = self.pool('v1'), self.pool('v2')
+        InferenceWorkerPool._instance = old
+        self.assertEqual(old.predict_with_version(np.zeros((1, 150, 150, 1)))[1], 'v1')
+
+        with mock.patch.object(InferenceWorkerPool, '_build', return_value=new), \
+                mock.patch.object(new, 'start'):
+            self.assertIs(InferenceWorkerPool.replace(ModelVersion('v2', '/models/v2')), new)
+        for _ in range(500):
+            if old._retired:
+                break
+            time.sleep(0.01)
+        self.assertTrue(old._retired)
+        predictions, version = old.predict_with_version(np.zeros((2, 150, 150, 1)))
+        self.assertEqual((len(predictions), version), (2, 'v2'))
+
+    def test_drain_waits_for_callers_inside_submit(self):
+        pool = self.pool('v1')
+        with pool._idle:
+            pool._users += 1
+        drain = threading.Thread(target=pool.drain)
+        drain.start()
+        drain.join(0.1)
+        self.assertTrue(drain.is_alive())
+        self.assertFalse(pool._retired)
+        with pool._idle:
+            pool._users -= 1
+            pool._idle.notify_all()
+        drain.join(5)
+        self.assertTrue(pool._retired)
+
+
+class CountingTranscriber:
+    """Blocking transcriber that answers `transcript` and counts its calls"""
+
+    def __init__(self, provider='counting', model_id='m1', transcript='mujhe khansi hai'):
+        self.provider = provider
+        self.model_id = model_id
+        self.transcript = transcript
+        self.calls = 0
+
+    def transcribe_file(self, file_name, audio, language=None):
+        self.calls += 1
+        return self.transcript
+
+
+class TranscriptCacheTests(SimpleTestCase):
+    """Transcripts are reused per provider, model, language and audio; empty ones are not kept"""
+
+    def setUp(self):
+        self.cache = DictCache()
+        patches = (
+            mock.patch.object(transcription.Hedging, 'is_enabled', return_value=False),
+            mock.patch.object(transcription.Segmentation, 'is_enabled', return_value=False),
+            mock.patch.object(transcription.audio_compactor, 'is_enabled', return_value=False),
+            mock.patch.object(transcription, 'transcript_cache', self.cache),
+        )
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_same_audio_is_transcribed_once(self):
+        transcriber = CountingTranscriber()
+        for _ in range(2):
+            self.assertEqual(transcription.transcribe(transcriber, 'note.wav', b'audio', 'hi'), 'mujhe khansi hai')
+        self.assertEqual(transcriber.calls, 1)
+
+    def test_key_covers_language_model_and_audio(self):
+        transcriber = CountingTranscriber()
+        transcription.transcribe(transcriber, 'note.wav', b'audio', 'hi')
+        transcription.transcribe(transcriber, 'note.wav', b'audio', 'or')
+        transcription.transcribe(transcriber, 'note.wav', b'other audio', 'hi')
+        transcription.transcribe(CountingTranscriber(model_id='m2'), 'note.wav', b'audio', 'hi')
+        self.assertEqual(transcriber.calls, 3)
+        self.assertEqual(len(self.cache), 4)
+
+    def test_empty_transcript_is_not_cached(self):
+        transcriber = CountingTranscriber(transcript='')
+        transcription.transcribe(transcriber, 'note.wav', b'audio')
+        transcription.transcribe(transcriber, 'note.wav', b'audio')
+        self.assertEqual(transcriber.calls, 2)
+        self.assertEqual(self.cache, {})
+
+    def test_async_reuses_a_transcript_cached_by_a_hedging_candidate(self):
+        primary, secondary = FakeTranscriber('cache-primary', {}), FakeTranscriber('cache-secondary', {})
+        self.cache[transcription.transcript_key(secondary, transcription._audio_hash(b'audio'), 'hi')] = 'cached'
+        with mock.patch.object(transcription.Hedging, 'is_enabled', return_value=True), \
+                mock.patch.object(transcription.Hedging, 'candidates', return_value=[secondary]):
+            transcript = asyncio.run(transcription.transcribe_async(primary, 'note.wav', b'audio', 'hi'))
+        self.assertEqual(transcript, 'cached')
+        self.assertEqual((primary.max_in_flight, secondary.max_in_flight), (0, 0))
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker(failure_threshold=3, cooldown_seconds=30)
+        breaker.record(False, 0)
+        breaker.record(False, 1)
+        breaker.record(True, 2)
+        breaker.record(False, 3)
+        breaker.record(False, 4)
+        self.assertTrue(breaker.available(5))
+        breaker.record(False, 5)
+        self.assertEqual(breaker.state, OPEN)
+        self.assertFalse(breaker.acquire(6))
+        self.assertEqual(breaker.retry_after(6), 29)
+
+    def test_half_open_lets_one_trial_through(self):
+        breaker = CircuitBreaker(failure_threshold=1, cooldown_seconds=30)
+        breaker.record(False, 0)
+        self.assertTrue(breaker.acquire(30))
+        self.assertEqual(breaker.state, HALF_OPEN)
+        self.assertFalse(breaker.acquire(31))
+        # A trial that never reports back lapses after another cooldown
+        self.assertTrue(breaker.acquire(60))
+
+    def test_trial_result_closes_or_reopens(self):
+        breaker = CircuitBreaker(failure_threshold=5, cooldown_seconds=30)
+        for now in range(5):
+            breaker.record(False, now)
+        self.assertTrue(breaker.acquire(34))
+        breaker.record(False, 35)
+        self.assertEqual(breaker.state, OPEN)
+        self.assertTrue(breaker.acquire(65))
+        breaker.record(True, 66)
+        self.assertEqual((breaker.state, breaker.consecutive_failures), (CLOSED, 0))
+
+
+class StubTranscriber:
+    def __init__(self, provider, configured=True, languages=None):
+        self.provider = provider
+        self.configured = configured
+        self.languages = languages
+
+    def is_configured(self):
+        return self.configured
+
+    def is_language_supported(self, language):
+        return self.languages is None or language in self.languages
+
+
+class ProviderRouterTests(SimpleTestCase):
+    """Providers are ranked by EWMA latency over success rate, unmeasured first, tripped ones skipped"""
+
+    def setUp(self):
+        self.providers = [StubTranscriber('fast'), StubTranscriber('slow'),
+                          StubTranscriber('hindi', languages={'hi'}), StubTranscriber('unset', configured=False)]
+        patch = mock.patch.object(stt_router, 'transcribers', return_value=self.providers)
+        patch.start()
+        self.addCleanup(patch.stop)
+        with mock.patch.dict(os.environ, {'STT_ROUTER_ALPHA': '0.5', 'STT_BREAKER_FAILURES': '2'}):
+            self.router = ProviderRouter()
+
+    def ranked(self, language='en'):
+        return [t.provider for t in self.router.rank(language)]
+
+    def test_unmeasured_providers_first_then_by_latency(self):
+        self.router.record('slow', 'en', 2.0, True)
+        self.assertEqual(self.ranked(), ['fast', 'slow'])
+        self.router.record('fast', 'en', 0.5, True)
+        self.assertEqual(self.ranked(), ['fast', 'slow'])
+        self.assertEqual(self.ranked('hi'), ['fast', 'slow', 'hindi'])
+
+    def test_ewma_tracks_recent_latency(self):
+        self.router.record('fast', 'en', 0.5, True)
+        self.router.record('slow', 'en', 1.0, True)
+        for _ in range(3):
+            self.router.record('fast', 'en', 4.0, True)
+        self.assertEqual(self.ranked(), ['slow', 'fast'])
+        self.assertEqual(self.router.health()['fast']['languages']['en']['ewma_latency_ms'], 3562.5)
+
+    def test_errors_raise_the_cost(self):
+        self.router.record('fast', 'en', 0.5, True)
+        self.router.record('slow', 'en', 1.0, True)
+        self.router.record('fast', 'en', 0.5, False)
+        self.router.record('fast', 'en', 0.5, True)
+        # fast: 0.5s at a 25% error rate costs less than slow's 1s
+        self.assertEqual(self.ranked(), ['fast', 'slow'])
+        self.router.record('fast', 'en', 0.5, False)
+        self.assertEqual(self.ranked(), ['slow', 'fast'])
+
+    def test_tripped_provider_is_skipped(self):
+        self.router.record('fast', 'en', 0.1, False)
+        self.router.record('fast', 'en', 0.1, False)
+        self.assertEqual(self.ranked(), ['slow'])
+        self.assertEqual(self.router.choose('en').provider, 'slow')
+        self.assertEqual(self.router.health()['fast']['circuit'], OPEN)
+
+
+class NegationScopeTests(SimpleTestCase):
+    """Pre/post windows, terminators, sentence breaks, pseudo-negations and cues used on either side"""
+
+    LEXICON = {'cough': ['cough'], 'fever': ['fever'], 'chest_pain': ['chest pain'], 'sore_throat': ['gala dard']}
+    CUES = {'pre': ['no', 'denies', 'nahi'], 'post': ['absent', 'nahi', 'nahi hai'], 'pseudo': ['no doubt'],
+            'terminators': ['but', 'lekin']}
+    CASES = [
+        ('cough', {'cough'}),
+        ('coughing since monday', {'cough'}),
+        ('no coughing', set()),
+        ('no a b cough', set()),
+        ('no a b c cough', {'cough'}),
+        ('no fever, cough', set()),
+        ('no fever but cough', {'cough'}),
+        ('no fever. cough', {'cough'}),
+        ('no doubt cough', {'cough'}),
+        ('chest pain absent', set()),
+        ('fever x absent', set()),
+        ('fever x y absent', {'fever'}),
+        ('fever. absent', {'fever'}),
+        ('gala dard x nahi hai', set()),
+        ('nahi cough', set()),
+        ('cough nahi, fever', {'fever'}),
+        ('no cough lekin cough again', {'cough'}),
+        ('denies chest pain or fever', {'fever'}),
+    ]
+
+    def test_cases(self):
+        engine = NegationScope(self.LEXICON, self.CUES, pre_window=3, post_window=2)
+        for text, expected in self.CASES:
+            with self.subTest(text=text):
+                present = {key for key, value in engine.match(text).items() if value}
+                self.assertEqual(present, expected)
+
+    def test_tokenize_splits_on_symbols_but_keeps_apostrophes_and_marks(self):
+        self.assertEqual(tokenize('(fever)/cough+"headache" doesn\'t ଖାସି।'),
+                         ['fever', 'cough', 'headache', "doesn't", 'ଖାସି', '।'])
+
+    def test_mentions_in_order(self):
+        engine = NegationScope(self.LEXICON, self.CUES, pre_window=3, post_window=2)
+        self.assertEqual(engine.mentions('no fever but cough'),
+                         [(frozenset(['fever']), True), (frozenset(['cough']), False)])
+
+
+class FuzzyMatchingTests(SimpleTestCase):
+    """Misspellings are corrected within the length floors, never into an excluded or ambiguous word"""
+
+    LEXICON = {'cough': ['cough', 'khansi'], 'fever': ['fever', 'bukhar'], 'fatigue': ['tired', 'thakaan']}
+    CUES = {'pre': ['nahi'], 'post': [], 'pseudo': [], 'terminators': []}
+
+    def engine(self, exclude=()):
+        return NegationScope(self.LEXICON, self.CUES, fuzzy_exclude=exclude)
+
+    def test_edit_distance_counts_a_swap_as_one_edit(self):
+        self.assertEqual(edit_distance('khasni', 'khansi', 2), 1)
+        self.assertEqual(edit_distance('khansi', 'khansi', 2), 0)
+        self.assertEqual(edit_distance('fever', 'thakaan', 2), 3)
+
+    def test_length_floors(self):
+        self.assertEqual([fuzzy_limit('x' * n) for n in (4, 5, 7, 8, 12)], [0, 1, 1, 2, 2])
+        engine = self.engine()
+        # 1 edit from 5 characters, 2 from 8
+        self.assertEqual(engine.correct(['khasi', 'fevr', 'thakawn', 'thkaaaan'], 2),
+                         ['khansi', 'fevr', 'thakaan', 'thakaan'])
+        self.assertEqual(engine.correct(['bukaarr'], 2), ['bukaarr'])
+
+    def test_language_limit_caps_the_floor(self):
+        self.assertEqual(self.engine().correct(['thkaaaan'], 1), ['thkaaaan'])
+
+    def test_excluded_words_are_never_corrected(self):
+        self.assertEqual(self.engine().correct(['tried', 'tires'], 2), ['tired', 'tired'])
+        self.assertEqual(self.engine(exclude=['tried', 'tires']).correct(['tried', 'tires'], 2), ['tried', 'tires'])
+
+    def test_known_and_inflected_words_are_kept(self):
+        self.assertEqual(self.engine().correct(['nahi', 'coughing', 'fever'], 2), ['nahi', 'coughing', 'fever'])
+
+    def test_ambiguous_corrections_are_dropped(self):
+        index = FuzzyIndex({'khansi': frozenset(['cough']), 'khanse': frozenset(['fever'])})
+        self.assertIsNone(index.lookup('khanso', 1))
+        self.assertEqual(index.lookup('khanzi', 1), 'khansi')
+
+    def test_lexicon_file_exclusions_reach_the_engine(self):
+        lexicon_path = os.path.join(tempfile.mkdtemp(), 'lexicon.json')
+        self.addCleanup(shutil.rmtree, os.path.dirname(lexicon_path))
+        with open(lexicon_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': 't', 'symptoms': self.LEXICON, 'fuzzy_distance': {'*': 2},
+                       'fuzzy_exclude': ['Tried']}, f)
+        lexicon = SymptomLexicon.load(lexicon_path)
+        self.assertEqual(lexicon.fuzzy_exclude, frozenset(['tried']))
+        self.assertEqual(lexicon.engine('en').correct(['tried', 'tirde'], 2), ['tried', 'tired'])
+
+    def test_bundled_lexicon_false_positives(self):
+        for text in ('mujhe khushi hai', 'sardar ji aaye', 'I tried the medicine', 'car tire'):
+            with self.subTest(text=text):
+                self.assertFalse(any(extract_symptoms(text, 'hi', fuzzy=True).values()))
+        self.assertTrue(extract_symptoms('mujhe khasi hai', 'hi', fuzzy=True)['cough'])
@@ -0,0 +1,332 @@
+import os
+import time
+import asyncio
+import hashlib
+import logging
+import weakref
+import threading
+from collections import defaultdict, deque
+
+import numpy as np
+
+from .audio_preprocess import audio_compactor
+from .cache import TieredCache
+from .stt_router import router
+
+logger = logging.getLogger(__name__)
+
+# Transcripts keyed on provider + model + language + SHA-256 of the audio, so a
+# voice note re-sent after a network error or a language switch back does not
+# pay for another provider round trip
+transcript_cache = TieredCache.from_env('TRANSCRIPT_CACHE', name='transcripts')
+
+
+def _env_flag(name, default):
+    return os.getenv(name, default).lower() in ('1', 'true', 'yes', 'on')
+
+
+class LatencyTracker:
+    """Latencies of the most recent provider calls, per provider"""
+
+    def __init__(self, window=200):
+        self._samples = defaultdict(lambda: deque(maxlen=window))
+        self._lock = threading.Lock()
+
+    def observe(self, provider, seconds):
+        with self._lock:
+            self._samples[provider].append(seconds)
+
+    def percentile(self, provider, pct, min_samples=1):
+        """pct-th percentile of the recent latencies in seconds, or None with fewer than min_samples"""
+        with self._lock:
+            samples = list(self._samples.get(provider, ()))
+        if len(samples) < max(1, min_samples):
+            return None
+        return float(np.percentile(samples, pct))
+
+    def stats(self):
+        with self._lock:
+            providers = {provider: list(samples) for provider, samples in self._samples.items()}
+        return {
+            provider: {
+                'samples': len(samples),
+                'p50_ms': round(float(np.percentile(samples, 50)) * 1000, 1),
+                'p95_ms': round(float(np.percentile(samples, 95)) * 1000, 1),
+                'p99_ms': round(float(np.percentile(samples, 99)) * 1000, 1),
+            }
+            for provider, samples in providers.items() if samples
+        }
+
+
+latency = LatencyTracker(window=int(os.getenv('STT_LATENCY_WINDOW', '200')))
+
+
+class Hedging:
+    """
+    Hedged transcription (STT_HEDGING=true): when the selected provider has not
+    answered within its hedge delay, the same audio also goes to another
+    configured provider that supports the language. The first transcript wins
+    and the other request is cancelled.
+
+    The delay is the STT_HEDGE_PERCENTILE-th percentile (default 95) of the
+    provider's recent latencies, kept within STT_HEDGE_MIN_MS..STT_HEDGE_MAX_MS.
+    Until STT_HEDGE_MIN_SAMPLES calls have been timed it is STT_HEDGE_DEFAULT_MS.
+    """
+
+    def __init__(self):
+        self.percentile = float(os.getenv('STT_HEDGE_PERCENTILE', '95'))
+        self.min_samples = int(os.getenv('STT_HEDGE_MIN_SAMPLES', '20'))
+        self.default_delay = float(os.getenv('STT_HEDGE_DEFAULT_MS', '3000')) / 1000.0
+        self.min_delay = float(os.getenv('STT_HEDGE_MIN_MS', '500')) / 1000.0
+        self.max_delay = float(os.getenv('STT_HEDGE_MAX_MS', '15000')) / 1000.0
+        self._lock = threading.Lock()
+        self._hedged = 0
+        self._hedge_wins = 0
+
+    @staticmethod
+    def is_enabled():
+        return _env_flag('STT_HEDGING', 'false')
+
+    def delay(self, provider):
+        observed = latency.percentile(provider, self.percentile, self.min_samples)
+        if observed is None:
+            return self.default_delay
+        return min(max(observed, self.min_delay), self.max_delay)
+
+    @staticmethod
+    def candidates(primary, language):
+        """Other healthy configured providers that accept the language, in the router's order"""
+        return router.rank(language, exclude={primary.provider})
+
+    async def transcribe(self, primary, secondary, file_name, audio, language, limit=None):
+        """
+        (transcriber, transcript) of whichever provider answers first. The
+        hedged request waits for limit(provider), when given, like the
+        caller did for the primary's.
+        """
+        first = asyncio.ensure_future(_timed_transcribe(primary, file_name, audio, language))
+        second = None
+        try:
+            done, _ = await asyncio.wait({first}, timeout=self.delay(primary.provider))
+            if done and first.exception() is None:
+                return first.result()
+
+            # Too slow (or already failed): ask the second provider as well
+            with self._lock:
+                self._hedged += 1
+            logger.info(f"Hedging {primary.provider} transcription with {secondary.provider}")
+            second = asyncio.ensure_future(_limited_transcribe(limit, secondary, file_name, audio, language))
+            pending = {first, second} - done
+            errors = [first.exception()] if done else []
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            with self._lock:
+                                self._hedge_wins += 1
+                        return task.result()
+                    errors.append(task.exception())
+            raise errors[0]
+        finally:
+            losers = [task for task in (first, second) if task is not None and not task.done()]
+            for task in losers:
+                task.cancel()
+            # The losing request reads the upload buffer: let it stop before the caller releases it
+            await asyncio.gather(*losers, return_exceptions=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': self.is_enabled(),
+                'hedged': self._hedged,
+                'hedge_wins': self._hedge_wins,
+            }
+
+
+hedging = Hedging()
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def run_sync(coro):
+    """Run a coroutine from a request thread on the process-wide STT event loop"""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name='stt-async', daemon=True).start()
+    return asyncio.run_coroutine_threadsafe(coro, _loop).result()
+
+
+class Segmentation:
+    """
+    Segmented transcription of long voice notes (STT_SEGMENTED=true): a note
+    longer than 1.5 x STT_SEGMENT_SECONDS (default 30) is cut at pauses into
+    pieces of about that length, which are transcribed concurrently and joined
+    in order, so a several-minute history takes about as long as its longest
+    piece instead of running into the provider timeout. At most
+    STT_SEGMENT_CONCURRENCY pieces (default 4) per provider are in flight at
+    once on an event loop, to stay within the providers' rate limits.
+    """
+
+    def __init__(self):
+        self.segment_seconds = float(os.getenv('STT_SEGMENT_SECONDS', '30'))
+        self.concurrency = int(os.getenv('STT_SEGMENT_CONCURRENCY', '4'))
+        # Semaphores belong to the event loop they are used on
+        self._limits = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self._segmented = 0
+        self._segments = 0
+
+    @staticmethod
+    def is_enabled():
+        return _env_flag('STT_SEGMENTED', 'false')
+
+    def limit(self, provider):
+        limits = self._limits.setdefault(asyncio.get_running_loop(), {})
+        if provider not in limits:
+            limits[provider] = asyncio.Semaphore(self.concurrency)
+        return limits[provider]
+
+    def split(self, file_name, audio):
+        """[(file name, bytes)] of the pieces of a long note, None for a note to send whole"""
+        pieces = audio_compactor.segments(file_name, audio, self.segment_seconds)
+        if pieces:
+            with self._lock:
+                self._segmented += 1
+                self._segments += len(pieces)
+        return pieces
+
+    async def transcribe(self, transcriber, secondaries, pieces, language):
+        """
+        (transcriber, transcript) of the pieces' transcripts joined in order;
+        the transcriber is None when hedging had them answered by different providers
+        """
+        async def transcribe_piece(file_name, audio):
+            async with self.limit(transcriber.provider):
+                return await _transcribe_once(transcriber, secondaries, file_name, audio, language,
+                                              limit=self.limit)
+
+        tasks = [asyncio.ensure_future(transcribe_piece(file_name, audio)) for file_name, audio in pieces]
+        try:
+            results = await asyncio.gather(*tasks)
+        finally:
+            # When one piece fails the others are of no use
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        winners = {winner for winner, _ in results}
+        transcript = ' '.join(text.strip() for _, text in results if text and text.strip())
+        return (winners.pop() if len(winners) == 1 else None), transcript
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': self.is_enabled(),
+                'segmented_notes': self._segmented,
+                'segments': self._segments,
+            }
+
+
+segmentation = Segmentation()
+
+
+def _audio_hash(audio):
+    return hashlib.sha256(audio).hexdigest()
+
+
+def transcript_key(transcriber, audio_hash, language=None):
+    return f"{transcriber.provider}:{transcriber.model_id}:{language or ''}:{audio_hash}"
+
+
+def _record(transcriber, language, start, ok):
+    """Feed a provider call into the hedging percentiles and the router's EWMAs and circuit breaker"""
+    seconds = time.perf_counter() - start
+    latency.observe(transcriber.provider, seconds)
+    router.record(transcriber.provider, language, seconds, ok)
+
+
+async def _timed_transcribe(transcriber, file_name, audio, language):
+    start = time.perf_counter()
+    try:
+        transcript = await transcriber.transcribe_file_async(file_name, audio, language)
+    except asyncio.CancelledError:
+        # A cancelled (hedged) call took at least this long: keep it so slow providers stay
+        # visible, but it neither failed nor succeeded
+        _record(transcriber, language, start, ok=None)
+        raise
+    except Exception:
+        _record(transcriber, language, start, ok=False)
+        raise
+    _record(transcriber, language, start, ok=True)
+    return transcriber, transcript
+
+
+async def _limited_transcribe(limit, transcriber, file_name, audio, language):
+    """_timed_transcribe once limit(provider) lets the request through, when there is a limit"""
+    if limit is None:
+        return await _timed_transcribe(transcriber, file_name, audio, language)
+    async with limit(transcriber.provider):
+        return await _timed_transcribe(transcriber, file_name, audio, language)
+
+
+async def _transcribe_once(transcriber, secondaries, file_name, audio, language, limit=None):
+    """
+    (transcriber, transcript) of one provider request, hedged when there are
+    secondaries; limit(provider) bounds the hedged requests to a secondary
+    """
+    if secondaries:
+        return await hedging.transcribe(transcriber, secondaries[0], file_name, audio, language, limit)
+    return await _timed_transcribe(transcriber, file_name, audio, language)
+
+
+def transcribe(transcriber, file_name, audio, language=None):
+    """Transcript of a voice note, from the cache when the same audio was transcribed the same way before"""
+    if Hedging.is_enabled() or Segmentation.is_enabled():
+        return run_sync(transcribe_async(transcriber, file_name, audio, language))
+
+    key = transcript_key(transcriber, _audio_hash(audio), language)
+    transcript = transcript_cache.get(key)
+    if transcript is None:
+        # The cache is keyed on the audio as uploaded, so a hit skips compaction too
+        if audio_compactor.is_enabled():
+            file_name, audio = audio_compactor.compact(file_name, audio)
+        start = time.perf_counter()
+        try:
+            transcript = transcriber.transcribe_file(file_name, audio, language)
+        except Exception:
+            _record(transcriber, language, start, ok=False)
+            raise
+        _record(transcriber, language, start, ok=True)
+        # Empty transcripts are not cached: a retry may well produce text
+        if transcript:
+            transcript_cache.set(key, transcript)
+    return transcript
+
+
+async def transcribe_async(transcriber, file_name, audio, language=None):
+    """transcribe() for async views, hedged across providers and split into segments when enabled"""
+    secondaries = Hedging.candidates(transcriber, language) if Hedging.is_enabled() else []
+    # hashlib releases the GIL on large buffers, so hashing does not stall the event loop
+    audio_hash = await asyncio.to_thread(_audio_hash, audio)
+
+    # Any provider the request may be answered by can answer it from the cache
+    for candidate in [transcriber] + secondaries:
+        transcript = transcript_cache.get(transcript_key(candidate, audio_hash, language))
+        if transcript is not None:
+            return transcript
+
+    pieces = await asyncio.to_thread(segmentation.split, file_name, audio) if Segmentation.is_enabled() else None
+    if pieces:
+        # A transcript joined from several providers' pieces is not what any one of them
+        # would answer, so it is not cached (winner None)
+        winner, transcript = await segmentation.transcribe(transcriber, secondaries, pieces, language)
+    else:
+        if audio_compactor.is_enabled():
+            file_name, audio = await asyncio.to_thread(audio_compactor.compact, file_name, audio)
+        winner, transcript = await _transcribe_once(transcriber, secondaries, file_name, audio, language)
+    if transcript and winner is not None:
+        transcript_cache.set(transcript_key(winner, audio_hash, language), transcript)
+    return transcript
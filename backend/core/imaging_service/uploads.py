@@ -0,0 +1,156 @@
+import io
+import os
+import mmap
+import tempfile
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from rest_framework.parsers import MultiPartParser
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds the size limit of its endpoint (HTTP 413)"""
+
+
+class SpooledUploadHandler(FileUploadHandler):
+    """
+    Streams uploaded files into memory up to memory_bytes, then into an
+    anonymous temporary file, so a request never holds more than memory_bytes
+    of file data in RAM. Aborts with UploadTooLarge once the files of one
+    request exceed max_bytes.
+    """
+
+    def __init__(self, request=None, max_bytes=None, memory_bytes=0):
+        super().__init__(request)
+        self.max_bytes = max_bytes
+        self.memory_bytes = memory_bytes
+        self.received = 0
+        self.file = None
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.file = io.BytesIO()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.max_bytes is not None and self.received > self.max_bytes:
+            self.file.close()
+            raise UploadTooLarge(f'Uploaded file exceeds the {self.max_bytes // (1024 * 1024)} MB limit')
+        if isinstance(self.file, io.BytesIO) and self.file.tell() + len(raw_data) > self.memory_bytes:
+            self._spill()
+        self.file.write(raw_data)
+        return None
+
+    def _spill(self):
+        """Move what is buffered so far into a temporary file"""
+        spooled = tempfile.TemporaryFile(dir=settings.FILE_UPLOAD_TEMP_DIR)
+        spooled.write(self.file.getbuffer())
+        self.file.close()
+        self.file = spooled
+
+    def file_complete(self, file_size):
+        self.file.seek(0)
+        return UploadedFile(
+            file=self.file,
+            name=self.file_name,
+            content_type=self.content_type,
+            size=file_size,
+            charset=self.charset,
+            content_type_extra=self.content_type_extra,
+        )
+
+
+class SpooledMultiPartParser(MultiPartParser):
+    """
+    Multipart parser that spools files through SpooledUploadHandler with
+    per-endpoint limits read from environment variables sharing a prefix, e.g.
+    for prefix SCAN_UPLOAD:
+        SCAN_UPLOAD_MAX_MB       largest accepted upload
+        SCAN_UPLOAD_MEMORY_MB    file data kept in memory before spilling to disk
+    """
+    env_prefix = None
+    default_max_mb = 50
+    default_memory_mb = 1
+
+    def limits(self):
+        max_mb = float(os.getenv(f'{self.env_prefix}_MAX_MB', str(self.default_max_mb)))
+        memory_mb = float(os.getenv(f'{self.env_prefix}_MEMORY_MB', str(self.default_memory_mb)))
+        return int(max_mb * 1024 * 1024), int(memory_mb * 1024 * 1024)
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        request = parser_context['request']
+        max_bytes, memory_bytes = self.limits()
+
+        # Reject oversized bodies from Content-Length before reading them;
+        # the form fields around the file are bounded by DATA_UPLOAD_MAX_MEMORY_SIZE
+        try:
+            content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            content_length = 0
+        if content_length > max_bytes + (settings.DATA_UPLOAD_MAX_MEMORY_SIZE or 0):
+            raise UploadTooLarge(f'Uploaded file exceeds the {max_bytes // (1024 * 1024)} MB limit')
+
+        request._request.upload_handlers = [
+            SpooledUploadHandler(request._request, max_bytes=max_bytes, memory_bytes=memory_bytes)
+        ]
+        return super().parse(stream, media_type, parser_context)
+
+
+class ScanUploadParser(SpooledMultiPartParser):
+    """X-ray uploads (upload_scan, multimodal_diagnosis)"""
+    env_prefix = 'SCAN_UPLOAD'
+    default_max_mb = 50
+
+
+class AudioUploadParser(SpooledMultiPartParser):
+    """Voice note uploads (transcribe_symptoms)"""
+    env_prefix = 'AUDIO_UPLOAD'
+    default_max_mb = 25
+
+
+class BatchUploadParser(SpooledMultiPartParser):
+    """Bulk scan uploads (batch_scans): many images or one zip archive"""
+    env_prefix = 'BATCH_UPLOAD'
+    default_max_mb = 500
+
+
+@contextmanager
+def upload_buffer(uploaded_file):
+    """
+    Zero-copy view of an uploaded file's contents: the in-memory buffer for
+    small files, a read-only memory map of the temporary file otherwise.
+    The view is only valid inside the with block.
+    """
+    f = uploaded_file.file
+    if isinstance(f, io.BytesIO):
+        view = f.getbuffer()
+        try:
+            yield view
+        finally:
+            view.release()
+        return
+
+    try:
+        fileno = f.fileno()
+    except (AttributeError, OSError):
+        # Not backed by a real file (e.g. a member of an archive): read it once
+        f.seek(0)
+        yield memoryview(f.read())
+        return
+    if uploaded_file.size == 0:
+        yield memoryview(b'')
+        return
+    mapped = mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+    view = memoryview(mapped)
+    try:
+        yield view
+    finally:
+        view.release()
+        try:
+            mapped.close()
+        except BufferError:
+            # A caller still holds a slice of the view; the map is closed when it is collected
+            pass
+
@@ -1,8 +1,21 @@
+import os
+
 from django.urls import path
 from . import views
 
+# Under ASGI, ASYNC_VIEWS=true serves the upload endpoints from async views,
+# so slow STT calls and inference do not each hold a worker thread
+if os.getenv('ASYNC_VIEWS', 'false').lower() in ('1', 'true', 'yes', 'on'):
+    from . import async_views as upload_views
+else:
+    upload_views = views
+
 urlpatterns = [
-    path('upload-scan', views.upload_scan, name='upload_scan'),
-    path('symptoms/transcribe', views.transcribe_symptoms, name='transcribe_symptoms'),
-    path('diagnosis/multimodal', views.multimodal_diagnosis, name='multimodal_diagnosis'),
-]
\ No newline at end of file
+    path('upload-scan', upload_views.upload_scan, name='upload_scan'),
+    path('scans/batch', views.batch_scans, name='batch_scans'),
+    path('symptoms/transcribe', upload_views.transcribe_symptoms, name='transcribe_symptoms'),
+    path('diagnosis/multimodal', upload_views.multimodal_diagnosis, name='multimodal_diagnosis'),
+    path('jobs/<uuid:job_id>', views.job_status, name='job_status'),
+    path('metrics', views.service_metrics, name='service_metrics'),
+    path('stt/health', views.stt_health, name='stt_health'),
+]
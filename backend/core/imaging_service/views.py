@@ -1,41 +1,95 @@
 from rest_framework.decorators import api_view, parser_classes, authentication_classes, permission_classes
-from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
+from rest_framework.parsers import FormParser, JSONParser
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework_simplejwt.authentication import JWTAuthentication
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from .knowledge_base import calculate
 from datetime import datetime
 from dateutil.relativedelta import relativedelta
-from .model.model_predict import predict_pneumonia
+from .model.model_predict import predict_scan, prediction_cache
+from .model.batching import InferenceBatcher
+from .model.executor import InferenceExecutor
+from .model.worker_pool import InferenceOverloaded, InferenceWorkerPool
+from .model.warmup import ModelWarmup
+from .dicom import DicomError, scan_patient_info
+from .jobs import JobRunner, enqueue, serialize_job, wants_async
+from .models import DiagnosisJob
+from .scan_batch import BatchError, collect_batch, stream_batch_results
+from .uploads import AudioUploadParser, BatchUploadParser, ScanUploadParser, UploadTooLarge, upload_buffer
+from django.http import StreamingHttpResponse
 import os
+import math
 from .stt_whisper import WhisperTranscriber
 from .stt_gemini import GeminiTranscriber
 from .stt_deepgram import DeepgramTranscriber
-from .nlp_symptoms import extract_symptoms, to_vitals_flags
+from .audio_preprocess import audio_compactor
+from .http_clients import connection_stats
+from .stt_router import router
+from .transcription import hedging, latency, segmentation, transcribe, transcript_cache
+from .nlp_symptoms import extract_symptoms, lexicon_stats, to_vitals_flags
+
+def _overloaded_response(error):
+    """503 with Retry-After when the inference queue/workers are saturated"""
+    response = Response({'error': str(error)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    response['Retry-After'] = '1'
+    return response
+
+
+def _too_large_response(error):
+    return Response({'error': str(error)}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+
+def _enqueue_job(request, job_type, file_field):
+    """Queue the request for the job runner and answer 202 with where to poll for the result"""
+    try:
+        job = enqueue(request, job_type, file_field)
+    except UploadTooLarge as e:
+        return _too_large_response(e)
+    status_url = f'/api/jobs/{job.id}'
+    response = Response({'jobId': str(job.id), 'status': job.status, 'statusUrl': status_url},
+                        status=status.HTTP_202_ACCEPTED)
+    response['Location'] = status_url
+    return response
+
 
 @api_view(['POST'])
 @authentication_classes([JWTAuthentication])
 @permission_classes([IsAuthenticated])
-@parser_classes([MultiPartParser, FormParser])
+@parser_classes([ScanUploadParser, FormParser])
 def upload_scan(request):
     """
-    Upload a medical scan image and check vitals then get result
+    Upload a medical scan image (PNG/JPEG or DICOM) and check vitals then get result
     """
+    if wants_async(request):
+        return _enqueue_job(request, DiagnosisJob.UPLOAD_SCAN, 'image')
+    try:
+        data, files = request.data, request.FILES
+    except UploadTooLarge as e:
+        return _too_large_response(e)
+    return handle_upload_scan(data, files)
+
+
+def handle_upload_scan(data, files):
+    """upload_scan on already parsed form fields and files (also run by the job runner)"""
     try:
         # Check if image file was provided
-        if 'image' not in request.FILES:
+        if 'image' not in files:
             return Response({'error': 'No image file provided'}, status=status.HTTP_400_BAD_REQUEST)
         
         # Get image file
-        image_file = request.FILES['image']
+        image_file = files['image']
 
         # Check if the patient has pneumonia
-        has_pneumonia = predict_pneumonia(image_file)
+        prediction = predict_scan(image_file)
+        has_pneumonia = prediction['has_pneumonia']
+        
+        # DICOM scans carry birthdate and sex in their header; form fields take precedence
+        patient = scan_patient_info(image_file)
         
         # Calculate age from birthdate
         try:
-            birthdate_str = request.data.get('birthdate')
+            birthdate_str = data.get('birthdate') or patient.get('birthdate')
             if not birthdate_str:
                 return Response({'error': 'Birthdate is required'}, status=status.HTTP_400_BAD_REQUEST)
             
@@ -67,15 +121,15 @@ def upload_scan(request):
         try:
             # Required parameters with validation
             params = {
-                'systolic_pressure': int(request.data.get('systolicBP')) if request.data.get('systolicBP') is not None else 120,
-                'diastolic_pressure': int(request.data.get('diastolicBP')) if request.data.get('diastolicBP') is not None else 80,
-                'temperature': float(request.data.get('temperature')) if request.data.get('temperature') is not None else 37.0,
-                'heart_rate': int(request.data.get('heartRate')) if request.data.get('heartRate') is not None else 75,
-                'has_cough': request.data.get('hasCough', 'false').lower() == 'true',
-                'has_headache': request.data.get('hasHeadaches', 'false').lower() == 'true',
-                'can_smell': request.data.get('canSmellTaste', 'true').lower() == 'true',
+                'systolic_pressure': int(data.get('systolicBP')) if data.get('systolicBP') is not None else 120,
+                'diastolic_pressure': int(data.get('diastolicBP')) if data.get('diastolicBP') is not None else 80,
+                'temperature': float(data.get('temperature')) if data.get('temperature') is not None else 37.0,
+                'heart_rate': int(data.get('heartRate')) if data.get('heartRate') is not None else 75,
+                'has_cough': data.get('hasCough', 'false').lower() == 'true',
+                'has_headache': data.get('hasHeadaches', 'false').lower() == 'true',
+                'can_smell': data.get('canSmellTaste', 'true').lower() == 'true',
                 'age': float(age),  # Using calculated age
-                'gender': request.data.get('gender', 'female'),
+                'gender': data.get('gender') or patient.get('gender', 'female'),
                 'has_pneumonia': has_pneumonia
             }
         except (ValueError, TypeError) as e:
@@ -89,9 +143,16 @@ def upload_scan(request):
         
         # Include age in response for verification
         result['age'] = age
+        result['modelVersion'] = prediction['model_version']
         
         return Response(result, status=status.HTTP_201_CREATED)
             
+    except InferenceOverloaded as e:
+        return _overloaded_response(e)
+    except UploadTooLarge as e:
+        return _too_large_response(e)
+    except DicomError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -99,124 +160,195 @@ def upload_scan(request):
 @api_view(['POST'])
 @authentication_classes([JWTAuthentication])
 @permission_classes([IsAuthenticated])
-@parser_classes([MultiPartParser, FormParser])
+@parser_classes([AudioUploadParser, FormParser])
 def transcribe_symptoms(request):
     """
     Transcribe a short voice note and extract symptom keywords.
     """
+    if wants_async(request):
+        return _enqueue_job(request, DiagnosisJob.TRANSCRIBE_SYMPTOMS, 'audio')
     try:
-        if 'audio' not in request.FILES:
+        data, files = request.data, request.FILES
+    except UploadTooLarge as e:
+        return _too_large_response(e)
+    return handle_transcribe_symptoms(data, files)
+
+
+def handle_transcribe_symptoms(data, files):
+    """transcribe_symptoms on already parsed form fields and files (also run by the job runner)"""
+    try:
+        if 'audio' not in files:
             return Response({'error': 'No audio file provided'}, status=status.HTTP_400_BAD_REQUEST)
 
-        audio_file = request.FILES['audio']
-        # Select STT provider via env var
-        provider = os.getenv('STT_PROVIDER', 'whisper').lower()
-        language = request.data.get('language')
-        
-        # For Odia language (or), try different providers as fallbacks
-        # Neither Deepgram nor standard Whisper/Gemini support Odia directly
-        # We'll try to use fallback providers with language hints
-        if language == 'or':  # Odia language code
-            # Check if Deepgram is configured (it doesn't support Odia)
-            if provider == 'deepgram':
-                return Response({
-                    'error': 'Deepgram does not support Odia language',
-                    'suggestion': 'Please switch to Whisper (OPENAI_API_KEY) or Gemini (GOOGLE_API_KEY) for Odia language support'
-                }, status=status.HTTP_400_BAD_REQUEST)
-            
-            # Try Whisper first for Odia (with language hint)
-            transcriber = WhisperTranscriber()
-            if not transcriber.is_configured():
-                # Fallback to Gemini if Whisper is not configured
-                transcriber = GeminiTranscriber()
-                if not transcriber.is_configured():
-                    # If no providers are configured, return error with suggestions
-                    return Response({
-                        'error': 'No STT provider configured for Odia language',
-                        'suggestion': 'Please configure either Whisper (OPENAI_API_KEY) or Gemini (GOOGLE_API_KEY) for Odia language support',
-                        'configured_providers': {
-                            'whisper_configured': False,
-                            'gemini_configured': False,
-                            'deepgram_configured': DeepgramTranscriber().is_configured()
-                        }
-                    }, status=status.HTTP_501_NOT_IMPLEMENTED)
-        else:
-            # For other languages, use the default provider selection
-            if provider == 'whisper':
-                transcriber = WhisperTranscriber()
-            elif provider == 'gemini':
-                transcriber = GeminiTranscriber()
-            elif provider == 'deepgram':
-                transcriber = DeepgramTranscriber()
-                # Check if language is supported by Deepgram
-                if language and not transcriber.is_language_supported(language):
-                    return Response({
-                        'error': f'Language "{language}" is not supported by the selected STT provider ({provider})',
-                        'supported_languages': sorted(list(transcriber.SUPPORTED_LANGUAGES)),
-                        'suggestion': 'Supported languages: English, Hindi, Spanish, French, German, etc. Deepgram does not support Odia.'
-                    }, status=status.HTTP_400_BAD_REQUEST)
-            else:
-                return Response({'error': f'Unknown STT provider: {provider}'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        transcript = ""
-        if transcriber.is_configured():
-            audio_file.seek(0)
-            transcript = transcriber.transcribe_file(audio_file.name, audio_file.read(), language)
-        else:
-            # Provide detailed error about what needs to be configured
-            if provider == 'whisper':
-                return Response({
-                    'error': 'Whisper STT is not configured',
-                    'suggestion': 'Please set OPENAI_API_KEY in your environment variables'
-                }, status=status.HTTP_501_NOT_IMPLEMENTED)
-            elif provider == 'gemini':
-                return Response({
-                    'error': 'Gemini STT is not configured',
-                    'suggestion': 'Please set GOOGLE_API_KEY in your environment variables'
-                }, status=status.HTTP_501_NOT_IMPLEMENTED)
-            elif provider == 'deepgram':
-                return Response({
-                    'error': 'Deepgram STT is not configured',
-                    'suggestion': 'Please set DEEPGRAM_API_KEY in your environment variables'
-                }, status=status.HTTP_501_NOT_IMPLEMENTED)
-            else:
-                return Response({'error': 'Speech-to-text not configured on server'}, status=status.HTTP_501_NOT_IMPLEMENTED)
+        audio_file = files['audio']
+        language = data.get('language')
+        transcriber, error_response = select_transcriber(language)
+        if error_response is not None:
+            return error_response
 
-        symptoms = extract_symptoms(transcript)
+        # Send the spooled upload without reading it into another copy; a cached
+        # transcript of the same audio skips the provider call
+        with upload_buffer(audio_file) as audio:
+            transcript = transcribe(transcriber, audio_file.name, audio, language)
+
+        symptoms = extract_symptoms(transcript, language)
         return Response({
             'transcript': transcript,
             'symptoms': symptoms
         }, status=status.HTTP_200_OK)
+    except UploadTooLarge as e:
+        return _too_large_response(e)
     except Exception as e:
-        # Log the full error for debugging
-        import traceback
-        error_details = str(e)
-        if "quota" in error_details.lower() or "429" in error_details:
-            return Response({
-                'error': 'API quota exceeded. Please try again later or switch to a different provider.',
-                'suggestion': 'The current provider has reached its usage limits. Consider switching to Deepgram which is now configured.'
-            }, status=status.HTTP_429_TOO_MANY_REQUESTS)
-        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return transcription_error_response(e)
+
+
+def select_transcriber(language):
+    """
+    The configured STT provider (STT_PROVIDER) for a language, as
+    (transcriber, None), or (None, error response) when none can serve it.
+    """
+    # Select STT provider via env var
+    provider = os.getenv('STT_PROVIDER', 'whisper').lower()
+
+    # 'auto': the fastest healthy provider that supports the language
+    if provider == 'auto':
+        transcriber = router.choose(language)
+        if transcriber is None:
+            return None, _stt_unavailable_response(language)
+        return transcriber, None
+
+    # For Odia language (or), try different providers as fallbacks
+    # Neither Deepgram nor standard Whisper/Gemini support Odia directly
+    # We'll try to use fallback providers with language hints
+    if language == 'or':  # Odia language code
+        # Check if Deepgram is configured (it doesn't support Odia)
+        if provider == 'deepgram':
+            return None, Response({
+                'error': 'Deepgram does not support Odia language',
+                'suggestion': 'Please switch to Whisper (OPENAI_API_KEY) or Gemini (GOOGLE_API_KEY) for Odia language support'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Try Whisper first for Odia (with language hint)
+        transcriber = WhisperTranscriber.get_instance()
+        if not transcriber.is_configured():
+            # Fallback to Gemini if Whisper is not configured
+            transcriber = GeminiTranscriber.get_instance()
+            if not transcriber.is_configured():
+                # If no providers are configured, return error with suggestions
+                return None, Response({
+                    'error': 'No STT provider configured for Odia language',
+                    'suggestion': 'Please configure either Whisper (OPENAI_API_KEY) or Gemini (GOOGLE_API_KEY) for Odia language support',
+                    'configured_providers': {
+                        'whisper_configured': False,
+                        'gemini_configured': False,
+                        'deepgram_configured': DeepgramTranscriber.get_instance().is_configured()
+                    }
+                }, status=status.HTTP_501_NOT_IMPLEMENTED)
+    else:
+        # For other languages, use the default provider selection
+        if provider == 'whisper':
+            transcriber = WhisperTranscriber.get_instance()
+        elif provider == 'gemini':
+            transcriber = GeminiTranscriber.get_instance()
+        elif provider == 'deepgram':
+            transcriber = DeepgramTranscriber.get_instance()
+            # Check if language is supported by Deepgram
+            if language and not transcriber.is_language_supported(language):
+                return None, Response({
+                    'error': f'Language "{language}" is not supported by the selected STT provider ({provider})',
+                    'supported_languages': sorted(list(transcriber.SUPPORTED_LANGUAGES)),
+                    'suggestion': 'Supported languages: English, Hindi, Spanish, French, German, etc. Deepgram does not support Odia.'
+                }, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            return None, Response({'error': f'Unknown STT provider: {provider}'}, status=status.HTTP_400_BAD_REQUEST)
+
+    if transcriber.is_configured():
+        if router.acquire(transcriber.provider):
+            return transcriber, None
+        # Its circuit is open: use another healthy provider until the cooldown ends
+        fallback = router.choose(language, exclude={transcriber.provider})
+        if fallback is not None:
+            return fallback, None
+        return None, _stt_unavailable_response(language, router.retry_after(transcriber.provider))
+
+    # Provide detailed error about what needs to be configured
+    if provider == 'whisper':
+        return None, Response({
+            'error': 'Whisper STT is not configured',
+            'suggestion': 'Please set OPENAI_API_KEY in your environment variables'
+        }, status=status.HTTP_501_NOT_IMPLEMENTED)
+    elif provider == 'gemini':
+        return None, Response({
+            'error': 'Gemini STT is not configured',
+            'suggestion': 'Please set GOOGLE_API_KEY in your environment variables'
+        }, status=status.HTTP_501_NOT_IMPLEMENTED)
+    elif provider == 'deepgram':
+        return None, Response({
+            'error': 'Deepgram STT is not configured',
+            'suggestion': 'Please set DEEPGRAM_API_KEY in your environment variables'
+        }, status=status.HTTP_501_NOT_IMPLEMENTED)
+    return None, Response({'error': 'Speech-to-text not configured on server'}, status=status.HTTP_501_NOT_IMPLEMENTED)
+
+
+def _stt_unavailable_response(language, retry_after=None):
+    """503 with Retry-After when every provider that could serve the language has its circuit open"""
+    health = router.health()
+    if retry_after is None:
+        waits = [p['retry_after_seconds'] for p in health.values() if p['configured'] and p['retry_after_seconds'] > 0]
+        retry_after = min(waits) if waits else 1
+    response = Response({
+        'error': f'No healthy speech-to-text provider available for language "{language or "default"}"',
+        'providers': {name: {'configured': p['configured'], 'circuit': p['circuit']} for name, p in health.items()},
+    }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    response['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+def transcription_error_response(error):
+    """Response for a failed provider call: 429 when the provider quota is exhausted, 500 otherwise"""
+    error_details = str(error)
+    if "quota" in error_details.lower() or "429" in error_details:
+        return Response({
+            'error': 'API quota exceeded. Please try again later or switch to a different provider.',
+            'suggestion': 'The current provider has reached its usage limits. Consider switching to Deepgram which is now configured.'
+        }, status=status.HTTP_429_TOO_MANY_REQUESTS)
+    return Response({'error': str(error)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
 @api_view(['POST'])
 @authentication_classes([JWTAuthentication])
 @permission_classes([IsAuthenticated])
-@parser_classes([MultiPartParser, FormParser, JSONParser])
+@parser_classes([ScanUploadParser, FormParser, JSONParser])
 def multimodal_diagnosis(request):
     """
     Combine X-ray, structured vitals, and optional voice-derived symptoms for a fused diagnosis.
     Accepts multipart (image + form fields) or JSON (if image omitted).
     """
+    if wants_async(request):
+        return _enqueue_job(request, DiagnosisJob.MULTIMODAL_DIAGNOSIS, 'image')
+    try:
+        data, files = request.data, request.FILES
+    except UploadTooLarge as e:
+        return _too_large_response(e)
+    return handle_multimodal_diagnosis(data, files)
+
+
+def handle_multimodal_diagnosis(data, files):
+    """multimodal_diagnosis on already parsed form fields and files (also run by the job runner)"""
     try:
         # Optional image
         has_pneumonia_flag = False
-        if 'image' in request.FILES:
-            image_file = request.FILES['image']
-            has_pneumonia_flag = predict_pneumonia(image_file)
+        model_version = None
+        patient = {}
+        if 'image' in files:
+            image_file = files['image']
+            prediction = predict_scan(image_file)
+            has_pneumonia_flag = prediction['has_pneumonia']
+            model_version = prediction['model_version']
+            patient = scan_patient_info(image_file)
 
         # Age handling
-        birthdate_str = request.data.get('birthdate') or (request.data.get('patient', {}).get('birthdate') if isinstance(request.data, dict) else None)
+        birthdate_str = data.get('birthdate') or (data.get('patient', {}).get('birthdate') if isinstance(data, dict) else None) or patient.get('birthdate')
         if not birthdate_str:
             return Response({'error': 'Birthdate is required'}, status=status.HTTP_400_BAD_REQUEST)
         try:
@@ -229,16 +361,16 @@ def multimodal_diagnosis(request):
         age = relativedelta(datetime.now(), birthdate).years
 
         # Structured vitals with default values for optional fields
-        systolic = int(request.data.get('systolicBP')) if request.data.get('systolicBP') is not None else 120
-        diastolic = int(request.data.get('diastolicBP')) if request.data.get('diastolicBP') is not None else 80
-        temperature = float(request.data.get('temperature')) if request.data.get('temperature') is not None else 37.0
-        heart_rate = int(request.data.get('heartRate')) if request.data.get('heartRate') is not None else 75
-        gender = request.data.get('gender', 'female')
+        systolic = int(data.get('systolicBP')) if data.get('systolicBP') is not None else 120
+        diastolic = int(data.get('diastolicBP')) if data.get('diastolicBP') is not None else 80
+        temperature = float(data.get('temperature')) if data.get('temperature') is not None else 37.0
+        heart_rate = int(data.get('heartRate')) if data.get('heartRate') is not None else 75
+        gender = data.get('gender') or patient.get('gender', 'female')
 
         # Symptom extraction: either user-provided transcript or server extracts from voice
-        transcript_text = request.data.get('transcript', '')
+        transcript_text = data.get('transcript', '')
         if transcript_text:
-            extracted = extract_symptoms(transcript_text)
+            extracted = extract_symptoms(transcript_text, data.get('language'))
         else:
             extracted = {}
 
@@ -249,9 +381,9 @@ def multimodal_diagnosis(request):
             'diastolic_pressure': diastolic,
             'temperature': temperature,
             'heart_rate': heart_rate,
-            'has_cough': request.data.get('hasCough', str(flags.get('has_cough', False))).lower() == 'true' if isinstance(request.data.get('hasCough', None), str) else (request.data.get('hasCough', flags.get('has_cough', False)) or False),
-            'has_headache': request.data.get('hasHeadaches', str(flags.get('has_headache', False))).lower() == 'true' if isinstance(request.data.get('hasHeadaches', None), str) else (request.data.get('hasHeadaches', flags.get('has_headache', False)) or False),
-            'can_smell': request.data.get('canSmellTaste', str(flags.get('can_smell', True))).lower() == 'true' if isinstance(request.data.get('canSmellTaste', None), str) else (request.data.get('canSmellTaste', flags.get('can_smell', True)) if request.data.get('canSmellTaste', None) is not None else flags.get('can_smell', True)),
+            'has_cough': data.get('hasCough', str(flags.get('has_cough', False))).lower() == 'true' if isinstance(data.get('hasCough', None), str) else (data.get('hasCough', flags.get('has_cough', False)) or False),
+            'has_headache': data.get('hasHeadaches', str(flags.get('has_headache', False))).lower() == 'true' if isinstance(data.get('hasHeadaches', None), str) else (data.get('hasHeadaches', flags.get('has_headache', False)) or False),
+            'can_smell': data.get('canSmellTaste', str(flags.get('can_smell', True))).lower() == 'true' if isinstance(data.get('canSmellTaste', None), str) else (data.get('canSmellTaste', flags.get('can_smell', True)) if data.get('canSmellTaste', None) is not None else flags.get('can_smell', True)),
             'age': float(age),
             'gender': gender,
             'has_pneumonia': bool(has_pneumonia_flag)
@@ -261,6 +393,123 @@ def multimodal_diagnosis(request):
         fused['age'] = age
         fused['derivedSymptoms'] = extracted
         fused['imaging'] = {'pneumoniaPositive': bool(has_pneumonia_flag)}
+        fused['modelVersion'] = model_version
         return Response(fused, status=status.HTTP_200_OK)
+    except InferenceOverloaded as e:
+        return _overloaded_response(e)
+    except UploadTooLarge as e:
+        return _too_large_response(e)
+    except DicomError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
-        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['POST'])
+@authentication_classes([JWTAuthentication])
+@permission_classes([IsAuthenticated])
+@parser_classes([BatchUploadParser])
+def batch_scans(request):
+    """
+    Score many scans in one request and stream the results as NDJSON.
+    Accepts multipart 'images' parts and/or one zip 'archive', plus an optional
+    CSV 'manifest' (or manifest.csv in the archive) with per-image vitals
+    using the upload_scan field names and a 'filename' column.
+    """
+    try:
+        scans, manifest, archive = collect_batch(request.FILES)
+    except UploadTooLarge as e:
+        return _too_large_response(e)
+    except BatchError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    if not scans:
+        if archive is not None:
+            archive.close()
+        return Response({'error': 'No images provided'}, status=status.HTTP_400_BAD_REQUEST)
+
+    return StreamingHttpResponse(
+        stream_batch_results(scans, manifest, archive),
+        content_type='application/x-ndjson',
+        status=status.HTTP_200_OK,
+    )
+
+
+@api_view(['GET'])
+@authentication_classes([JWTAuthentication])
+@permission_classes([IsAuthenticated])
+def job_status(request, job_id):
+    """
+    Status and, once finished, result of a job queued with ?async=true.
+    Pass ?wait=<seconds> (at most JOB_MAX_WAIT_SECONDS) to long-poll until the job finishes.
+    """
+    if not DiagnosisJob.objects.filter(id=job_id, user=request.user).exists():
+        return Response({'error': 'Job not found'}, status=status.HTTP_404_NOT_FOUND)
+    try:
+        wait = min(float(request.query_params.get('wait', 0)), float(os.getenv('JOB_MAX_WAIT_SECONDS', '30')))
+    except ValueError:
+        return Response({'error': 'wait must be a number of seconds'}, status=status.HTTP_400_BAD_REQUEST)
+    job = JobRunner.get_instance().wait(job_id, max(wait, 0))
+    return Response(serialize_job(job), status=status.HTTP_200_OK)
+
+
+# Job type -> function that runs it on the stored form fields and upload
+JOB_HANDLERS = {
+    DiagnosisJob.UPLOAD_SCAN: handle_upload_scan,
+    DiagnosisJob.MULTIMODAL_DIAGNOSIS: handle_multimodal_diagnosis,
+    DiagnosisJob.TRANSCRIBE_SYMPTOMS: handle_transcribe_symptoms,
+}
+
+
+@api_view(['GET'])
+@authentication_classes([JWTAuthentication])
+@permission_classes([IsAdminUser])
+def service_metrics(request):
+    """
+    Runtime metrics for tuning the imaging service (inference batching, STT connection reuse, etc.).
+    Staff only: they expose internal queue depths and provider latencies.
+    """
+    pool = InferenceWorkerPool.get_instance()
+    return Response({
+        'inference': InferenceBatcher.get_instance().stats(),
+        'workers': pool.stats() if pool is not None else None,
+        'prediction_cache': prediction_cache.stats(),
+        'transcript_cache': transcript_cache.stats(),
+        'stt_hedging': dict(hedging.stats(), latency=latency.stats()),
+        'audio_compaction': audio_compactor.stats(),
+        'stt_segmentation': segmentation.stats(),
+        'symptom_lexicon': lexicon_stats(),
+        'async_executor': InferenceExecutor.get_instance().stats(),
+        'stt_connections': connection_stats(),
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@authentication_classes([JWTAuthentication])
+@permission_classes([IsAdminUser])
+def stt_health(request):
+    """
+    Per-provider STT health: circuit breaker state plus EWMA latency and error rate per language.
+    200 while at least one provider can take requests, 503 otherwise. Staff only.
+    """
+    providers = router.health()
+    healthy = any(provider['available'] for provider in providers.values())
+    return Response(
+        {'providers': providers},
+        status=status.HTTP_200_OK if healthy else status.HTTP_503_SERVICE_UNAVAILABLE
+    )
+
+
+@api_view(['GET'])
+@authentication_classes([])
+def readiness(request):
+    """
+    Load balancer readiness probe: 200 once the model is loaded and warmed, 503 before.
+    """
+    warmup = ModelWarmup.get_instance()
+    # Processes run without MODEL_WARMUP warm up on the first probe
+    warmup.start()
+    return Response(
+        warmup.state(),
+        status=status.HTTP_200_OK if warmup.is_ready() else status.HTTP_503_SERVICE_UNAVAILABLE
+    )
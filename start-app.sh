@@ -15,7 +15,7 @@ sleep 2
 # Start backend server
 echo "Starting backend server..."
 cd backend/core
-python manage.py runserver > /tmp/cdss-backend.log 2>&1 &
+JOB_RUNNER=true MODEL_WARMUP=true python manage.py runserver > /tmp/cdss-backend.log 2>&1 &
 BACKEND_PID=$!
 
 # Wait for backend to start
@@ -7,7 +7,7 @@ echo "Starting Xray Setu Development Environment..."
 # Start backend server in background
 echo "Starting backend server..."
 cd backend/core
-python manage.py runserver > ../../backend.log 2>&1 &
+JOB_RUNNER=true MODEL_WARMUP=true python manage.py runserver > ../../backend.log 2>&1 &
 BACKEND_PID=$!
 cd ../..
 
@@ -109,6 +109,14 @@ def test_hindi_symptoms():
         {
             'input': 'I do not have jukam',
             'expected': {'fever': False}
+        },
+        {
+            'input': 'nahi khansi',
+            'expected': {'cough': False}
+        },
+        {
+            'input': 'nahi bukhar hai',
+            'expected': {'fever': False}
         }
     ]
     